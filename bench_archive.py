@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Session archive benchmark - compression ratio and block read throughput
+Packs the first blocks of a session with every installed codec and compares
+random full-block reads (raw uint8 and decoded complex64) against the
+ch{N}/block_XXXXX.bin layout. Page cache is warm for both layouts.
+Run: python3 bench_archive.py [--base _logs/iq_data/session] [--blocks 32] [--reads 200]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+from iq_archive import available_codecs, export_session, open_archive
+from iq_blocks import block_path, decode_pairs, open_block
+from iq_index import load_index
+
+
+def copy_subset(base, out_dir, index, n_blocks):
+    """Session directory with the first n_blocks blocks of base (index.csv rows included)"""
+    keep = set(index.blocks[:n_blocks].tolist())
+    for position in range(min(n_blocks, len(index))):
+        block_index = index.block_at(position)
+        for ch in index.channels_at(position):
+            os.makedirs(os.path.join(out_dir, f'ch{ch}'), exist_ok=True)
+            shutil.copyfile(block_path(base, ch, block_index), block_path(out_dir, ch, block_index))
+    with open(os.path.join(base, 'index.csv')) as src, open(os.path.join(out_dir, 'index.csv'), 'w') as dst:
+        for line in src:
+            fields = line.split(',')
+            if len(fields) > 1 and fields[1].isdigit() and int(fields[1]) in keep:
+                dst.write(line)
+
+
+def read_throughput(session_path, requests, decode):
+    """MB/s of raw block bytes over the (block, channel) requests"""
+    total = 0
+    t0 = time.perf_counter()
+    for block_index, ch in requests:
+        raw = open_block(block_path(session_path, ch, block_index))
+        if decode:
+            decode_pairs(raw)
+        else:
+            raw = np.array(raw)   # force the pages / chunk in
+        total += len(raw)
+    return total / 1e6 / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--base', default="_logs/iq_data/session", help="session directory")
+    parser.add_argument('--blocks', type=int, default=32, help="blocks packed per codec")
+    parser.add_argument('--reads', type=int, default=200, help="random block reads per measurement")
+    args = parser.parse_args()
+
+    index = load_index(args.base)
+    if index is None or len(index) == 0:
+        print(f"No blocks found in {args.base}")
+        return 1
+    rng = np.random.default_rng(0)
+    n = min(args.blocks, len(index))
+    positions = rng.integers(0, n, args.reads)
+    requests = [(index.block_at(p), int(rng.choice(index.channels_at(p)))) for p in positions]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        subset = os.path.join(tmp, 'session')
+        copy_subset(args.base, subset, index, n)
+        raw_bytes = sum(os.path.getsize(block_path(subset, ch, index.block_at(p)))
+                        for p in range(n) for ch in index.channels_at(p))
+        files = sum(len(os.listdir(os.path.join(subset, d))) for d in os.listdir(subset)
+                    if os.path.isdir(os.path.join(subset, d)))
+        print(f"{n} blocks, {files} block files, {raw_bytes / 1e6:.1f} MB raw, {args.reads} random reads")
+        raw_mbs = read_throughput(subset, requests, decode=False)
+        dec_mbs = read_throughput(subset, requests, decode=True)
+        print(f"  {'raw files':>10}: ratio  1.00x  read {raw_mbs:8.1f} MB/s  read+decode {dec_mbs:8.1f} MB/s")
+
+        for codec in available_codecs():
+            path = os.path.join(tmp, f'session_{codec}.iqpack')
+            t0 = time.perf_counter()
+            export_session(subset, path, codec)
+            pack_mbs = raw_bytes / 1e6 / (time.perf_counter() - t0)
+            archive = open_archive(path)
+            ratio = raw_bytes / os.path.getsize(path)
+            for block_index, ch in requests[:5]:
+                if not np.array_equal(archive.raw(block_index, ch), open_block(block_path(subset, ch, block_index))):
+                    print(f"✗ {codec}: block {block_index} ch{ch} differs from the block file")
+                    return 1
+            raw_mbs = read_throughput(path, requests, decode=False)
+            dec_mbs = read_throughput(path, requests, decode=True)
+            print(f"  {codec:>10}: ratio {ratio:5.2f}x  read {raw_mbs:8.1f} MB/s  read+decode {dec_mbs:8.1f} MB/s"
+                  f"  (pack {pack_mbs:.0f} MB/s)")
+    print("✓ Archived blocks match the block files")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
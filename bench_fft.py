@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+FFT backend micro-benchmark on block-sized transforms
+Compares every available backend of iq_fft (complex64) against numpy.fft in
+complex128, on the transforms correction.py and the Welch PSD actually run
+Run: python3 bench_fft.py [--repeat 5] [--workers N]
+"""
+
+import argparse
+import sys
+import time
+import numpy as np
+
+from iq_blocks import SAMPLES_PER_BLOCK
+from iq_fft import FFT_WORKERS, FFTBackend, available_backends
+
+# (label, shape): full 2N correlation of 3 channels, one reference, Welch segments of 4 channels
+SHAPES = [
+    ("correlation 3 x 2N", (3, 2 * SAMPLES_PER_BLOCK)),
+    ("reference 2N", (2 * SAMPLES_PER_BLOCK,)),
+    ("welch 4 x 128 x 1024", (4, 128, 1024)),
+]
+
+
+def best_time(func, x, repeat):
+    func(x)   # warm up (plans, caches)
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(x)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=FFT_WORKERS, help="threads per transform")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    backends = [FFTBackend(name, args.workers) for name in available_backends()]
+    print(f"Backends: {', '.join(b.name for b in backends)} ({args.workers} thread(s))")
+    for label, shape in SHAPES:
+        x = (rng.standard_normal(shape) + 1j * rng.standard_normal(shape)).astype(np.complex64)
+        x128 = x.astype(np.complex128)
+        baseline = best_time(lambda a: np.fft.fft(a, axis=-1), x128, args.repeat)
+        print(f"{label}: numpy complex128 {baseline * 1000:8.2f} ms "
+              f"({x128.nbytes / 1e6:.1f} MB in)")
+        reference = np.fft.fft(x128, axis=-1)
+        for backend in backends:
+            elapsed = best_time(backend.fft, x, args.repeat)
+            out = backend.fft(x)
+            err = float(np.max(np.abs(out - reference)) / np.max(np.abs(reference)))
+            print(f"  {backend.name:>7} {out.dtype}: {elapsed * 1000:8.2f} ms "
+                  f"({baseline / elapsed:4.1f}x, rel. error {err:.1e})")
+            if out.dtype != np.complex64:
+                print(f"✗ {backend.name} did not stay in single precision")
+                return 1
+    print("✓ All backends return complex64")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
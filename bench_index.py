@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Index loader benchmark - synthetic index.csv files up to 1M rows
+Checks that load time stays near-linear in the number of rows
+Run: python3 bench_index.py [--max-rows 1000000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+from iq_index import aggregate_blocks, read_index_csv
+
+# Scaling exponent above which load time is no longer considered near-linear
+MAX_EXPONENT = 1.25
+
+
+def write_synthetic_index(path, n_rows, seed=0):
+    """Write a DAQ-style index.csv with n_rows rows (4 channels per block, some dropped)"""
+    rng = np.random.default_rng(seed)
+    n_blocks = n_rows // 4
+    blocks = np.repeat(np.arange(n_blocks, dtype=np.int64), 4)
+    channels = np.tile(np.arange(4), n_blocks)
+    timestamps = 1770822898414 + blocks * 109
+    # Drop ~1% of channel rows like an incomplete capture
+    keep = rng.random(len(blocks)) > 0.01
+    blocks, channels, timestamps = blocks[keep], channels[keep], timestamps[keep]
+    with open(path, 'w') as f:
+        for t, b, c in zip(timestamps, blocks, channels):
+            f.write(f"{t},{b},{c},700000000,0,0,ch{c}/block_{b:05d}.bin\n")
+    return len(blocks)
+
+
+def time_load(path, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        blocks, masks = aggregate_blocks(read_index_csv(path))[:2]
+        best = min(best, time.perf_counter() - t0)
+    return best, len(blocks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--max-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    sizes = [args.max_rows // 8, args.max_rows // 4, args.max_rows // 2, args.max_rows]
+    rows, times = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            path = os.path.join(tmp, f'index_{n}.csv')
+            n_rows = write_synthetic_index(path, n)
+            elapsed, n_blocks = time_load(path)
+            rows.append(n_rows)
+            times.append(elapsed)
+            print(f"  {n_rows:>9} rows -> {n_blocks:>8} blocks: {elapsed * 1000:8.1f} ms "
+                  f"({n_rows / elapsed / 1e6:.2f} M rows/s)")
+
+    # Slope of log(time) over log(rows): 1.0 is perfectly linear
+    exponent = np.polyfit(np.log(rows), np.log(times), 1)[0]
+    print(f"Scaling exponent: {exponent:.2f} (limit {MAX_EXPONENT})")
+    if exponent > MAX_EXPONENT:
+        print("✗ Index load time grows faster than linear")
+        return 1
+    print("✓ Index load time is near-linear")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
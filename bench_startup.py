@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Viewer startup benchmark - import time and time to first plot of iq_web.py
+Imports iq_web in fresh interpreters (checking that no data path is looked up
+and no heavy optional module is imported), then starts the server and replays
+what a browser does on page load: list sessions, load the index, draw block 0.
+Run: python3 bench_startup.py [--runs 3] [--port 8071] [--session session]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+# Modules the viewer must not import before they are needed
+LAZY_MODULES = ('pandas', 'scipy.fft', 'pyfftw')
+
+IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import iq_web
+elapsed = time.perf_counter() - t0
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules],
+                  'data_path_looked_up': iq_web.data_path.cache_info().currsize > 0}))
+""" % (LAZY_MODULES,)
+
+
+def measure_import():
+    """(seconds, eagerly loaded lazy modules, data path looked up, import output) of one fresh import"""
+    result = subprocess.run([sys.executable, '-c', IMPORT_PROBE], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    lines = result.stdout.strip().splitlines()
+    probe = json.loads(lines[-1])
+    return probe['seconds'], probe['loaded'], probe['data_path_looked_up'], lines[:-1]
+
+
+def wait_for_port(port, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.01)
+    return False
+
+
+def dash_call(port, outputs, inputs, state=(), changed=()):
+    """POST one Dash callback request; returns the response dict"""
+    payload = {
+        'output': outputs[0][0] + '.' + outputs[0][1] if len(outputs) == 1 else
+        '..' + '...'.join(f'{i}.{p}' for i, p in outputs) + '..',
+        'outputs': ({'id': outputs[0][0], 'property': outputs[0][1]} if len(outputs) == 1 else
+                    [{'id': i, 'property': p} for i, p in outputs]),
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'state': [{'id': i, 'property': p, 'value': v} for i, p, v in state],
+        'changedPropIds': list(changed),
+    }
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/_dash-update-component',
+                                     data=json.dumps(payload).encode(), headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.load(response)['response']
+
+
+def first_plot(port, session):
+    """Callbacks of a page load up to the first IQ figure"""
+    response = dash_call(port, [('session-selector', 'options'), ('session-selector', 'value')],
+                         [('refresh-button', 'n_clicks', 0)], [('session-selector', 'value', session)])
+    session = response['session-selector']['value']
+    response = dash_call(port, [('frames-data-store', 'data'), ('block-slider', 'min'), ('block-slider', 'max'),
+                                ('block-slider', 'marks'), ('current-block', 'data')],
+                         [('refresh-button', 'n_clicks', 0), ('session-selector', 'value', session),
+                          ('frame-type-filter', 'value', 'all')], changed=['session-selector.value'])
+    frames_data = response['frames-data-store']['data']
+    if not frames_data:
+        raise RuntimeError(f"session {session} has no blocks")
+    response = dash_call(port, [('iq-plot', 'figure'), ('info-div', 'children'), ('plot-skeleton', 'data')],
+                         [('block-slider', 'value', 0), ('mode-selector', 'value', 'IQ'),
+                          ('samples-input', 'value', 1000), ('iq-plot', 'relayoutData', None),
+                          ('psd-window', 'value', 'hann'), ('psd-fft-size', 'value', 1024),
+                          ('psd-overlap', 'value', 0.5)],
+                         [('frames-data-store', 'data', frames_data), ('play-state', 'data', {'playing': False}),
+                          ('plot-skeleton', 'data', None)], changed=['block-slider.value'])
+    if 'data' not in response['iq-plot']['figure']:
+        raise RuntimeError("no figure in the first plot response")
+
+
+def measure_server(port, session, timeout=60.0):
+    """(seconds to listening, seconds to first plot) from starting the server process"""
+    env = dict(os.environ, IQ_WEB_PORT=str(port), IQ_LOG_LEVEL='warning')
+    t0 = time.perf_counter()
+    server = subprocess.Popen([sys.executable, 'iq_web.py'], env=env, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        if not wait_for_port(port, t0 + timeout):
+            raise RuntimeError(f"server did not listen on port {port} within {timeout:.0f} s")
+        listening = time.perf_counter() - t0
+        first_plot(port, session)
+        return listening, time.perf_counter() - t0
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help="fresh starts per measurement (median is reported)")
+    parser.add_argument('--port', type=int, default=8071, help="port of the benchmark server")
+    parser.add_argument('--session', default=None, help="session to plot (default: the viewer's default)")
+    args = parser.parse_args()
+
+    imports, ok = [], True
+    for _ in range(args.runs):
+        seconds, loaded, looked_up, output = measure_import()
+        imports.append(seconds)
+    print(f"Import iq_web:      {statistics.median(imports) * 1000:7.0f} ms (median of {args.runs})")
+    if loaded:
+        print(f"✗ Imported at startup: {', '.join(loaded)}")
+        ok = False
+    if looked_up or output:
+        print("✗ Importing iq_web looked up the data path or printed output")
+        ok = False
+
+    listening, plotted = [], []
+    for _ in range(args.runs):
+        t_listen, t_plot = measure_server(args.port, args.session)
+        listening.append(t_listen)
+        plotted.append(t_plot)
+    print(f"Port open:          {statistics.median(listening) * 1000:7.0f} ms after start")
+    print(f"First plot:         {statistics.median(plotted) * 1000:7.0f} ms after start")
+    if ok:
+        print("✓ Startup is free of data access and heavy optional imports")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+PPM convergence tracker - replays the heimdall delay_sync correction loop
+
+For every block the delay of each channel against the reference is turned
+into the sample rate correction the firmware would apply:
+
+  ppm = clip(-delay * gain * MIN_FS_PPM_OFFSET, -MAX_FS_PPM_OFFSET, +MAX_FS_PPM_OFFSET)
+
+accumulated on top of the base correction, as in the README synchronization
+table. Delays are cached per block next to the session, so re-running after
+new blocks arrive only correlates the new ones.
+
+  python3 convergence.py                      # table for channel 1, cached delays
+  python3 convergence.py --channel 2 --workers 8
+  python3 convergence.py -o convergence.csv   # every channel, one row per block
+"""
+
+import argparse
+import os
+import sys
+import threading
+import numpy as np
+
+from correction import (BASE, LAG_PEAK_RATIO, LAG_SEGMENTS, N, REF_CHANNEL, RESULT_COLUMNS, Throughput,
+                        estimate_block_delays, estimate_session_delays)
+from iq_blocks import session_file
+from iq_index import load_index
+from iq_metrics import log
+
+# Firmware constants (heimdall_daq_fw _daq_core/delay_sync.py)
+MIN_FS_PPM_OFFSET = 1e-7
+MAX_FS_PPM_OFFSET = 0.01
+# Loop gain; 50 reproduces the README table (delay 617 -> -0.003085)
+PPM_GAIN = 50
+# Base correction applied before the per-block loop, and the resulting rate
+BASE_PPM_CORRECTION = -0.040860
+NOMINAL_SAMPLE_RATE = 2.4e6
+# Locked once every channel stays within LOCK_TOLERANCE samples for LOCK_BLOCKS blocks
+LOCK_TOLERANCE = 0
+LOCK_BLOCKS = 3
+
+
+def ppm_correction(delay, gain=PPM_GAIN):
+    """Per-block correction the firmware applies for a delay (scalar or array)"""
+    return np.clip(-np.asarray(delay, dtype=np.float64) * gain * MIN_FS_PPM_OFFSET,
+                   -MAX_FS_PPM_OFFSET, MAX_FS_PPM_OFFSET)
+
+
+def cache_path(base, ref_channel=REF_CHANNEL):
+    return session_file(base, f'delays_ref{ref_channel}.csv')
+
+
+def lock_start(delays, tolerance=LOCK_TOLERANCE, lock_blocks=LOCK_BLOCKS):
+    """Position where the final run of in-tolerance delays starts (None if not locked)"""
+    ok = np.abs(np.asarray(delays)) <= tolerance
+    if not len(ok) or not ok[-1]:
+        return None
+    misses = np.flatnonzero(~ok)
+    start = int(misses[-1]) + 1 if len(misses) else 0
+    return start if len(ok) - start >= lock_blocks else None
+
+
+class ConvergenceTracker:
+    """Per-block delays of a session and the correction loop replayed over them
+
+    update() correlates only blocks missing from the cache file and appends
+    them; replay() is a cheap cumulative sum over the cached delays.
+    """
+
+    def __init__(self, base=BASE, ref_channel=REF_CHANNEL, gain=PPM_GAIN, tolerance=LOCK_TOLERANCE,
+                 lock_blocks=LOCK_BLOCKS, n=N, max_lag=None, use_cache=True):
+        self.base = base
+        self.ref_channel = ref_channel
+        self.gain = gain
+        self.tolerance = tolerance
+        self.lock_blocks = lock_blocks
+        self.n = n
+        self.max_lag = max_lag
+        self.cache_file = cache_path(base, ref_channel) if use_cache else None
+        self.rows = {}          # block -> list of result dicts
+        self.done = set()       # blocks processed (including ones without results)
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._load_cache()
+
+    def _load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        import pandas as pd
+        try:
+            df = pd.read_csv(self.cache_file)
+        except (OSError, ValueError) as e:
+            log.warning(f"⚠ Ignoring delay cache {self.cache_file}: {e}")
+            return
+        if list(df.columns) != RESULT_COLUMNS or (len(df) and (df['peak_index'] + df['delay'] != self.n).any()):
+            log.warning(f"⚠ Ignoring delay cache {self.cache_file}: different format or block size")
+            return
+        for row in df.to_dict('records'):
+            self.rows.setdefault(int(row['block']), []).append(row)
+        self.done.update(self.rows)
+        log.info(f"✓ Loaded cached delays for {len(self.rows)} blocks from {self.cache_file}")
+
+    def _append_cache(self, results):
+        if not self.cache_file or not results:
+            return
+        import pandas as pd
+        exists = os.path.exists(self.cache_file)
+        pd.DataFrame(results, columns=RESULT_COLUMNS).to_csv(self.cache_file, mode='a', header=not exists,
+                                                             index=False)
+
+    def missing_blocks(self, blocks=None):
+        if blocks is None:
+            index = load_index(self.base)
+            blocks = [] if index is None else index.blocks
+        with self._lock:
+            return [int(b) for b in blocks if int(b) not in self.done]
+
+    def update(self, blocks=None, workers=1, progress=None):
+        """Correlate blocks not seen yet; returns the number of new blocks"""
+        todo = self.missing_blocks(blocks)
+        if not todo:
+            return 0
+        self.pending = len(todo)
+        estimates = estimate_session_delays(self.base, todo, self.ref_channel, n=self.n, workers=workers,
+                                            max_lag=self.max_lag, segments=LAG_SEGMENTS,
+                                            min_peak_ratio=LAG_PEAK_RATIO)
+        # Results come back in block order
+        for block, results in zip(todo, estimates):
+            self._store(block, results)
+            with self._lock:
+                self.pending -= 1
+            if progress is not None:
+                progress.update(results, self.n)
+        return len(todo)
+
+    def block_delays(self, block):
+        """Result rows of one block; a block not cached yet is correlated and appended to the cache"""
+        block = int(block)
+        with self._lock:
+            if block in self.done:
+                return list(self.rows.get(block, []))
+        results = estimate_block_delays(self.base, block, self.ref_channel, n=self.n, max_lag=self.max_lag,
+                                        segments=LAG_SEGMENTS, min_peak_ratio=LAG_PEAK_RATIO)
+        self._store(block, results)
+        return results
+
+    def _store(self, block, results):
+        """Record the results of a block once (the overview pass may correlate it concurrently)"""
+        with self._lock:
+            if block in self.done:
+                return
+            self.done.add(block)
+            if results:
+                self.rows[block] = results
+            self._append_cache(results)
+
+    def update_in_background(self, blocks=None, workers=1):
+        """Start update() on a daemon thread unless one is already running"""
+        if self.is_updating():
+            return False
+        self._thread = threading.Thread(target=self.update, args=(blocks, workers),
+                                        name=f'convergence-{self.base}', daemon=True)
+        self._thread.start()
+        return True
+
+    def is_updating(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def replay(self, timestamps=None):
+        """Correction loop per channel over the cached blocks
+
+        timestamps maps block -> capture time in ms (from index.csv) and is
+        used for the time to lock. Returns a dict with one entry per channel
+        (blocks, delay, ppm, cumulative, ppt, frequency, lock_block,
+        time_to_lock) plus the session-wide lock_block and time_to_lock
+        (None until every channel has locked).
+        """
+        with self._lock:
+            rows = [r for block in sorted(self.rows) for r in self.rows[block]]
+        channels = {}
+        for ch in sorted({int(r['channel']) for r in rows}):
+            blocks = np.array([r['block'] for r in rows if r['channel'] == ch], dtype=np.int64)
+            delay = np.array([r['delay'] for r in rows if r['channel'] == ch], dtype=np.int64)
+            ppm = ppm_correction(delay, self.gain)
+            ppt = ppm * 1000
+            start = lock_start(delay, self.tolerance, self.lock_blocks)
+            channels[ch] = {
+                'blocks': blocks,
+                'delay': delay,
+                'ppm': ppm,
+                'cumulative': BASE_PPM_CORRECTION + np.cumsum(ppm),
+                'ppt': ppt,
+                'frequency': NOMINAL_SAMPLE_RATE * (1 + ppt / 1e6),
+                'lock_block': None if start is None else int(blocks[start]),
+            }
+
+        first = min((int(c['blocks'][0]) for c in channels.values()), default=None)
+        for c in channels.values():
+            c['time_to_lock'] = _elapsed(timestamps, first, c['lock_block'])
+        locks = [c['lock_block'] for c in channels.values()]
+        lock_block = max(locks) if locks and None not in locks else None
+        return {
+            'channels': channels,
+            'first_block': first,
+            'lock_block': lock_block,
+            'time_to_lock': _elapsed(timestamps, first, lock_block),
+        }
+
+
+def _elapsed(timestamps, first, block):
+    """Seconds between two blocks from index timestamps (ms), None if unknown"""
+    if block is None or not timestamps or first not in timestamps or block not in timestamps:
+        return None
+    if not timestamps[first] or not timestamps[block]:
+        return None
+    return (timestamps[block] - timestamps[first]) / 1000.0
+
+
+def index_timestamps(index):
+    """block -> timestamp (ms) from a session index, empty without index.csv"""
+    if index is None or index.timestamps is None:
+        return {}
+    return dict(zip(index.blocks.tolist(), index.timestamps.tolist()))
+
+
+def print_convergence_table(state, channel):
+    """Per-block table in the layout of the README synchronization table"""
+    c = state['channels'].get(channel)
+    if c is None:
+        print(f"No delays for channel {channel}")
+        return
+    print(f"Block   IQ Samples       PPM          PPM correction   Freq correction      PPT")
+    print(f"                     ({BASE_PPM_CORRECTION:.6f})      (cumulative)        (MHz)")
+    print("-----\t--------\t------------\t--------------\t-----------------\t-----------")
+    for i, block in enumerate(c['blocks']):
+        mark = ""
+        if abs(c['delay'][i]) <= LOCK_TOLERANCE:
+            mark = " ✓"
+        if c['lock_block'] is not None and block == c['blocks'][-1]:
+            mark += " Correction is DONE"
+        print(f"{block:5d}  \t{c['delay'][i]:7d} \t{c['ppm'][i]:10.6f}  \t{c['cumulative'][i]:10.6f}  \t"
+              f"{c['frequency'][i] / 1e6:14.9f}  \t{c['ppt'][i]:9.4f}{mark}")
+
+
+def print_lock_summary(state):
+    for ch, c in state['channels'].items():
+        if c['lock_block'] is None:
+            print(f"  ch{ch}: not locked (last delay {c['delay'][-1]} samples)")
+        else:
+            elapsed = "" if c['time_to_lock'] is None else f" after {c['time_to_lock']:.1f} s"
+            print(f"  ch{ch}: locked from block {c['lock_block']}{elapsed}")
+    if state['lock_block'] is None:
+        print("✗ Correction not done yet")
+    else:
+        elapsed = "" if state['time_to_lock'] is None else f", time to lock {state['time_to_lock']:.1f} s"
+        print(f"✓ Correction is DONE at block {state['lock_block']}{elapsed}")
+
+
+def write_convergence(state, output):
+    """One row per block and channel: delay, ppm, cumulative, ppt, frequency"""
+    import pandas as pd
+    frames = [pd.DataFrame({'block': c['blocks'], 'channel': ch, 'delay': c['delay'], 'ppm': c['ppm'],
+                            'cumulative': c['cumulative'], 'ppt': c['ppt'], 'frequency': c['frequency']})
+              for ch, c in state['channels'].items()]
+    df = pd.concat(frames, ignore_index=True).sort_values(['block', 'channel'])
+    if output.endswith('.parquet'):
+        df.to_parquet(output, index=False)
+    else:
+        df.to_csv(output, index=False)
+    print(f"✓ Wrote {len(df)} rows to {output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay the delay_sync PPM correction loop over a session")
+    parser.add_argument('--base', default=BASE, help=f"session directory (default: {BASE})")
+    parser.add_argument('--ref', type=int, default=REF_CHANNEL, help="reference channel")
+    parser.add_argument('--channel', type=int, default=1, help="channel shown in the table")
+    parser.add_argument('--gain', type=float, default=PPM_GAIN, help="delay_sync loop gain")
+    parser.add_argument('--tolerance', type=int, default=LOCK_TOLERANCE,
+                        help="largest |delay| in samples counted as synchronized")
+    parser.add_argument('--lock-blocks', type=int, default=LOCK_BLOCKS,
+                        help="consecutive synchronized blocks needed for lock")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="worker processes for new blocks (0 = one per CPU)")
+    parser.add_argument('--max-lag', type=int, default=None, help="bounded lag search, see correction.py")
+    parser.add_argument('--no-cache', action='store_true', help="ignore and do not write the delay cache")
+    parser.add_argument('-o', '--output', default=None, help="CSV or .parquet file with every channel")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only print the lock summary")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    tracker = ConvergenceTracker(args.base, args.ref, args.gain, args.tolerance, args.lock_blocks,
+                                 max_lag=args.max_lag, use_cache=not args.no_cache)
+    index = load_index(args.base)
+    todo = tracker.missing_blocks([] if index is None else index.blocks)
+    if todo:
+        workers = args.workers or os.cpu_count() or 1
+        print(f"Estimating delays for {len(todo)} new blocks ({workers} worker(s))")
+        progress = Throughput(len(todo))
+        tracker.update(todo, workers, progress)
+        print(f"✓ {len(todo)} blocks: {progress.summary()}")
+    if not tracker.rows:
+        print(f"No delays found in {args.base}")
+        return 1
+
+    state = tracker.replay(index_timestamps(index))
+    if not args.quiet:
+        print_convergence_table(state, args.channel)
+    print_lock_summary(state)
+    if args.output:
+        write_convergence(state, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
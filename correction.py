@@ -1,47 +1,415 @@
+#!/usr/bin/env python3
+"""
+Channel delay estimation for KrakenSDR sync sessions
+
+As in heimdall delay_sync: every channel is cross-correlated against the
+reference channel with zero-padded FFTs and the correlation peak gives the
+delay in samples.
+
+  python3 correction.py                       # block 7, verbose report (as before)
+  python3 correction.py --block 42            # another block
+  python3 correction.py --all -o delays.csv   # every block of the session
+  python3 correction.py --range 48 158 -o delays.parquet
+  python3 correction.py --all --workers 8     # process pool, one block per task
+  python3 correction.py --all --max-lag 64    # search only delays within +-64 samples
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from functools import partial
 import numpy as np
-from numpy.fft import fft, ifft
+
+from iq_blocks import NUM_CHANNELS, block_path, open_block
+from iq_fft import fft, ifft, set_workers
 
 # Path to data (run from Firmware or substitute your own path)
 BASE = "_logs/iq_data/session"
 BLOCK = 7
 N = 262144   # samples per channel (full block)
+REF_CHANNEL = 0
+# Bounded lag search: reference segments correlated per window (cost independent of N)
+LAG_SEGMENTS = 16
+MIN_SEGMENT = 1024
+# Window peak must exceed the median window power by this factor, otherwise the
+# true delay is likely outside the window (noise maxima stay below ~20x)
+LAG_PEAK_RATIO = 25.0
+# Samples on each side of the peak treated as main lobe for peak-to-sidelobe ratio
+PSR_EXCLUDE = 2
+# Columns of batch result files
+RESULT_COLUMNS = ['block', 'channel', 'delay', 'peak_index', 'peak_value', 'search',
+                  'frac_delay', 'phase_deg', 'psr_db']
 
-def load_ch_bin(path):
-    raw = np.fromfile(path, dtype=np.uint8)
+
+def load_ch_bin(path, n=None):
+    """Load a channel block as complex64 (I - 127.5) + 1j * (Q - 127.5); None if missing"""
+    raw = open_block(path)
+    if raw is None:
+        return None
     # RTL: consecutive I,Q,I,Q,... -> pairs (I,Q)
-    raw = raw.reshape(-1, 2)
-    i = raw[:, 0].astype(np.float32) - 127.5
-    q = raw[:, 1].astype(np.float32) - 127.5
-    return (i + 1j * q).astype(np.complex64)
-
-ch0 = load_ch_bin(f"{BASE}/ch0/block_{BLOCK:05d}.bin")
-ch1 = load_ch_bin(f"{BASE}/ch1/block_{BLOCK:05d}.bin")
-
-# Truncate to N samples
-ch0 = ch0[:N].copy()
-ch1 = ch1[:N].copy()
-
-# As in delay_sync: x = [channel0, zeros], y = [zeros, channel1]
-np_zeros = np.zeros(N, dtype=np.complex64)
-x_padd = np.concatenate([ch0, np_zeros])
-y_padd = np.concatenate([np_zeros, ch1])
-
-x_fft = fft(x_padd)
-y_fft = fft(y_padd)
-corr = ifft(x_fft.conj() * y_fft)
-corr_power = np.abs(corr) ** 2
-
-peak_index = int(np.argmax(corr_power))
-delay = N - peak_index
-
-print("Block 7, channels 0 and 1")
-print("Correlation length (number of checked shifts k):", len(corr_power))
-print("Peak index (peak_index):", peak_index)
-print("Channel 1 delay relative to channel 0 (samples): delays[1] = N - peak_index =", delay)
-print("Max correlation value:", corr_power[peak_index])
-
-# Several values around the peak (to see the "hill")
-half = 5
-for i in range(max(0, peak_index - half), min(len(corr_power), peak_index + half + 1)):
-    mark = " <-- peak" if i == peak_index else ""
-    print(f"  k={i}: correlation = {corr_power[i]:.2e}{mark}")
\ No newline at end of file
+    raw = raw[:len(raw) // 2 * 2].reshape(-1, 2)
+    if n is not None:
+        raw = raw[:n]
+    iq = np.subtract(raw, np.float32(127.5), dtype=np.float32)
+    return iq.view(np.complex64)[:, 0]
+
+
+def load_block_channels(base, block, channels, n=N):
+    """Stack the first n samples of several channels into a (channels, n) complex64 array
+
+    Returns (array, loaded channel list); channels with missing or short files are skipped.
+    """
+    rows = []
+    loaded = []
+    for ch in channels:
+        x = load_ch_bin(block_path(base, ch, block), n)
+        if x is not None and len(x) == n:
+            rows.append(x)
+            loaded.append(ch)
+    if not rows:
+        return np.zeros((0, n), dtype=np.complex64), []
+    return np.stack(rows), loaded
+
+
+def reference_spectrum(ref):
+    """FFT of x = [reference, zeros] (computed once, reused for every channel)"""
+    n = len(ref)
+    x_padd = np.concatenate([ref, np.zeros(n, dtype=np.complex64)])
+    return fft(x_padd)
+
+
+def correlate_with_reference(x_fft, channels):
+    """Complex correlation of each row of channels against the reference spectrum
+
+    As in delay_sync: x = [channel0, zeros], y = [zeros, channelN];
+    corr = IFFT(conj(FFT(x)) * FFT(y)). All channels go through one batched FFT.
+    """
+    k, n = channels.shape
+    y_padd = np.zeros((k, 2 * n), dtype=np.complex64)
+    y_padd[:, n:] = channels
+    y_fft = fft(y_padd, axis=-1)
+    return ifft(x_fft.conj() * y_fft, axis=-1)
+
+
+def correlation_power(corr):
+    return corr.real ** 2 + corr.imag ** 2
+
+
+def peak_metrics(corr, peak, exclude=PSR_EXCLUDE):
+    """Sub-sample offset, phase and peak-to-sidelobe ratio of a correlation peak
+
+    A parabola through |corr| at peak-1, peak, peak+1 gives the offset of the
+    true maximum in (-0.5, 0.5) samples; the phase (degrees) is the angle of
+    corr at the peak, i.e. channel phase minus reference phase. Only the
+    already computed correlation is used, no extra FFTs.
+    Returns (offset, phase_deg, psr_db).
+    """
+    offset = 0.0
+    if 0 < peak < len(corr) - 1:
+        a, b, c = np.abs(corr[peak - 1:peak + 2])
+        denom = a - 2 * b + c
+        if denom < 0:
+            offset = float(0.5 * (a - c) / denom)
+    phase_deg = float(np.degrees(np.angle(corr[peak])))
+
+    peak_power = float(abs(corr[peak]) ** 2)
+    left = corr[:max(0, peak - exclude)]
+    right = corr[peak + exclude + 1:]
+    sidelobe = max((float(np.max(np.abs(side)) ** 2) for side in (left, right) if len(side)), default=0.0)
+    psr_db = float(10 * np.log10(peak_power / sidelobe)) if sidelobe > 0 else float('inf')
+    return offset, phase_deg, psr_db
+
+
+def _next_pow2(x):
+    return 1 << (int(x) - 1).bit_length()
+
+
+def lag_window_plan(max_lag, n=N, segments=LAG_SEGMENTS):
+    """Segment length, FFT size and sample count of a bounded lag search"""
+    segment = _next_pow2(max(4 * max_lag, MIN_SEGMENT))
+    fft_size = _next_pow2(segment + 2 * max_lag)
+    available = max(0, (n - 2 * max_lag) // segment)
+    n_segments = min(segments, available)
+    return segment, fft_size, n_segments, n_segments * segment + 2 * max_lag
+
+
+def correlate_lag_window(ref, channels, max_lag, segments=LAG_SEGMENTS):
+    """Complex correlation at delays -max_lag..+max_lag only (overlap-save style)
+
+    corr(d) = sum_n conj(ref[n]) * ch[n - d], the same quantity the full 2N
+    correlation gives at peak_index = N - d. The reference is cut into segments
+    of length M; each is correlated with the matching channel span widened by
+    max_lag on both sides through FFTs of size ~M + 2 * max_lag, and the
+    partial correlations are summed. Cost depends on max_lag and segments,
+    not on the block length.
+
+    Returns (delays, corr) with corr shaped (channels, 2 * max_lag + 1).
+    """
+    k, n = channels.shape
+    segment, fft_size, n_segments, _ = lag_window_plan(max_lag, n, segments)
+    if n_segments == 0:
+        raise ValueError(f"block too short for max_lag={max_lag}")
+    offsets = max_lag + segment * np.arange(n_segments)
+
+    ref_seg = np.zeros((n_segments, fft_size), dtype=np.complex64)
+    ch_seg = np.zeros((k, n_segments, fft_size), dtype=np.complex64)
+    span = segment + 2 * max_lag
+    for i, o in enumerate(offsets):
+        ref_seg[i, :segment] = ref[o:o + segment]
+        ch_seg[:, i, :span] = channels[:, o - max_lag:o + segment + max_lag]
+
+    r = ifft(fft(ref_seg, axis=-1).conj() * fft(ch_seg, axis=-1), axis=-1).sum(axis=1)
+    r = r[:, :2 * max_lag + 1]
+    # r[m] pairs ref[n] with ch[n + m - max_lag]: delay d = max_lag - m
+    delays = max_lag - np.arange(2 * max_lag + 1)
+    return delays, r
+
+
+def estimate_block_delays(base, block, ref_channel=REF_CHANNEL, channels=None, n=N, keep_corr=False,
+                          max_lag=None, segments=LAG_SEGMENTS, min_peak_ratio=LAG_PEAK_RATIO):
+    """Delay of every channel relative to the reference for one block
+
+    Returns a list of dicts (block, channel, delay, peak_index, peak_value, search,
+    frac_delay, phase_deg, psr_db); with keep_corr each dict also carries the
+    correlation power array. With
+    max_lag only delays within +-max_lag are searched; a channel whose peak
+    lands on the window edge, or does not stand min_peak_ratio above the median
+    window power, is re-estimated with the full 2N search. Window correlation
+    power is rescaled to the full search's N - |delay| summed samples, so
+    peak_value compares across both searches.
+    """
+    if channels is None:
+        channels = [ch for ch in range(NUM_CHANNELS) if ch != ref_channel]
+    wanted = [ref_channel] + list(channels)
+
+    results = {}
+    if max_lag:
+        segment, _, n_segments, n_window = lag_window_plan(max_lag, n, segments)
+        stacked, loaded = load_block_channels(base, block, wanted, n_window)
+        if not loaded or loaded[0] != ref_channel or len(loaded) < 2:
+            return []
+        delays, corr = correlate_lag_window(stacked[0], stacked[1:], max_lag, segments)
+        corr_power = correlation_power(corr)
+        for row, ch in enumerate(loaded[1:]):
+            best = int(np.argmax(corr_power[row]))
+            ratio = corr_power[row, best] / max(float(np.median(corr_power[row])), 1e-30)
+            if abs(int(delays[best])) < max_lag and ratio >= min_peak_ratio:
+                # Coherent power grows with the square of the summed sample count
+                power = corr_power[row] * ((n - abs(int(delays[best]))) / (n_segments * segment)) ** 2
+                results[ch] = {
+                    'block': int(block),
+                    'channel': ch,
+                    'delay': int(delays[best]),
+                    'peak_index': n - int(delays[best]),
+                    'peak_value': float(power[best]),
+                    'search': 'window',
+                }
+                results[ch].update(_subsample(corr[row], best, int(delays[best])))
+                if keep_corr:
+                    # m = max_lag - d, i.e. full-search k = N - d = (N - max_lag) + m
+                    results[ch]['corr_power'] = power
+                    results[ch]['corr_offset'] = n - max_lag
+        wanted = [ref_channel] + [ch for ch in loaded[1:] if ch not in results]
+        if len(wanted) < 2:
+            return [results[ch] for ch in loaded[1:]]
+
+    stacked, loaded = load_block_channels(base, block, wanted, n)
+    if not loaded or loaded[0] != ref_channel or len(loaded) < 2:
+        return list(results.values())
+
+    x_fft = reference_spectrum(stacked[0])
+    corr = correlate_with_reference(x_fft, stacked[1:])
+    corr_power = correlation_power(corr)
+    peaks = np.argmax(corr_power, axis=-1)
+
+    for row, ch in enumerate(loaded[1:]):
+        peak_index = int(peaks[row])
+        results[ch] = {
+            'block': int(block),
+            'channel': ch,
+            'delay': n - peak_index,
+            'peak_index': peak_index,
+            'peak_value': float(corr_power[row, peak_index]),
+            'search': 'full',
+        }
+        results[ch].update(_subsample(corr[row], peak_index, n - peak_index))
+        if keep_corr:
+            results[ch]['corr_power'] = corr_power[row]
+            results[ch]['corr_offset'] = 0
+    return [results[ch] for ch in sorted(results, key=list(channels).index)]
+
+
+def _subsample(corr, peak, delay):
+    offset, phase_deg, psr_db = peak_metrics(corr, peak)
+    # Correlation index grows as the delay shrinks (k = N - d)
+    return {'frac_delay': delay - offset, 'phase_deg': phase_deg, 'psr_db': psr_db}
+
+
+def session_blocks(base):
+    """All block numbers of a session (index.csv or directory scan)"""
+    from iq_index import load_index
+    index = load_index(base)
+    return [] if index is None else [int(b) for b in index.blocks]
+
+
+def estimate_session_delays(base, blocks, ref_channel=REF_CHANNEL, channels=None, n=N, workers=1,
+                            max_lag=None, segments=LAG_SEGMENTS, min_peak_ratio=LAG_PEAK_RATIO):
+    """Delays of every channel for every block, in block order (generator of result lists)
+
+    With workers > 1 blocks are spread over a process pool; each worker
+    memory-maps its own block files, only block numbers and small result
+    dicts cross process boundaries.
+    """
+    task = partial(estimate_block_delays, base, ref_channel=ref_channel, channels=channels, n=n,
+                   max_lag=max_lag, segments=segments, min_peak_ratio=min_peak_ratio)
+    if workers <= 1:
+        yield from map(task, blocks)
+        return
+    # One FFT thread per worker process: the pool already uses every core
+    with multiprocessing.Pool(workers, initializer=set_workers, initargs=(1,)) as pool:
+        # imap keeps block order while results stream back
+        yield from pool.imap(task, blocks, chunksize=1)
+
+
+class Throughput:
+    """Progress and throughput (blocks/s, MB/s) of a session run"""
+
+    def __init__(self, total, interval=1.0):
+        self.total = total
+        self.interval = interval
+        self.blocks = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+
+    def update(self, results, n=N, max_lag=None, segments=LAG_SEGMENTS):
+        self.blocks += 1
+        if results:
+            # Samples actually loaded (reference plus compared channels), 2 bytes per I/Q sample:
+            # a bounded search reads every channel's window, fallbacks re-read the full block
+            if max_lag:
+                self.bytes += (len(results) + 1) * lag_window_plan(max_lag, n, segments)[3] * 2
+            full = sum(r.get('search') != 'window' for r in results) if max_lag else len(results)
+            if full:
+                self.bytes += (full + 1) * n * 2
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval or self.blocks == self.total:
+            self._last_report = now
+            print(f"  [{self.blocks}/{self.total}] {self.summary()}")
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"{self.blocks / elapsed:.1f} blocks/s, "
+                f"{self.bytes / elapsed / 1e6:.1f} MB/s, {elapsed:.1f} s")
+
+
+def write_results(rows, output):
+    """Write result rows to CSV, or Parquet when output ends with .parquet"""
+    import pandas as pd
+    df = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    if output.endswith('.parquet'):
+        df.to_parquet(output, index=False)
+    else:
+        df.to_csv(output, index=False)
+    print(f"✓ Wrote {len(df)} rows to {output}")
+
+
+def print_block_report(result, ref_channel=REF_CHANNEL, half=5):
+    """Verbose single-pair report with the correlation 'hill' around the peak"""
+    corr_power = result['corr_power']
+    offset = result.get('corr_offset', 0)
+    peak_index = result['peak_index']
+    ch = result['channel']
+
+    print(f"Block {result['block']}, channels {ref_channel} and {ch}")
+    print("Correlation length (number of checked shifts k):", len(corr_power))
+    if offset:
+        print(f"  (bounded search: k={offset}..{offset + len(corr_power) - 1})")
+    print("Peak index (peak_index):", peak_index)
+    print(f"Channel {ch} delay relative to channel {ref_channel} (samples): "
+          f"delays[{ch}] = N - peak_index =", result['delay'])
+    print("Max correlation value:", corr_power[peak_index - offset])
+
+    # Several values around the peak (to see the "hill")
+    for i in range(max(offset, peak_index - half), min(offset + len(corr_power), peak_index + half + 1)):
+        mark = " <-- peak" if i == peak_index else ""
+        print(f"  k={i}: correlation = {corr_power[i - offset]:.2e}{mark}")
+    print(f"Sub-sample delay: {result['frac_delay']:.3f} samples, "
+          f"phase: {result['phase_deg']:.1f} deg, peak-to-sidelobe: {result['psr_db']:.1f} dB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate channel delays against a reference channel")
+    parser.add_argument('--base', default=BASE, help=f"session directory (default: {BASE})")
+    which = parser.add_mutually_exclusive_group()
+    which.add_argument('--block', type=int, default=None, help=f"single block, verbose report (default: {BLOCK})")
+    which.add_argument('--all', action='store_true', help="every block of the session")
+    which.add_argument('--range', type=int, nargs=2, metavar=('FIRST', 'LAST'),
+                       help="blocks FIRST..LAST (inclusive) present in the session")
+    parser.add_argument('--ref', type=int, default=REF_CHANNEL, help="reference channel")
+    parser.add_argument('--channels', type=int, nargs='+', default=None,
+                        help="channels to compare (default: all others)")
+    parser.add_argument('-n', '--samples', type=int, default=N, help="samples per channel")
+    parser.add_argument('-o', '--output', default=None, help="CSV or .parquet file for batch results")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="worker processes for batch runs (0 = one per CPU)")
+    parser.add_argument('--max-lag', type=int, default=None,
+                        help="only search delays within +-MAX_LAG samples (full search if the peak hits the edge)")
+    parser.add_argument('--segments', type=int, default=LAG_SEGMENTS,
+                        help="reference segments summed in a bounded lag search")
+    parser.add_argument('--min-peak-ratio', type=float, default=LAG_PEAK_RATIO,
+                        help="peak/median power needed to accept a bounded search result")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only report progress, not every delay")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if not args.all and args.range is None:
+        block = BLOCK if args.block is None else args.block
+        channels = args.channels or [1]
+        results = estimate_block_delays(args.base, block, args.ref, channels, args.samples, keep_corr=True,
+                                        max_lag=args.max_lag, segments=args.segments,
+                                        min_peak_ratio=args.min_peak_ratio)
+        if not results:
+            print(f"Block {block}: reference or channel files not found in {args.base}")
+            return 1
+        for result in results:
+            print_block_report(result, args.ref)
+        if args.output:
+            write_results(results, args.output)
+        return 0
+
+    blocks = session_blocks(args.base)
+    if args.range is not None:
+        first, last = args.range
+        blocks = [b for b in blocks if first <= b <= last]
+    if not blocks:
+        print(f"No blocks found in {args.base}")
+        return 1
+
+    workers = args.workers or os.cpu_count() or 1
+    print(f"Estimating delays for {len(blocks)} blocks (reference channel {args.ref}, {workers} worker(s))")
+    rows = []
+    progress = Throughput(len(blocks))
+    for results in estimate_session_delays(args.base, blocks, args.ref, args.channels, args.samples, workers,
+                                           args.max_lag, args.segments, args.min_peak_ratio):
+        if not args.quiet:
+            for r in results:
+                print(f"  block {r['block']:5d}  ch{r['channel']}: delay = {r['delay']:7d} "
+                      f"({r['frac_delay']:+.3f})  phase = {r['phase_deg']:7.1f} deg  "
+                      f"PSR = {r['psr_db']:5.1f} dB  peak = {r['peak_value']:.2e}")
+        rows.extend(results)
+        progress.update(results, args.samples, args.max_lag, args.segments)
+    print(f"✓ {len(blocks)} blocks: {progress.summary()}")
+
+    if args.output:
+        write_results(rows, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Session archive - one chunked, compressed container file per session
+Every channel block is a separately compressed chunk (zstd or LZ4 when
+installed, zlib otherwise). A dense chunk table gives O(1) access to any
+block, and the block index is embedded as columns (with the original
+index.csv rows compressed alongside, so import restores them exactly), so a
+session is a single file instead of thousands of block files plus index.csv.
+
+Blocks inside an archive are addressed like files: block_path() of a
+session.iqpack path points into the archive and open_block() reads the chunk,
+so the viewer and the correlation tools open archives with no other change.
+
+  python3 iq_archive.py export --base _logs/iq_data/session [--out session.iqpack] [--codec zstd]
+  python3 iq_archive.py import session.iqpack --out _logs/iq_data/session_restored
+  python3 iq_archive.py info session.iqpack
+"""
+
+import argparse
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from iq_blocks import ARCHIVE_SUFFIX, NUM_CHANNELS, block_filename, block_path, open_block
+from iq_index import FRAME_TYPE_DTYPE, SessionIndex, load_index
+from iq_metrics import log
+
+ARCHIVE_MAGIC = b'IQPACK\x00\x00'
+ARCHIVE_VERSION = 3
+# magic, version, codec, channels, first block, block span, indexed blocks, chunk table offset, index offset
+ARCHIVE_HEADER = struct.Struct('<8sIIIiIQQQ')
+# One entry per (block slot, channel); length 0 -> block not recorded on that channel
+CHUNK_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4'), ('size', '<u4')])
+# Version 3: compressed length and size of the original index.csv, after the index columns (0, 0 if none)
+RAW_INDEX_HEADER = struct.Struct('<QQ')
+
+CODECS = ('zstd', 'lz4', 'zlib')
+CODEC_IDS = {name: i for i, name in enumerate(CODECS)}
+DEFAULT_LEVELS = {'zstd': 3, 'lz4': 0, 'zlib': 6}
+# Compression threads of the exporter (zlib, zstd and lz4 release the GIL)
+EXPORT_WORKERS = os.cpu_count() or 1
+
+_MEMBER = re.compile(r'ch(\d+)[/\\]block_(\d+)\.bin$')
+
+
+def _import_codec(name):
+    try:
+        if name == 'zstd':
+            import zstandard
+            return zstandard
+        if name == 'lz4':
+            import lz4.frame
+            return lz4.frame
+        return zlib
+    except ImportError:
+        return None
+
+
+def available_codecs():
+    return [name for name in CODECS if _import_codec(name) is not None]
+
+
+def compressor(name, level=None):
+    """bytes -> compressed bytes for a codec"""
+    module = _import_codec(name)
+    if module is None:
+        raise ValueError(f"codec {name!r} is not available")
+    level = DEFAULT_LEVELS[name] if level is None else level
+    if name == 'zstd':
+        local = threading.local()
+
+        def compress(data):
+            # Compressor objects are not thread-safe: one per thread
+            if not hasattr(local, 'cctx'):
+                local.cctx = module.ZstdCompressor(level=level)
+            return local.cctx.compress(data)
+        return compress
+    if name == 'lz4':
+        return lambda data: module.compress(data, compression_level=level)
+    return lambda data: zlib.compress(data, level)
+
+
+def decompressor(name):
+    """compressed bytes -> bytes for a codec"""
+    module = _import_codec(name)
+    if module is None:
+        raise ValueError(f"archive uses codec {name!r}, which is not installed")
+    if name == 'zstd':
+        local = threading.local()
+
+        def decompress(data):
+            if not hasattr(local, 'dctx'):
+                local.dctx = module.ZstdDecompressor()
+            return local.dctx.decompress(data)
+        return decompress
+    if name == 'lz4':
+        return module.decompress
+    return zlib.decompress
+
+
+def split_archive_path(filepath):
+    """(archive path, channel, block) of a block path inside an archive, else None"""
+    filepath = str(filepath)
+    head, sep, member = filepath.partition(ARCHIVE_SUFFIX + os.sep)
+    if not sep:
+        return None
+    match = _MEMBER.match(member)
+    if match is None:
+        return None
+    return head + ARCHIVE_SUFFIX, int(match.group(1)), int(match.group(2))
+
+
+class SessionArchive:
+    """Read-only view of a session archive
+
+    The chunk table and index columns are memory-mapped; reading a block
+    decompresses exactly one chunk with a positional read (thread-safe).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            head = f.read(ARCHIVE_HEADER.size)
+        if len(head) < ARCHIVE_HEADER.size:
+            raise ValueError(f"{path} is not a session archive")
+        (magic, version, codec, channels, first, span, n_blocks,
+         table_offset, index_offset) = ARCHIVE_HEADER.unpack(head)
+        if magic != ARCHIVE_MAGIC or not 1 <= version <= ARCHIVE_VERSION or codec >= len(CODECS):
+            raise ValueError(f"{path} is not a session archive (version {ARCHIVE_VERSION} or older)")
+        self.codec = CODECS[codec]
+        self.channels = channels
+        self.first_block = first
+        self._decompress = decompressor(self.codec)
+        self.table = np.memmap(path, dtype=CHUNK_DTYPE, mode='r', offset=table_offset,
+                               shape=(span, channels)) if span else np.zeros((0, channels), CHUNK_DTYPE)
+        self._columns, raw_index_offset = self._read_columns(index_offset, n_blocks, version)
+        self._raw_index = None
+        if version >= 3:
+            with open(path, 'rb') as f:
+                f.seek(raw_index_offset)
+                length, size = RAW_INDEX_HEADER.unpack(f.read(RAW_INDEX_HEADER.size))
+            if length:
+                self._raw_index = (raw_index_offset + RAW_INDEX_HEADER.size, length, size)
+        self._fd = os.open(path, os.O_RDONLY)
+
+    def _read_columns(self, offset, n, version):
+        """Index columns and the offset just past them"""
+        columns = []
+        # Version 1 archives have no frame types (all DATA)
+        dtypes = (np.int64, np.int64, np.int32, np.uint8) + ((FRAME_TYPE_DTYPE,) if version >= 2 else ())
+        for dtype in dtypes:
+            columns.append(np.fromfile(self.path, dtype=dtype, count=n, offset=offset))
+            offset += n * np.dtype(dtype).itemsize
+        if version < 2:
+            columns.append(np.zeros(n, dtype=FRAME_TYPE_DTYPE))
+        timestamps, frequencies, blocks, masks, frame_types = columns
+        return (blocks, masks, timestamps, frequencies, frame_types), offset
+
+    def __del__(self):
+        fd = getattr(self, '_fd', None)
+        if fd is not None:
+            os.close(fd)
+
+    def chunk(self, block_index, channel):
+        """Chunk table entry of a block (None if not recorded)"""
+        slot = int(block_index) - self.first_block
+        if not 0 <= slot < len(self.table) or not 0 <= channel < self.channels:
+            return None
+        entry = self.table[slot, channel]
+        return entry if entry['length'] else None
+
+    def raw(self, block_index, channel):
+        """Raw uint8 block (as stored in ch{N}/block_XXXXX.bin), None if missing"""
+        entry = self.chunk(block_index, channel)
+        if entry is None:
+            return None
+        data = os.pread(self._fd, int(entry['length']), int(entry['offset']))
+        raw = np.frombuffer(self._decompress(data), dtype=np.uint8)
+        if len(raw) != entry['size']:
+            raise ValueError(f"corrupt chunk for block {block_index} ch{channel} in {self.path}")
+        return raw
+
+    def columns(self):
+        """Embedded index columns (blocks, channel masks, timestamps, frequencies, frame types)"""
+        return self._columns
+
+    def index_csv(self):
+        """Original index.csv bytes of the session, None if not stored (version < 3 or no index.csv)"""
+        if self._raw_index is None:
+            return None
+        offset, length, size = self._raw_index
+        raw = self._decompress(os.pread(self._fd, length, offset))
+        if len(raw) != size:
+            raise ValueError(f"corrupt index.csv in {self.path}")
+        return raw
+
+    def index(self, session=None):
+        if session is None:
+            session = os.path.basename(self.path)
+        return SessionIndex(session, self.path, *self._columns)
+
+    def stats(self):
+        """Stored chunks, raw and compressed bytes"""
+        stored = self.table['length'] > 0
+        return {'chunks': int(stored.sum()),
+                'raw_bytes': int(self.table['size'][stored].sum(dtype=np.int64)),
+                'stored_bytes': int(self.table['length'][stored].sum(dtype=np.int64))}
+
+
+_ARCHIVES = {}
+_ARCHIVES_LOCK = threading.Lock()
+
+
+def open_archive(path):
+    """Shared SessionArchive of a path (reopened if the file was replaced)"""
+    stamp = os.stat(path).st_mtime_ns
+    with _ARCHIVES_LOCK:
+        cached = _ARCHIVES.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    archive = SessionArchive(path)
+    with _ARCHIVES_LOCK:
+        _ARCHIVES[path] = (stamp, archive)
+    return archive
+
+
+def read_archive_block(filepath):
+    """open_block() of a path inside an archive"""
+    member = split_archive_path(filepath)
+    if member is None:
+        return None
+    path, channel, block_index = member
+    try:
+        return open_archive(path).raw(block_index, channel)
+    except (OSError, ValueError) as e:
+        log.warning(f"⚠ Could not read {filepath}: {e}")
+        return None
+
+
+def export_session(data_path, out_path=None, codec=None, level=None, workers=EXPORT_WORKERS, progress=None):
+    """Pack a session directory into one archive; returns the archive path"""
+    codec = codec or available_codecs()[0]
+    compress = compressor(codec, level)
+    if out_path is None:
+        out_path = os.path.normpath(data_path) + ARCHIVE_SUFFIX
+    index = load_index(data_path)
+    if index is None or len(index) == 0:
+        raise ValueError(f"no blocks found in {data_path}")
+
+    # Per-channel rows (Field1, channel timestamps) do not fit the block columns: keep index.csv itself
+    raw_index = b''
+    index_path = os.path.join(data_path, 'index.csv')
+    if os.path.isfile(index_path):
+        with open(index_path, 'rb') as f:
+            raw_index = f.read()
+
+    n = len(index)
+    empty = np.zeros(n, dtype=np.int64)
+    timestamps = empty if index.timestamps is None else index.timestamps
+    frequencies = empty if index.frequencies is None else index.frequencies
+    first = int(index.blocks[0])
+    span = int(index.blocks[-1]) - first + 1
+    table = np.zeros((span, NUM_CHANNELS), dtype=CHUNK_DTYPE)
+
+    def pack(position):
+        block_index = index.block_at(position)
+        chunks = []
+        for ch in index.channels_at(position):
+            raw = open_block(block_path(data_path, ch, block_index))
+            if raw is not None:
+                chunks.append((ch, len(raw), compress(memoryview(raw))))
+        return block_index, chunks
+
+    tmp_path = out_path + '.tmp'
+    with open(tmp_path, 'wb') as f, ThreadPoolExecutor(max_workers=workers) as executor:
+        f.write(bytes(ARCHIVE_HEADER.size))
+        offset = ARCHIVE_HEADER.size
+        # map() keeps block order while compressing ahead on the pool
+        for done, (block_index, chunks) in enumerate(executor.map(pack, range(n)), 1):
+            for ch, size, data in chunks:
+                table[block_index - first, ch] = (offset, len(data), size)
+                f.write(data)
+                offset += len(data)
+            if progress is not None:
+                progress(done, n)
+
+        table_offset = offset
+        f.write(table.tobytes())
+        index_offset = table_offset + table.nbytes
+        for column, dtype in ((timestamps, np.int64), (frequencies, np.int64), (index.blocks, np.int32),
+                              (index.channel_masks, np.uint8), (index.frame_types, FRAME_TYPE_DTYPE)):
+            f.write(np.asarray(column, dtype=dtype).tobytes())
+        packed_index = compress(raw_index) if raw_index else b''
+        f.write(RAW_INDEX_HEADER.pack(len(packed_index), len(raw_index)))
+        f.write(packed_index)
+
+        f.seek(0)
+        f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, CODEC_IDS[codec], NUM_CHANNELS,
+                                    first, span, n, table_offset, index_offset))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def import_archive(path, out_dir, progress=None):
+    """Unpack an archive into a session directory (ch{N}/block_XXXXX.bin and index.csv)
+
+    index.csv is restored as exported; archives without it (version < 3, or
+    sessions without index.csv) get one row per stored block and channel.
+    """
+    archive = SessionArchive(path)
+    blocks, masks, timestamps, frequencies, frame_types = archive.columns()
+    raw_index = archive.index_csv()
+    for ch in range(archive.channels):
+        os.makedirs(os.path.join(out_dir, f'ch{ch}'), exist_ok=True)
+    with open(os.path.join(out_dir, 'index.csv'), 'wb') as index_file:
+        if raw_index is not None:
+            index_file.write(raw_index)
+        for done, (block_index, mask, timestamp, frequency, frame_type) in enumerate(
+                zip(blocks.tolist(), masks.tolist(), timestamps.tolist(), frequencies.tolist(),
+                    frame_types.tolist()), 1):
+            for ch in range(archive.channels):
+                raw = archive.raw(block_index, ch) if mask >> ch & 1 else None
+                if raw is None:
+                    continue
+                raw.tofile(block_path(out_dir, ch, block_index))
+                if raw_index is None:
+                    # timestamp,block,channel,frequency,field1,frame_type,filepath
+                    index_file.write(f"{timestamp},{block_index},{ch},{frequency},0,{frame_type},"
+                                     f"ch{ch}/{block_filename(block_index)}\n".encode())
+            if progress is not None:
+                progress(done, len(blocks))
+    return out_dir
+
+
+def print_info(path):
+    archive = SessionArchive(path)
+    stats = archive.stats()
+    blocks = archive.columns()[0]
+    ratio = stats['raw_bytes'] / max(stats['stored_bytes'], 1)
+    print(f"Archive: {path} ({archive.codec})")
+    if len(blocks):
+        print(f"  Blocks: {len(blocks)} (range: {blocks[0]} to {blocks[-1]}), {stats['chunks']} chunks")
+    print(f"  Raw: {stats['raw_bytes'] / 1e6:.1f} MB, stored: {stats['stored_bytes'] / 1e6:.1f} MB "
+          f"(ratio {ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pack sessions into compressed archives and back")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="session directory -> archive")
+    export.add_argument('--base', default="_logs/iq_data/session", help="session directory")
+    export.add_argument('--out', help=f"archive path (default: <base>{ARCHIVE_SUFFIX})")
+    export.add_argument('--codec', choices=CODECS, help=f"default: best installed ({', '.join(available_codecs())})")
+    export.add_argument('--level', type=int, help="compression level (codec default if omitted)")
+    export.add_argument('--workers', type=int, default=EXPORT_WORKERS, help="compression threads")
+    unpack = commands.add_parser('import', help="archive -> session directory")
+    unpack.add_argument('archive')
+    unpack.add_argument('--out', required=True, help="session directory to create")
+    info = commands.add_parser('info', help="show archive contents")
+    info.add_argument('archive')
+    args = parser.parse_args(argv)
+
+    def report(done, total):
+        if done % 20 == 0 or done == total:
+            print(f"  [{done}/{total}]")
+
+    try:
+        if args.command == 'export':
+            path = export_session(args.base, args.out, args.codec, args.level, args.workers, report)
+            print(f"✓ Wrote {path}")
+            print_info(path)
+        elif args.command == 'import':
+            import_archive(args.archive, args.out, report)
+            print(f"✓ Unpacked {args.archive} into {args.out}")
+        else:
+            print_info(args.archive)
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
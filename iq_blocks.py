@@ -0,0 +1,254 @@
+"""
+IQ block reader - memory-mapped access to ch{N}/block_XXXXX.bin files
+Blocks are exposed as lazy uint8 views; only the requested sample window is decoded
+Block paths inside a session archive (session.iqpack/ch{N}/...) read the compressed chunk
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from iq_metrics import timed
+
+# RTL-SDR block layout: interleaved unsigned 8-bit I,Q,I,Q,...
+BYTES_PER_SAMPLE = 2
+SAMPLES_PER_BLOCK = 262144   # daq_buffer_size
+NUM_CHANNELS = 4
+# Session archive files (see iq_archive.py); blocks inside are addressed as <archive>/ch{N}/block_XXXXX.bin
+ARCHIVE_SUFFIX = '.iqpack'
+
+# Memory budget of the process-wide decoded block cache (bytes)
+DEFAULT_CACHE_BYTES = int(os.environ.get('IQ_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def block_filename(block_index):
+    """File name of a block inside a channel directory"""
+    return f'block_{block_index:05d}.bin'
+
+
+def block_path(session_path, channel, block_index):
+    """Full path of a channel block file"""
+    return os.path.join(session_path, f'ch{channel}', block_filename(block_index))
+
+
+def session_file(session_path, name):
+    """Path of a per-session cache file: inside the session directory, next to an archive"""
+    if session_path.endswith(ARCHIVE_SUFFIX):
+        return f'{session_path[:-len(ARCHIVE_SUFFIX)]}.{name}'
+    return os.path.join(session_path, name)
+
+
+def open_block(filepath):
+    """Memory-map a block file as a read-only uint8 array (None if missing or empty)"""
+    if ARCHIVE_SUFFIX + os.sep in str(filepath):
+        from iq_archive import read_archive_block
+        raw = read_archive_block(filepath)
+        return raw if raw is not None and len(raw) >= BYTES_PER_SAMPLE else None
+    try:
+        if os.path.getsize(filepath) < BYTES_PER_SAMPLE:
+            return None
+    except OSError:
+        return None
+    return np.memmap(filepath, dtype=np.uint8, mode='r')
+
+
+def num_samples(raw):
+    """Number of complete I/Q pairs in a raw block"""
+    return len(raw) // BYTES_PER_SAMPLE
+
+
+def _window(total, start, count):
+    """Clamp a (start, count) sample window to [0, total)"""
+    start = min(max(int(start), 0), total)
+    stop = total if count is None else min(start + max(int(count), 0), total)
+    return start, stop
+
+
+def decode_pairs(raw, start=0, count=None):
+    """Convert a window of raw uint8 I/Q pairs to an (n, 2) float32 array in range -1.0 to +1.0
+
+    Only bytes of the requested window are touched.
+    """
+    start, stop = _window(num_samples(raw), start, count)
+
+    # RTL: consecutive I,Q,I,Q,... -> pairs (I,Q)
+    pairs = raw[start * BYTES_PER_SAMPLE:stop * BYTES_PER_SAMPLE].reshape(-1, 2)
+    iq = np.subtract(pairs, np.float32(127.5), dtype=np.float32)
+    iq /= np.float32(127.5)
+    return iq
+
+
+def decode_iq(raw, start=0, count=None):
+    """Decode a sample window; returns (I, Q) as views into one (n, 2) float32 array"""
+    iq = decode_pairs(raw, start, count)
+    return iq[:, 0], iq[:, 1]
+
+
+def as_complex(pairs):
+    """Zero-copy complex64 view of a C-contiguous (n, 2) float32 I/Q array"""
+    return np.ascontiguousarray(pairs).view(np.complex64)[:, 0]
+
+
+class BlockReader:
+    """Lazy reader for the block files of one session directory"""
+
+    def __init__(self, session_path):
+        self.session_path = session_path
+
+    def path(self, block_index, channel):
+        return block_path(self.session_path, channel, block_index)
+
+    def raw(self, block_index, channel):
+        """Raw uint8 memmap of a block, or None if the file is missing/empty"""
+        return open_block(self.path(block_index, channel))
+
+    def read_iq(self, block_index, channel, start=0, count=None):
+        """Decoded (I, Q) window of a block, or None if the file is missing/empty"""
+        raw = self.raw(block_index, channel)
+        if raw is None:
+            return None
+        return decode_iq(raw, start, count)
+
+
+class BlockCache:
+    """Thread-safe LRU cache of decoded I/Q windows keyed by (session, block, channel)
+
+    Each entry holds one contiguous decoded window of a channel block; a request
+    overlapping the cached window widens it. Entries are evicted least recently
+    used first until the total decoded size fits in max_bytes.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, prefetch_workers=2):
+        self.max_bytes = int(max_bytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+        self._entries = OrderedDict()   # key -> (start, total, iq)
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._prefetch_workers = prefetch_workers
+        self._executor = None
+
+    def get_iq(self, key, filepath, start=0, count=None):
+        """(I, Q) window of a channel block, or None if the file is missing/empty"""
+        iq = self.get_pairs(key, filepath, start, count)
+        if iq is None:
+            return None
+        return iq[:, 0], iq[:, 1]
+
+    def get_pairs(self, key, filepath, start=0, count=None):
+        """(n, 2) float32 I/Q window of a channel block, or None if the file is missing/empty"""
+        return self._get(key, filepath, start, count, record=True)
+
+    def _lookup(self, key, start, count):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        first, total, iq = entry
+        start, stop = _window(total, start, count)
+        if first <= start and stop <= first + len(iq):
+            self._entries.move_to_end(key)
+            return entry, iq[start - first:stop - first]
+        return entry, None
+
+    def _get(self, key, filepath, start, count, record):
+        with self._lock:
+            entry, window = self._lookup(key, start, count)
+            if window is not None:
+                if record:
+                    self.hits += 1
+                return window
+            if record:
+                self.misses += 1
+
+        with timed('file_read'):
+            raw = open_block(filepath)
+        if raw is None:
+            return None
+        total = num_samples(raw)
+        lo, hi = _window(total, start, count)
+        if entry is not None and entry[1] == total:
+            # Widen the cached window instead of keeping two overlapping copies
+            first, _, cached = entry
+            if first <= hi and lo <= first + len(cached):
+                lo, hi = min(lo, first), max(hi, first + len(cached))
+        # Pages of the mapped file are read in here
+        with timed('decode'):
+            iq = decode_pairs(raw, lo, hi - lo)
+        iq.flags.writeable = False
+        self._store(key, lo, total, iq)
+
+        start, stop = _window(total, start, count)
+        return iq[start - lo:stop - lo]
+
+    def _store(self, key, first, total, iq):
+        if iq.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[2].nbytes
+            self._entries[key] = (first, total, iq)
+            self.current_bytes += iq.nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, _, iq) = self._entries.popitem(last=False)
+            self.current_bytes -= iq.nbytes
+            self.evictions += 1
+
+    def set_budget(self, max_bytes):
+        """Change the memory budget, evicting immediately if needed"""
+        with self._lock:
+            self.max_bytes = int(max_bytes)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def prefetch(self, requests):
+        """Decode (key, filepath, start, count) requests on background threads"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._prefetch_workers,
+                                                thread_name_prefix='iq-prefetch')
+        for key, filepath, start, count in requests:
+            with self._lock:
+                _, window = self._lookup(key, start, count)
+                if window is not None or key in self._pending:
+                    continue
+                self._pending.add(key)
+            self._executor.submit(self._prefetch_one, key, filepath, start, count)
+
+    def _prefetch_one(self, key, filepath, start, count):
+        try:
+            if self._get(key, filepath, start, count, record=False) is not None:
+                with self._lock:
+                    self.prefetched += 1
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def stats(self):
+        """Counters for monitoring: hits, misses, evictions, size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'prefetched': self.prefetched,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+
+# Process-wide cache shared by all Dash callbacks
+BLOCK_CACHE = BlockCache()
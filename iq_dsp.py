@@ -0,0 +1,109 @@
+"""
+DSP helpers for the IQ viewer - display decimation and spectral estimation
+"""
+
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from iq_fft import fft
+
+# Points per trace sent to the browser (about the pixel width of a plot)
+DISPLAY_POINTS = 2000
+
+# Spectral estimation defaults
+PSD_FFT_SIZE = 1024
+PSD_OVERLAP = 0.5
+PSD_WINDOW = 'hann'
+WINDOWS = {
+    'hann': np.hanning,
+    'hamming': np.hamming,
+    'blackman': np.blackman,
+    'rect': np.ones,
+}
+# Segments transformed per batch (bounds temporary memory on full blocks)
+SEGMENT_CHUNK = 128
+
+
+def minmax_indices(n, y, n_out=DISPLAY_POINTS):
+    """Indices of the min and max sample of each of n_out/2 equal buckets, in time order"""
+    if n <= n_out:
+        return np.arange(n)
+    n_buckets = max(1, n_out // 2)
+    size = -(-n // n_buckets)   # ceil
+    padded = np.empty(n_buckets * size, dtype=y.dtype)
+    padded[:n] = y
+    padded[n:] = y[n - 1]
+    buckets = padded.reshape(n_buckets, size)
+    base = np.arange(n_buckets) * size
+    lo = base + buckets.argmin(axis=1)
+    hi = base + buckets.argmax(axis=1)
+    # Keep the two extremes of a bucket in time order
+    idx = np.empty(2 * n_buckets, dtype=np.int64)
+    idx[0::2] = np.minimum(lo, hi)
+    idx[1::2] = np.maximum(lo, hi)
+    idx = np.minimum(idx, n - 1)
+    return idx[np.concatenate(([True], np.diff(idx) != 0))]
+
+
+def minmax_decimate(x, y, n_out=DISPLAY_POINTS):
+    """Reduce a trace to about n_out points keeping the min/max envelope (all peaks)"""
+    idx = minmax_indices(len(y), y, n_out)
+    return x[idx], y[idx]
+
+
+def stride_decimate(n, n_out=DISPLAY_POINTS):
+    """Uniform stride keeping at most n_out of n points (for scatter plots)"""
+    return max(1, -(-n // n_out))
+
+
+@lru_cache(maxsize=32)
+def get_window(name, size):
+    """Cached float32 window of a given size (read-only)"""
+    window = WINDOWS[name](size).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=32)
+def fft_frequencies(size, sample_rate):
+    """Cached fftshift-ed frequency vector in Hz (read-only)"""
+    freqs = np.fft.fftshift(np.fft.fftfreq(size, d=1.0 / sample_rate))
+    freqs.flags.writeable = False
+    return freqs
+
+
+def welch_psd(x, sample_rate, fft_size=PSD_FFT_SIZE, overlap=PSD_OVERLAP, window=PSD_WINDOW):
+    """Welch-averaged power spectral density of each row of x, in dB/Hz
+
+    x is (channels, n) complex; all channels are transformed together as one
+    batched FFT over overlapping windowed segments. Returns an fftshift-ed
+    (channels, fft_size) float32 array.
+    """
+    x = np.atleast_2d(x)
+    n = x.shape[-1]
+    if n < fft_size:
+        # Short window: one zero-padded segment
+        x = np.pad(x, ((0, 0), (0, fft_size - n)))
+    step = max(1, int(round(fft_size * (1.0 - overlap))))
+    segments = sliding_window_view(x, fft_size, axis=-1)[:, ::step, :]
+    n_segments = segments.shape[1]
+    w = get_window(window, fft_size)
+
+    power = np.zeros((x.shape[0], fft_size), dtype=np.float64)
+    for i in range(0, n_segments, SEGMENT_CHUNK):
+        spectrum = fft(segments[:, i:i + SEGMENT_CHUNK, :] * w, axis=-1)
+        power += (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=1)
+
+    psd = power / (n_segments * sample_rate * float(np.sum(w.astype(np.float64) ** 2)))
+    return (10 * np.log10(np.fft.fftshift(psd, axes=-1) + 1e-20)).astype(np.float32)
+
+
+def pool_bins(values, n_out=DISPLAY_POINTS):
+    """Max-pool the last axis down to at most n_out bins (keeps spectral peaks)"""
+    n = values.shape[-1]
+    if n <= n_out:
+        return values
+    factor = -(-n // n_out)
+    n_keep = (n // factor) * factor
+    return values[..., :n_keep].reshape(values.shape[:-1] + (n_keep // factor, factor)).max(axis=-1)
@@ -0,0 +1,126 @@
+"""
+FFT backend for the IQ tools - single precision end to end
+Uses pyFFTW with cached plans when installed, otherwise scipy.fft with worker
+threads, otherwise numpy.fft. Inputs are cast to complex64 and results stay
+complex64 (numpy < 2.0 computes in double, the result is cast back).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+BACKENDS = ('pyfftw', 'scipy', 'numpy')
+# Threads per transform (IQ_FFT_WORKERS overrides; process pools set 1 per worker)
+FFT_WORKERS = int(os.environ.get('IQ_FFT_WORKERS', os.cpu_count() or 1))
+# Cached pyFFTW plans (one per shape/axis/direction)
+PLAN_CACHE_SIZE = 16
+
+
+def _import_backend(name):
+    try:
+        if name == 'pyfftw':
+            import pyfftw
+            import pyfftw.builders
+            return pyfftw
+        if name == 'scipy':
+            import scipy.fft
+            return scipy.fft
+        return np.fft if name == 'numpy' else None
+    except ImportError:
+        return None
+
+
+def available_backends():
+    return [name for name in BACKENDS if _import_backend(name) is not None]
+
+
+class FFTBackend:
+    """Forward/inverse complex64 FFT along one axis with a fixed implementation"""
+
+    def __init__(self, name=None, workers=FFT_WORKERS):
+        if name is None:
+            name = os.environ.get('IQ_FFT_BACKEND') or available_backends()[0]
+        self.module = _import_backend(name)
+        if self.module is None:
+            raise ValueError(f"FFT backend {name!r} is not available")
+        self.name = name
+        self.workers = max(1, int(workers))
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _plan(self, x, axis, inverse):
+        """(plan, lock) for the shape of x; the lock guards the plan's input and output buffers"""
+        key = (x.shape, axis, inverse)
+        with self._lock:
+            entry = self._plans.get(key)
+            if entry is not None:
+                self._plans.move_to_end(key)
+                return entry
+        builder = self.module.builders.ifft if inverse else self.module.builders.fft
+        plan = builder(np.empty(x.shape, dtype=np.complex64), axis=axis, threads=self.workers,
+                       planner_effort='FFTW_ESTIMATE')
+        with self._lock:
+            entry = self._plans.setdefault(key, (plan, threading.Lock()))
+            self._plans.move_to_end(key)
+            if len(self._plans) > PLAN_CACHE_SIZE:
+                self._plans.popitem(last=False)
+        return entry
+
+    def _transform(self, x, axis, inverse):
+        x = np.asarray(x)
+        if x.dtype != np.complex64:
+            x = x.astype(np.complex64)
+        if self.name == 'pyfftw':
+            # Plans are shared between threads (player, prefetch, requests) and own their
+            # buffers: copy in, execute and copy out under the plan's lock
+            plan, lock = self._plan(x, axis, inverse)
+            with lock:
+                return plan(x).copy()
+        if self.name == 'scipy':
+            func = self.module.ifft if inverse else self.module.fft
+            return func(x, axis=axis, workers=self.workers)
+        func = np.fft.ifft if inverse else np.fft.fft
+        return func(x, axis=axis).astype(np.complex64, copy=False)
+
+    def fft(self, x, axis=-1):
+        return self._transform(x, axis, False)
+
+    def ifft(self, x, axis=-1):
+        return self._transform(x, axis, True)
+
+
+# Chosen on first use, so importing this module does not import an FFT library
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def get_backend():
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                _BACKEND = FFTBackend()
+    return _BACKEND
+
+
+def set_backend(name=None, workers=None):
+    """Switch the module-wide backend (None keeps the default choice / worker count)"""
+    global _BACKEND
+    if workers is None:
+        workers = FFT_WORKERS if _BACKEND is None else _BACKEND.workers
+    _BACKEND = FFTBackend(name, workers)
+    return _BACKEND
+
+
+def set_workers(workers):
+    """Threads per transform for the current backend (e.g. 1 inside process pools)"""
+    return set_backend(None if _BACKEND is None else _BACKEND.name, workers)
+
+
+def fft(x, axis=-1):
+    return get_backend().fft(x, axis)
+
+
+def ifft(x, axis=-1):
+    return get_backend().ifft(x, axis)
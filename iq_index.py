@@ -0,0 +1,517 @@
+"""
+Server-side block index - array-backed session indexes shared by Dash callbacks
+Clients only keep a small (handle, version) reference to an index in this process
+"""
+
+import io
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+import numpy as np
+
+from iq_blocks import ARCHIVE_SUFFIX, NUM_CHANNELS
+from iq_metrics import log
+
+# index.csv row format written by the DAQ (no header):
+# timestamp,block,channel,frequency,field1,frame_type,filepath
+INDEX_COLUMNS = ['Timestamp', 'Block', 'Channel', 'Frequency', 'Field1', 'FrameType', 'FilePath']
+INDEX_DTYPES = {
+    'Timestamp': np.int64,    # ms since epoch
+    'Block': np.int32,
+    'Channel': np.int8,
+    'Frequency': np.int64,    # Hz
+    'FrameType': np.uint8,    # IQ header frame type, see FRAME_TYPES
+}
+
+# Heimdall IQ frame types
+FRAME_TYPES = {0: 'DATA', 1: 'DUMMY', 2: 'RAMP', 3: 'CAL', 4: 'TRIGW'}
+FRAME_TYPE_DTYPE = np.uint8
+
+# Binary sidecar next to index.csv: header + columnar arrays
+SIDECAR_NAME = 'index.iqidx'
+SIDECAR_MAGIC = b'IQINDEX\x00'
+SIDECAR_VERSION = 2
+# magic, version, source, n_blocks, csv_offset, source_mtime_ns, head_crc
+SIDECAR_HEADER = struct.Struct('<8sIIQQqI4x')
+SOURCE_CSV = 0
+SOURCE_SCAN = 1
+# Bytes of index.csv hashed to detect a rewritten (not appended) file
+HEAD_CRC_BYTES = 4096
+
+# One bit per channel: bit c set -> ch{c}/block_XXXXX.bin recorded
+CHANNEL_MASK_DTYPE = np.uint8
+ALL_CHANNELS_MASK = (1 << NUM_CHANNELS) - 1
+
+
+def parse_channel_list(channels_raw):
+    """Normalize a ChannelList cell to a list of channel numbers"""
+    # Convert ChannelList to list if it's a string
+    if isinstance(channels_raw, str):
+        # Parse string like "[0, 1, 2, 3]" or "0,1,2,3"
+        try:
+            return json.loads(channels_raw)
+        except ValueError:
+            return [int(x.strip()) for x in channels_raw.strip('[]').split(',') if x.strip().isdigit()]
+    elif isinstance(channels_raw, (list, tuple, np.ndarray)):
+        return [int(c) for c in channels_raw]
+    # Default: try all 4 channels
+    return [0, 1, 2, 3]
+
+
+def channels_to_mask(channels):
+    """Channel list -> bitmask"""
+    mask = 0
+    for c in channels:
+        mask |= 1 << int(c)
+    return mask
+
+
+def mask_to_channels(mask):
+    """Bitmask -> sorted channel list"""
+    mask = int(mask)
+    return [c for c in range(8 * np.dtype(CHANNEL_MASK_DTYPE).itemsize) if mask >> c & 1]
+
+
+def empty_columns():
+    """Index columns (blocks, masks, timestamps, frequencies, frame types) of no blocks"""
+    return (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=CHANNEL_MASK_DTYPE), np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int64), np.zeros(0, dtype=FRAME_TYPE_DTYPE))
+
+
+def count_channels(masks):
+    """Number of channels set in each mask (vectorized popcount)"""
+    masks = np.asarray(masks, dtype=CHANNEL_MASK_DTYPE)
+    return np.unpackbits(masks[:, None], axis=1).sum(axis=1).astype(np.int8)
+
+
+def csv_has_header(index_path):
+    """True if the first field of the first line is not a number"""
+    with open(index_path, 'r') as f:
+        first_line = f.readline().strip()
+    # If first line contains letters, it's a header
+    return any(c.isalpha() for c in first_line.split(',')[0])
+
+
+def read_index_csv(index_path, has_header=False):
+    """Read raw DAQ index rows with explicit dtypes"""
+    # pandas is only needed to parse CSV rows; loads from the sidecar do without it
+    import pandas as pd
+    return pd.read_csv(index_path,
+                       header=0 if has_header else None,
+                       names=INDEX_COLUMNS,
+                       usecols=list(INDEX_DTYPES),
+                       dtype=INDEX_DTYPES,
+                       engine='c')
+
+
+def read_index_rows(index_path, offset=0, has_header=False):
+    """Read complete index rows starting at a byte offset
+
+    A trailing line without newline (still being written) is left for the
+    next call. Returns (df_raw, new_offset).
+    """
+    with open(index_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return None, offset
+    header = has_header and offset == 0
+    if header and data.count(b'\n', 0, end) < 2:
+        return None, offset
+    df_raw = read_index_csv(io.BytesIO(data[:end]), header)
+    return df_raw, offset + end
+
+
+def _head_crc(index_path, length):
+    with open(index_path, 'rb') as f:
+        return zlib.crc32(f.read(min(length, HEAD_CRC_BYTES)))
+
+
+def aggregate_blocks(df_raw):
+    """Collapse per-channel rows into per-block arrays in one groupby pass
+
+    Returns (blocks int32, channel_masks uint8, timestamps int64, frequencies int64,
+    frame_types uint8), sorted by block number. Timestamp is the earliest channel
+    timestamp of a block, frequency and frame type the first ones recorded.
+    """
+    bits = np.left_shift(np.int64(1), df_raw['Channel'].to_numpy(dtype=np.int64))
+    grouped = (df_raw.assign(Bit=bits)
+               .drop_duplicates(['Block', 'Channel'])
+               .groupby('Block', sort=True)
+               .agg(Mask=('Bit', 'sum'),
+                    Timestamp=('Timestamp', 'min'),
+                    Frequency=('Frequency', 'first'),
+                    FrameType=('FrameType', 'first')))
+    return (grouped.index.to_numpy(dtype=np.int32),
+            grouped['Mask'].to_numpy(dtype=CHANNEL_MASK_DTYPE),
+            grouped['Timestamp'].to_numpy(dtype=np.int64),
+            grouped['Frequency'].to_numpy(dtype=np.int64),
+            grouped['FrameType'].to_numpy(dtype=FRAME_TYPE_DTYPE))
+
+
+class SessionIndex:
+    """Array-backed index of the blocks of one session
+
+    Position i of the block slider maps to blocks[i] in O(1). Channel
+    membership is a bitmask per block. The sorted positions of every frame
+    type are computed once, so a view of one type maps its positions in O(1) too.
+    Timestamps are looked up by binary search over the int64 capture times.
+    """
+
+    def __init__(self, session, path, blocks, channel_masks, timestamps=None, frequencies=None,
+                 frame_types=None):
+        blocks = np.asarray(blocks, dtype=np.int32)
+        order = np.argsort(blocks, kind='stable')
+        self.session = session
+        self.path = path
+        self.blocks = blocks[order]
+        self.channel_masks = np.asarray(channel_masks, dtype=CHANNEL_MASK_DTYPE)[order]
+        self.timestamps = None if timestamps is None else np.asarray(timestamps, dtype=np.int64)[order]
+        self.frequencies = None if frequencies is None else np.asarray(frequencies, dtype=np.int64)[order]
+        # Unknown frame types (directory scan, block tables) count as DATA
+        if frame_types is None:
+            self.frame_types = np.zeros(len(self.blocks), dtype=FRAME_TYPE_DTYPE)
+        else:
+            self.frame_types = np.asarray(frame_types, dtype=FRAME_TYPE_DTYPE)[order]
+        by_type = np.argsort(self.frame_types, kind='stable')
+        types, starts = np.unique(self.frame_types[by_type], return_index=True)
+        self.type_positions = {int(t): p for t, p in zip(types, np.split(by_type, starts[1:]))}
+        self._views = {}
+        self._time_sorted = None
+        self._timed = None
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def block_at(self, position):
+        """Block number at a slider position"""
+        return int(self.blocks[position])
+
+    def channels_at(self, position):
+        """Channels recorded for the block at a slider position"""
+        return mask_to_channels(self.channel_masks[position])
+
+    def channel_counts(self):
+        return count_channels(self.channel_masks)
+
+    def frame_type_at(self, position):
+        """Frame type name of the block at a slider position"""
+        frame_type = int(self.frame_types[position])
+        return FRAME_TYPES.get(frame_type, str(frame_type))
+
+    def type_counts(self):
+        """Blocks per frame type"""
+        return {t: len(p) for t, p in self.type_positions.items()}
+
+    def view(self, frame_type=None):
+        """Index of the blocks of one frame type (None or 'all': this index), built once per type"""
+        if frame_type is None or frame_type == 'all':
+            return self
+        frame_type = int(frame_type)
+        view = self._views.get(frame_type)
+        if view is None:
+            keep = self.type_positions.get(frame_type, np.zeros(0, dtype=np.int64))
+            optional = [None if c is None else c[keep] for c in (self.timestamps, self.frequencies)]
+            view = SessionIndex(self.session, self.path, self.blocks[keep], self.channel_masks[keep],
+                                *optional, self.frame_types[keep])
+            self._views[frame_type] = view
+        return view
+
+    def timed(self):
+        """True if the blocks carry capture timestamps (not a directory scan or block table)"""
+        if self._timed is None:
+            self._timed = self.timestamps is not None and bool(self.timestamps.any())
+        return self._timed
+
+    def time_sorted(self):
+        """(timestamps ascending, their positions), built once
+
+        Positions is None when block order already is capture order (the usual
+        case), so no permutation has to be stored.
+        """
+        if self._time_sorted is None:
+            timestamps = self.timestamps if self.timestamps is not None else np.zeros(0, dtype=np.int64)
+            if np.all(timestamps[1:] >= timestamps[:-1]):
+                self._time_sorted = (timestamps, None)
+            else:
+                order = np.argsort(timestamps, kind='stable')
+                self._time_sorted = (timestamps[order], order)
+        return self._time_sorted
+
+    def position_at_time(self, time_ms):
+        """Slider position of the block captured closest to time_ms (None without timestamps)"""
+        if not self.timed():
+            return None
+        timestamps, order = self.time_sorted()
+        time_ms = np.int64(round(time_ms))
+        i = int(np.searchsorted(timestamps, time_ms))
+        if i == len(timestamps) or (i > 0 and time_ms - timestamps[i - 1] <= timestamps[i] - time_ms):
+            i -= 1
+        return i if order is None else int(order[i])
+
+    def positions_between(self, t0_ms, t1_ms):
+        """Ascending slider positions of the blocks captured in [t0_ms, t1_ms]"""
+        if not self.timed():
+            return np.zeros(0, dtype=np.int64)
+        timestamps, order = self.time_sorted()
+        lo = int(np.searchsorted(timestamps, np.int64(np.ceil(t0_ms)), side='left'))
+        hi = int(np.searchsorted(timestamps, np.int64(np.floor(t1_ms)), side='right'))
+        if order is None:
+            return np.arange(lo, hi)
+        return np.sort(order[lo:hi])
+
+    def position_of(self, block_index):
+        """Slider position of a block number (None if not indexed)"""
+        position = int(np.searchsorted(self.blocks, block_index))
+        if position < len(self.blocks) and self.blocks[position] == block_index:
+            return position
+        return None
+
+
+def merge_blocks(old, new):
+    """Merge two index column tuples, OR-ing masks of shared blocks"""
+    blocks = np.concatenate([old[0], new[0]])
+    unique, first, inverse = np.unique(blocks, return_index=True, return_inverse=True)
+    masks = np.zeros(len(unique), dtype=CHANNEL_MASK_DTYPE)
+    np.bitwise_or.at(masks, inverse, np.concatenate([old[1], new[1]]))
+    timestamps = np.full(len(unique), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(timestamps, inverse, np.concatenate([old[2], new[2]]))
+    frequencies = np.concatenate([old[3], new[3]])[first]
+    frame_types = np.concatenate([old[4], new[4]])[first]
+    return unique.astype(np.int32), masks, timestamps, frequencies, frame_types
+
+
+def sidecar_path(data_path):
+    return os.path.join(data_path, SIDECAR_NAME)
+
+
+def read_sidecar(path):
+    """Read a binary index sidecar; returns (header dict, column tuple) or None"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SIDECAR_HEADER.size)
+            if len(head) < SIDECAR_HEADER.size:
+                return None
+            magic, version, source, n, csv_offset, mtime_ns, head_crc = SIDECAR_HEADER.unpack(head)
+            if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION:
+                return None
+            timestamps = np.fromfile(f, dtype=np.int64, count=n)
+            frequencies = np.fromfile(f, dtype=np.int64, count=n)
+            blocks = np.fromfile(f, dtype=np.int32, count=n)
+            masks = np.fromfile(f, dtype=CHANNEL_MASK_DTYPE, count=n)
+            frame_types = np.fromfile(f, dtype=FRAME_TYPE_DTYPE, count=n)
+    except OSError:
+        return None
+    if len(frame_types) != n:
+        return None
+    header = {'source': source, 'csv_offset': csv_offset, 'mtime_ns': mtime_ns, 'head_crc': head_crc}
+    return header, (blocks, masks, timestamps, frequencies, frame_types)
+
+
+def write_sidecar(path, columns, source, csv_offset=0, mtime_ns=0, head_crc=0):
+    """Atomically write a binary index sidecar (silently skipped on read-only sessions)"""
+    blocks, masks, timestamps, frequencies, frame_types = columns
+    tmp_path = None
+    try:
+        # A unique temporary file per writer: concurrent writers (viewer and CLI) never share one
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=SIDECAR_NAME, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SIDECAR_HEADER.pack(SIDECAR_MAGIC, SIDECAR_VERSION, source, len(blocks),
+                                        csv_offset, mtime_ns, head_crc))
+            np.asarray(timestamps, dtype=np.int64).tofile(f)
+            np.asarray(frequencies, dtype=np.int64).tofile(f)
+            np.asarray(blocks, dtype=np.int32).tofile(f)
+            np.asarray(masks, dtype=CHANNEL_MASK_DTYPE).tofile(f)
+            np.asarray(frame_types, dtype=FRAME_TYPE_DTYPE).tofile(f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log.warning(f"⚠ Could not write index sidecar {path}: {e}")
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def load_index(data_path, session='session'):
+    """Load the block index of a session directory (index.csv or directory scan) or archive
+
+    A binary sidecar (index.iqidx) caches the parsed index; only index.csv rows
+    appended since the last load are parsed, and the sidecar is rebuilt when
+    index.csv was rewritten or the channel directories changed. Session
+    archives (*.iqpack) carry their index embedded.
+    """
+    if not os.path.exists(data_path):
+        log.warning(f"Data path {data_path} not found")
+        return None
+
+    if data_path.endswith(ARCHIVE_SUFFIX):
+        from iq_archive import open_archive
+        try:
+            index = open_archive(data_path).index(session)
+        except (OSError, ValueError) as e:
+            log.error(f"Error reading archive {data_path}: {e}")
+            return None
+        log.info(f"✓ Loaded {len(index)} blocks from archive {data_path}")
+        return index
+
+    # Check for index.csv
+    index_path = os.path.join(data_path, 'index.csv')
+
+    if os.path.exists(index_path):
+        log.info(f"Loading index from {index_path}")
+        try:
+            has_header = csv_has_header(index_path)
+            if has_header:
+                import pandas as pd
+                columns = pd.read_csv(index_path, nrows=0).columns
+                if 'Block' not in columns:
+                    return _load_block_table(index_path, data_path, session)
+
+            columns = _update_csv_sidecar(index_path, sidecar_path(data_path), has_header)
+            index = SessionIndex(session, data_path, *columns)
+            log.info(f"✓ Processed into {len(index)} unique blocks")
+            return index
+        except Exception as e:
+            log.error(f"Error reading index.csv: {e}")
+            import traceback
+            traceback.print_exc()
+
+    # If no index.csv, scan directories
+    log.info("No index.csv found, scanning directories...")
+    try:
+        # Look for ch0 to determine blocks
+        ch0_path = os.path.join(data_path, 'ch0')
+        if not os.path.exists(ch0_path):
+            log.warning(f"ch0 directory not found in {data_path}")
+            return None
+
+        # Any file added/removed bumps its directory mtime
+        ch_dirs = [os.path.join(data_path, f'ch{ch}') for ch in range(NUM_CHANNELS)]
+        mtime_ns = max(os.stat(d).st_mtime_ns for d in ch_dirs if os.path.isdir(d))
+
+        cached = read_sidecar(sidecar_path(data_path))
+        if cached and cached[0]['source'] == SOURCE_SCAN and cached[0]['mtime_ns'] == mtime_ns:
+            blocks, masks = cached[1][:2]
+            log.info(f"✓ Loaded {len(blocks)} blocks from index sidecar")
+        else:
+            blocks, masks = scan_blocks(data_path)
+            empty = np.zeros(len(blocks), dtype=np.int64)
+            write_sidecar(sidecar_path(data_path), (blocks, masks, empty, empty, empty.astype(FRAME_TYPE_DTYPE)),
+                          SOURCE_SCAN, mtime_ns=mtime_ns)
+            log.info(f"✓ Loaded {len(blocks)} blocks from directory scan")
+
+        return SessionIndex(session, data_path, blocks, masks)
+    except Exception as e:
+        log.error(f"Error scanning directories: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
+def _update_csv_sidecar(index_path, side_path, has_header):
+    """Bring the sidecar up to date with index.csv; returns the index columns"""
+    csv_size = os.path.getsize(index_path)
+    cached = read_sidecar(side_path)
+    offset = 0
+    columns = None
+    if cached and cached[0]['source'] == SOURCE_CSV:
+        header, columns = cached
+        offset = header['csv_offset']
+        # Stale if index.csv shrank or its beginning changed (file rewritten)
+        if offset > csv_size or _head_crc(index_path, offset) != header['head_crc']:
+            log.warning("Index sidecar is stale, rebuilding")
+            offset, columns = 0, None
+
+    if columns is not None and offset == csv_size:
+        log.info(f"✓ Loaded {len(columns[0])} blocks from index sidecar")
+        return columns
+
+    df_raw, new_offset = read_index_rows(index_path, offset, has_header)
+    if df_raw is not None:
+        log.info(f"✓ Loaded {len(df_raw)} records from index.csv (from byte {offset})")
+        new_columns = aggregate_blocks(df_raw)
+        columns = new_columns if columns is None else merge_blocks(columns, new_columns)
+    elif columns is None:
+        columns = empty_columns()
+
+    if new_offset != offset:
+        write_sidecar(side_path, columns, SOURCE_CSV, csv_offset=new_offset,
+                      head_crc=_head_crc(index_path, new_offset))
+    return columns
+
+
+def scan_blocks(data_path):
+    """Block numbers (from ch0) and channel masks from one listdir per channel"""
+    def listed_blocks(ch):
+        ch_path = os.path.join(data_path, f'ch{ch}')
+        if not os.path.isdir(ch_path):
+            return np.zeros(0, dtype=np.int32)
+        # Get list of blocks
+        return np.array([int(f[6:-4]) for f in os.listdir(ch_path)
+                         if f.startswith('block_') and f.endswith('.bin')], dtype=np.int32)
+
+    blocks = np.sort(listed_blocks(0))
+    masks = np.zeros(len(blocks), dtype=CHANNEL_MASK_DTYPE)
+    for ch in range(NUM_CHANNELS):
+        present = blocks if ch == 0 else listed_blocks(ch)
+        masks |= np.isin(blocks, present).astype(CHANNEL_MASK_DTYPE) << ch
+    return blocks, masks
+
+
+def _load_block_table(index_path, data_path, session):
+    """Per-block table with BlockIndex/ChannelList columns (see index_example.csv)"""
+    import pandas as pd
+    df = pd.read_csv(index_path)
+    if 'BlockIndex' not in df.columns and 'block' in df.columns:
+        df['BlockIndex'] = df['block']
+    if 'ChannelList' in df.columns:
+        masks = [channels_to_mask(parse_channel_list(c)) for c in df['ChannelList']]
+    else:
+        # Assume all 4 channels are present
+        masks = np.full(len(df), ALL_CHANNELS_MASK, dtype=CHANNEL_MASK_DTYPE)
+    index = SessionIndex(session, data_path, df['BlockIndex'].to_numpy(), masks)
+    log.info(f"✓ Loaded {len(index)} blocks from block table")
+    return index
+
+
+class IndexRegistry:
+    """In-process registry of published session indexes
+
+    Each publish bumps the handle's version so clients can tell a refreshed
+    index from the one they were showing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._versions = {}
+
+    def publish(self, handle, index):
+        """Store an index under a handle; returns its new version number"""
+        with self._lock:
+            version = self._versions.get(handle, 0) + 1
+            self._indexes[handle] = index
+            self._versions[handle] = version
+            return version
+
+    def get(self, handle):
+        """Current index for a handle (None if unknown)"""
+        with self._lock:
+            return self._indexes.get(handle)
+
+    def version(self, handle):
+        with self._lock:
+            return self._versions.get(handle, 0)
+
+    def handles(self):
+        with self._lock:
+            return list(self._indexes)
+
+
+# Process-wide registry shared by all Dash callbacks
+INDEX_REGISTRY = IndexRegistry()
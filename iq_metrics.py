@@ -0,0 +1,120 @@
+"""
+Instrumentation for the IQ viewer - stage timing histograms, counters and logging
+Timings are recorded into fixed-bucket histograms (a lock and a few additions
+per observation) and exposed in the Prometheus text format together with the
+counters of registered sources such as the block cache.
+Log level: IQ_LOG_LEVEL=debug|info|warning|error (default info) or set_log_level()
+"""
+
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Stages of a viewer request
+STAGES = ('index_load', 'file_read', 'decode', 'dsp', 'figure_build', 'serialize', 'callback')
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = 'iq'
+
+log = logging.getLogger('iq')
+if not log.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    log.addHandler(_handler)
+    log.propagate = False
+
+
+def set_log_level(level):
+    """Switch the viewer log level by name ('debug', 'info', ...) or number"""
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            raise ValueError(f"unknown log level {level!r}")
+    log.setLevel(level)
+
+
+set_log_level(os.environ.get('IQ_LOG_LEVEL', 'info'))
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+HISTOGRAMS = {stage: Histogram() for stage in STAGES}
+# name -> (callable returning {key: number}, keys that are monotonic counters)
+_SOURCES = {}
+
+
+def observe(stage, seconds):
+    HISTOGRAMS[stage].observe(seconds)
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of a with-block under stage"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        HISTOGRAMS[stage].observe(time.perf_counter() - t0)
+
+
+def register_source(name, stats, counters=()):
+    """Expose the numeric values of stats() as iq_<name>_<key> (keys in counters as *_total counters)"""
+    _SOURCES[name] = (stats, frozenset(counters))
+
+
+def render_metrics():
+    """All histograms and registered counters in the Prometheus text exposition format"""
+    name = f'{METRIC_PREFIX}_stage_seconds'
+    lines = [f'# HELP {name} Time spent per viewer stage', f'# TYPE {name} histogram']
+    for stage, histogram in HISTOGRAMS.items():
+        cumulative, total, count = histogram.snapshot()
+        for bound, value in zip(histogram.buckets + (float('inf'),), cumulative):
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {value}')
+        lines.append(f'{name}_sum{{stage="{stage}"}} {total:.6f}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+    for source, (stats, counters) in sorted(_SOURCES.items()):
+        try:
+            values = stats()
+        except Exception as e:
+            log.warning("metrics source %s failed: %s", source, e)
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f'{METRIC_PREFIX}_{source}_{key}'
+            if key in counters:
+                metric += '_total'
+            lines.append(f'# TYPE {metric} {"counter" if key in counters else "gauge"}')
+            lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Session overview - per-block, per-channel summary statistics
+One streaming pass over the session (one block in memory at a time) computes
+RMS power, DC offset, clipping fraction, I/Q imbalance and the delay against
+the reference channel. Records are appended to a compact binary file next to
+the session (overview.iqstats), so later passes only process new blocks.
+Delays come from the convergence tracker's per-block cache (delays_ref0.csv),
+so a block is correlated once for both views.
+
+  python3 iq_overview.py [--base _logs/iq_data/session]
+"""
+
+import argparse
+import os
+import struct
+import sys
+import threading
+import numpy as np
+
+from iq_blocks import BYTES_PER_SAMPLE, NUM_CHANNELS, block_path, open_block, session_file
+from iq_metrics import log
+
+OVERVIEW_NAME = 'overview.iqstats'
+OVERVIEW_MAGIC = b'IQSTATS\x00'
+OVERVIEW_VERSION = 1
+# magic, version, channels, statistics per channel
+OVERVIEW_HEADER = struct.Struct('<8sIII4x')
+
+# Statistics per channel, in record order (NaN where a channel is missing)
+STATS = ('rms_db', 'dc', 'clip', 'iq_gain_db', 'iq_phase_deg', 'delay')
+STAT_LABELS = {
+    'rms_db': "RMS (dBFS)",
+    'dc': "DC offset",
+    'clip': "Clipping fraction",
+    'iq_gain_db': "I/Q gain imbalance (dB)",
+    'iq_phase_deg': "I/Q phase imbalance (deg)",
+    'delay': "Delay vs ch0 (samples)",
+}
+RECORD_DTYPE = np.dtype([('block', '<i4'), ('stats', '<f4', (NUM_CHANNELS, len(STATS)))])
+REF_CHANNEL = 0
+
+# Normalized value of every uint8 code, as in decode_pairs
+_LEVELS = (np.arange(256, dtype=np.float64) - 127.5) / 127.5
+
+
+def overview_path(data_path):
+    return session_file(data_path, OVERVIEW_NAME)
+
+
+def channel_stats(raw):
+    """Statistics of one raw channel block: (rms_db, dc, clip, iq_gain_db, iq_phase_deg)
+
+    A single bincount over the interleaved bytes viewed as little-endian
+    uint16 (code = I + 256 * Q) gives the joint I/Q histogram; every moment
+    is then a 256 x 256 weighted sum, with no float decode of the block.
+    """
+    n = len(raw) // BYTES_PER_SAMPLE
+    hist = np.bincount(raw[:n * BYTES_PER_SAMPLE].view('<u2'), minlength=65536).reshape(256, 256) / n
+    h_q, h_i = hist.sum(axis=1), hist.sum(axis=0)   # hist[q, i]
+    mean_i, mean_q = h_i @ _LEVELS, h_q @ _LEVELS
+    var_i = h_i @ _LEVELS ** 2 - mean_i ** 2
+    var_q = h_q @ _LEVELS ** 2 - mean_q ** 2
+    cov = _LEVELS @ hist @ _LEVELS - mean_i * mean_q
+
+    power = h_i @ _LEVELS ** 2 + h_q @ _LEVELS ** 2
+    rms_db = 10 * np.log10(max(power, 1e-20))
+    dc = np.hypot(mean_i, mean_q)
+    clip = (h_i[0] + h_i[255] + h_q[0] + h_q[255]) / 2
+    gain_db = 10 * np.log10(max(var_i, 1e-20) / max(var_q, 1e-20))
+    # Phase skew between the I and Q branches from their correlation
+    phase_deg = np.degrees(np.arcsin(np.clip(cov / max(np.sqrt(var_i * var_q), 1e-20), -1.0, 1.0)))
+    return rms_db, dc, clip, gain_db, phase_deg
+
+
+def block_record(data_path, block, delays):
+    """Overview record of one block (all channels); delays is the ConvergenceTracker of the session"""
+    record = np.zeros(1, dtype=RECORD_DTYPE)[0]
+    record['block'] = block
+    record['stats'] = np.nan
+    for ch in range(NUM_CHANNELS):
+        raw = open_block(block_path(data_path, ch, block))
+        if raw is not None and len(raw) >= BYTES_PER_SAMPLE:
+            record['stats'][ch, :5] = channel_stats(raw)
+            del raw
+    delay = STATS.index('delay')
+    if not np.isnan(record['stats'][REF_CHANNEL, 0]):
+        record['stats'][REF_CHANNEL, delay] = 0
+        for result in delays.block_delays(block):
+            record['stats'][result['channel'], delay] = result['delay']
+    return record
+
+
+def read_overview(path):
+    """(blocks, stats) from an overview file, stats shaped (blocks, channels, len(STATS)); None if unusable"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(OVERVIEW_HEADER.size)
+            if len(head) < OVERVIEW_HEADER.size:
+                return None
+            magic, version, channels, n_stats = OVERVIEW_HEADER.unpack(head)
+            if (magic, version, channels, n_stats) != (OVERVIEW_MAGIC, OVERVIEW_VERSION, NUM_CHANNELS, len(STATS)):
+                return None
+            data = f.read()
+    except OSError:
+        return None
+    # A record cut short by an interrupted pass is dropped
+    n = len(data) // RECORD_DTYPE.itemsize
+    records = np.frombuffer(data, dtype=RECORD_DTYPE, count=n)
+    return records['block'].copy(), records['stats'].copy()
+
+
+class OverviewBuilder:
+    """Incremental overview pass over a session
+
+    Existing records are loaded once; update() processes only blocks without a
+    record, appending each one to the file as soon as it is computed. delays
+    is the ConvergenceTracker whose cached delays are reused (one is created
+    on first use if not given).
+    """
+
+    def __init__(self, data_path, delays=None):
+        self.data_path = data_path
+        self.delays = delays
+        self.path = overview_path(data_path)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.pending = 0
+        cached = read_overview(self.path)
+        if cached is None:
+            cached = (np.zeros(0, dtype=np.int32), np.zeros((0, NUM_CHANNELS, len(STATS)), dtype=np.float32))
+            self._reset_file()
+        else:
+            # Trim a partial trailing record so appends stay aligned
+            size = OVERVIEW_HEADER.size + len(cached[0]) * RECORD_DTYPE.itemsize
+            if os.path.getsize(self.path) != size:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(size)
+            log.info(f"✓ Loaded overview of {len(cached[0])} blocks from {self.path}")
+        # Record chunks, concatenated lazily by snapshot()
+        self._chunks = [cached]
+        self._done = set(cached[0].tolist())
+
+    def _reset_file(self):
+        try:
+            with open(self.path, 'wb') as f:
+                f.write(OVERVIEW_HEADER.pack(OVERVIEW_MAGIC, OVERVIEW_VERSION, NUM_CHANNELS, len(STATS)))
+        except OSError as e:
+            log.warning(f"⚠ Could not write overview {self.path}: {e}")
+            self.path = None
+
+    def __len__(self):
+        """Number of blocks with a record"""
+        with self._lock:
+            return len(self._done)
+
+    def missing_blocks(self, blocks):
+        with self._lock:
+            return [int(b) for b in blocks if int(b) not in self._done]
+
+    def update(self, blocks, progress=None):
+        """Compute records of blocks not seen yet; returns the number of new blocks"""
+        todo = self.missing_blocks(blocks)
+        self.pending = len(todo)
+        if todo and self.delays is None:
+            from convergence import ConvergenceTracker
+            self.delays = ConvergenceTracker(self.data_path, ref_channel=REF_CHANNEL)
+        for block in todo:
+            record = block_record(self.data_path, block, self.delays)
+            if self.path is not None:
+                with open(self.path, 'ab') as f:
+                    f.write(record.tobytes())
+            with self._lock:
+                self._chunks.append((np.array([block], dtype=np.int32), record['stats'][None].copy()))
+                self._done.add(block)
+                self.pending -= 1
+            if progress is not None:
+                progress(len(todo) - self.pending, len(todo))
+        return len(todo)
+
+    def update_in_background(self, blocks):
+        """Start update() on a daemon thread unless one is already running"""
+        if self.is_updating():
+            return False
+        self._thread = threading.Thread(target=self.update, args=(blocks,),
+                                        name=f'overview-{self.data_path}', daemon=True)
+        self._thread.start()
+        return True
+
+    def is_updating(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        """(blocks, stats) sorted by block"""
+        with self._lock:
+            if len(self._chunks) > 1:
+                self._chunks = [(np.concatenate([c[0] for c in self._chunks]),
+                                 np.concatenate([c[1] for c in self._chunks]))]
+            blocks, stats = self._chunks[0]
+        order = np.argsort(blocks, kind='stable')
+        return blocks[order], stats[order]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the session overview statistics")
+    parser.add_argument('--base', default="_logs/iq_data/session", help="session directory")
+    args = parser.parse_args(argv)
+
+    from iq_index import load_index
+    index = load_index(args.base)
+    if index is None:
+        print(f"No blocks found in {args.base}")
+        return 1
+    builder = OverviewBuilder(args.base)
+
+    def report(done, total):
+        if done % 10 == 0 or done == total:
+            print(f"  [{done}/{total}]")
+
+    n = builder.update(index.blocks, report)
+    blocks, stats = builder.snapshot()
+    print(f"✓ {n} new blocks, {len(blocks)} in {builder.path}")
+    for i, name in enumerate(STATS):
+        values = stats[:, :, i]
+        print(f"  {STAT_LABELS[name]:<28} min {np.nanmin(values):10.4f}  max {np.nanmax(values):10.4f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Play-mode frame pipeline for the IQ viewer
+A producer thread renders the frames of upcoming slider positions into a
+small ring buffer; each Play tick only pops the frame that is already ready.
+Ticks that find no ready frame are counted as dropped instead of piling up;
+positions whose render fails are handed out as skipped so playback moves on.
+"""
+
+import threading
+import time
+from collections import deque
+
+from iq_metrics import log
+
+# Frames rendered ahead of the one on screen
+PLAYER_DEPTH = 4
+# Delivered frames used for the FPS estimate
+FPS_WINDOW = 20
+
+
+class SkippedFrame:
+    """Buffered in place of a frame whose render failed, so playback moves past it"""
+
+    def __init__(self, position, error):
+        self.position = position
+        self.error = error
+
+    def __repr__(self):
+        return f"SkippedFrame({self.position}, {self.error!r})"
+
+
+class FramePlayer:
+    """Background renderer of consecutive positions for one playback configuration
+
+    render(position) returns the frame (anything the consumer can send, e.g.
+    a figure Patch and info text). key identifies what is rendered (session,
+    mode, window, ...): a new key, a new position range or a jump to another
+    position discards the buffered frames. A render that raises yields a
+    SkippedFrame for its position instead of a frame.
+    """
+
+    def __init__(self, depth=PLAYER_DEPTH):
+        self.depth = depth
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._key = None
+        self._render = None
+        self._range = None      # (first, last) positions played, wrapping from last to first
+        self._next = None       # next position to render
+        self._rendering = None  # position the producer is working on
+        self._generation = 0    # bumped whenever buffered frames become stale
+        self._delivered = deque(maxlen=FPS_WINDOW)
+        self.shown = None       # (key, position) of the last popped frame
+        self.frames = 0
+        self.dropped = 0
+        self.skipped = 0
+        self._thread = None
+
+    def configure(self, key, render, position, first, last):
+        """Render frames of key starting at position, wrapping from last back to first"""
+        with self._cond:
+            if key == self._key and self._render is not None and self._range == (first, last):
+                return
+            self._key = key
+            self._render = render
+            self._range = (first, last)
+            self._restart(position)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='iq-player', daemon=True)
+            self._thread.start()
+
+    def _restart(self, position):
+        self._frames.clear()
+        first, last = self._range
+        if last < first:
+            self._next = None
+        else:
+            self._next = position if first <= position <= last else first
+        self._generation += 1
+        self._cond.notify_all()
+
+    def pause(self):
+        """Stop rendering ahead and reset the counters"""
+        with self._cond:
+            self._key = None
+            self._render = None
+            self._range = None
+            self._frames.clear()
+            self._generation += 1
+            self._delivered.clear()
+            self.shown = None
+            self.frames = 0
+            self.dropped = 0
+            self.skipped = 0
+
+    def pop(self, key, position):
+        """The ready frame (or SkippedFrame) for position, or None (counted as a dropped frame)"""
+        with self._cond:
+            if key != self._key:
+                return None
+            if self._frames and self._frames[0][0] == position:
+                _, frame = self._frames.popleft()
+                self._cond.notify_all()
+                self.shown = (key, position)
+                if isinstance(frame, SkippedFrame):
+                    self.skipped += 1
+                else:
+                    self.frames += 1
+                    self._delivered.append(time.perf_counter())
+                return frame
+            if self._frames or position not in (self._rendering, self._next):
+                # The consumer jumped (slider moved): render from there
+                self._restart(position)
+            self.dropped += 1
+            return None
+
+    def fps(self):
+        with self._cond:
+            if len(self._delivered) < 2:
+                return 0.0
+            return (len(self._delivered) - 1) / max(self._delivered[-1] - self._delivered[0], 1e-9)
+
+    def stats(self):
+        return {'fps': self.fps(), 'frames': self.frames, 'dropped': self.dropped, 'skipped': self.skipped,
+                'buffered': len(self._frames)}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._render is None or self._next is None or len(self._frames) >= self.depth:
+                    self._cond.wait()
+                render, position, generation = self._render, self._next, self._generation
+                first, last = self._range
+                self._next = position + 1 if position < last else first
+                self._rendering = position
+            try:
+                frame = render(position)
+            except Exception as e:
+                log.error(f"Error rendering frame at position {position}: {e}")
+                frame = SkippedFrame(position, str(e))
+            with self._cond:
+                self._rendering = None
+                if generation == self._generation:
+                    self._frames.append((position, frame))
+
+
+# Player of the viewer (one per server process)
+PLAYER = FramePlayer()
@@ -0,0 +1,157 @@
+"""
+Raster backend for headless rendering - numpy canvas, PNG encoder, tiny bitmap font
+Draws the same decimated traces as the viewer's Plotly figures straight into
+an RGB uint8 array: polylines are rasterized in one vectorized pass, markers
+are binned per pixel, and frames are written as PNG with zlib only.
+"""
+
+import struct
+import zlib
+import numpy as np
+
+WHITE = (255, 255, 255)
+GRID = (225, 225, 225)
+FRAME = (150, 150, 150)
+TEXT = (40, 40, 40)
+COLORS = {
+    'blue': (31, 119, 180),
+    'red': (214, 39, 40),
+    'green': (44, 160, 44),
+    'orange': (255, 127, 14),
+}
+
+# 3x5 glyphs, five rows top to bottom ('#' = ink); text is drawn upper case
+GLYPHS = {
+    '0': '### #.# #.# #.# ###', '1': '.#. ##. .#. .#. ###', '2': '### ..# ### #.. ###', '3': '### ..# ### ..# ###',
+    '4': '#.# #.# ### ..# ..#', '5': '### #.. ### ..# ###', '6': '### #.. ### #.# ###', '7': '### ..# ..# ..# ..#',
+    '8': '### #.# ### #.# ###', '9': '### #.# ### ..# ###', 'A': '.#. #.# ### #.# #.#', 'B': '##. #.# ##. #.# ##.',
+    'C': '### #.. #.. #.. ###', 'D': '##. #.# #.# #.# ##.', 'E': '### #.. ### #.. ###', 'F': '### #.. ### #.. #..',
+    'G': '### #.. #.# #.# ###', 'H': '#.# #.# ### #.# #.#', 'I': '### .#. .#. .#. ###', 'J': '..# ..# ..# #.# ###',
+    'K': '#.# #.# ##. #.# #.#', 'L': '#.. #.. #.. #.. ###', 'M': '#.# ### ### #.# #.#', 'N': '##. #.# #.# #.# #.#',
+    'O': '### #.# #.# #.# ###', 'P': '### #.# ### #.. #..', 'Q': '### #.# #.# ### ..#', 'R': '##. #.# ##. #.# #.#',
+    'S': '### #.. ### ..# ###', 'T': '### .#. .#. .#. .#.', 'U': '#.# #.# #.# #.# ###', 'V': '#.# #.# #.# #.# .#.',
+    'W': '#.# #.# ### ### #.#', 'X': '#.# #.# .#. #.# #.#', 'Y': '#.# #.# .#. .#. .#.', 'Z': '### ..# .#. #.. ###',
+    ' ': '... ... ... ... ...', '.': '... ... ... ... .#.', '-': '... ... ### ... ...', ':': '... .#. ... .#. ...',
+    '/': '..# ..# .#. #.. #..', '+': '... .#. ### .#. ...', '(': '.#. #.. #.. #.. .#.', ')': '.#. ..# ..# ..# .#.',
+    '=': '... ### ... ### ...', '%': '#.# ..# .#. #.. #.#',
+}
+GLYPH_WIDTH, GLYPH_HEIGHT = 3, 5
+
+
+def _glyph(char):
+    return np.array([[c == '#' for c in row] for row in GLYPHS[char].split()])
+
+
+_FONT = {char: _glyph(char) for char in GLYPHS}
+
+
+def text_width(text, scale=1):
+    return len(text) * (GLYPH_WIDTH + 1) * scale
+
+
+class Canvas:
+    """RGB image with the few primitives the plots need"""
+
+    def __init__(self, width, height, background=WHITE):
+        self.width = int(width)
+        self.height = int(height)
+        self.pixels = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        self.pixels[:] = background
+
+    def fill(self, x0, y0, x1, y1, color):
+        self.pixels[max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)] = color
+
+    def rect(self, x0, y0, x1, y1, color):
+        """1 px outline of [x0, x1) x [y0, y1)"""
+        self.fill(x0, y0, x1, y0 + 1, color)
+        self.fill(x0, y1 - 1, x1, y1, color)
+        self.fill(x0, y0, x0 + 1, y1, color)
+        self.fill(x1 - 1, y0, x1, y1, color)
+
+    def text(self, x, y, text, color=TEXT, scale=1):
+        for char in str(text).upper():
+            glyph = _FONT.get(char, _FONT[' '])
+            if scale > 1:
+                glyph = glyph.repeat(scale, axis=0).repeat(scale, axis=1)
+            h, w = glyph.shape
+            region = self.pixels[y:y + h, x:x + w]
+            region[glyph[:region.shape[0], :region.shape[1]]] = color
+            x += (GLYPH_WIDTH + 1) * scale
+
+    def polyline(self, px, py, color, clip):
+        """Connect consecutive pixel coordinates, clipped to clip = (x0, y0, x1, y1)"""
+        px = np.asarray(px, dtype=np.float64)
+        py = np.asarray(py, dtype=np.float64)
+        if len(px) == 0:
+            return
+        if len(px) == 1:
+            self.points(px, py, color, clip)
+            return
+        dx, dy = np.diff(px), np.diff(py)
+        steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(np.int64) + 1
+        segment = np.repeat(np.arange(len(dx)), steps)
+        starts = np.repeat(np.cumsum(steps) - steps, steps)
+        t = (np.arange(len(segment)) - starts) / np.repeat(np.maximum(steps - 1, 1), steps)
+        self.points(px[segment] + dx[segment] * t, py[segment] + dy[segment] * t, color, clip)
+
+    def points(self, px, py, color, clip):
+        x = np.rint(px).astype(np.int64)
+        y = np.rint(py).astype(np.int64)
+        x0, y0, x1, y1 = clip
+        keep = (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+        self.pixels[y[keep], x[keep]] = color
+
+    def density(self, px, py, color, clip):
+        """Markers binned per pixel, shaded from light to color by log point count"""
+        x = np.rint(px).astype(np.int64)
+        y = np.rint(py).astype(np.int64)
+        x0, y0, x1, y1 = clip
+        keep = (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+        counts = np.zeros((y1 - y0, x1 - x0), dtype=np.int64)
+        np.add.at(counts, (y[keep] - y0, x[keep] - x0), 1)
+        hit = counts > 0
+        if not hit.any():
+            return
+        weight = 0.35 + 0.65 * np.log1p(counts[hit]) / np.log1p(counts.max())
+        region = self.pixels[y0:y1, x0:x1]
+        background = region[hit].astype(np.float32)
+        region[hit] = (background + (np.float32(color) - background) * weight[:, None]).astype(np.uint8)
+
+    def paste(self, x, y, image):
+        h, w = image.shape[:2]
+        self.pixels[y:y + h, x:x + w] = image[:self.height - y, :self.width - x]
+
+
+def encode_png(pixels, level=6):
+    """PNG bytes of an (h, w, 3) uint8 RGB array"""
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    h, w = pixels.shape[:2]
+    # Filter type 0 (None) on every scanline
+    rows = np.zeros((h, 1 + 3 * w), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(h, 3 * w)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows.tobytes(), level))
+            + chunk(b'IEND', b''))
+
+
+def write_png(path, pixels, level=6):
+    with open(path, 'wb') as f:
+        f.write(encode_png(pixels, level))
+
+
+def nice_range(values, pad=0.05):
+    """(lo, hi) of finite values with some padding (unit range if empty or flat)"""
+    values = np.asarray(values)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return 0.0, 1.0
+    lo, hi = float(values.min()), float(values.max())
+    if hi - lo < 1e-12:
+        lo, hi = lo - 0.5, hi + 0.5
+    margin = (hi - lo) * pad
+    return lo - margin, hi + margin
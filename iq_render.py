@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Headless batch renderer - static images of every block of a session
+Uses the viewer's trace logic (iq_traces.iq_trace_data) and draws with the
+numpy raster backend (iq_raster) on a process pool. Output is one PNG per
+block, contact sheets tiling many blocks per image, or an MP4 (needs ffmpeg).
+
+  python3 iq_render.py --mode FFT --sheet overview.png
+  python3 iq_render.py --mode IQ --range 0 200 --png-dir frames/ -w 0
+  python3 iq_render.py --mode CONST --mp4 session.mp4 --fps 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+
+from iq_blocks import BLOCK_CACHE, SAMPLES_PER_BLOCK
+from iq_fft import set_workers
+from iq_raster import COLORS, FRAME, GRID, Canvas, nice_range, text_width, write_png
+from iq_traces import CHANNEL_COLORS, TRACE_STYLES, iq_trace_data, load_iq_block
+
+MODES = ('IQ', 'FFT', 'CONST', 'AMP')
+SAMPLE_RATE = 2.4e6
+NUM_CHANNELS = 4
+# Fixed y ranges keep frames comparable across blocks (FFT is scaled per frame)
+Y_RANGES = {'IQ': (-1.05, 1.05), 'CONST': (-1.05, 1.05), 'AMP': (0.0, 1.5)}
+# Points per constellation (binned per pixel, so more points cost little)
+CONST_POINTS = 20000
+FRAME_SIZE = (800, 800)
+THUMB_SIZE = (240, 240)
+SHEET_COLUMNS = 10
+SHEET_BLOCKS = 100
+
+_WORKER = {}
+
+
+def panel_grid(mode):
+    """(rows, cols) of the channel panels: stacked like the viewer, 2 x 2 for square constellations"""
+    return (2, 2) if mode == 'CONST' else (NUM_CHANNELS, 1)
+
+
+def render_frame(iq_data, mode='IQ', n_samples=1000, sample_rate=SAMPLE_RATE, size=FRAME_SIZE,
+                 label='', psd_params=None):
+    """(h, w, 3) uint8 image of the four channel panels of one block"""
+    width, height = size
+    scale = 2 if width >= 480 else 1
+    line = 7 * scale
+    canvas = Canvas(width, height)
+    canvas.text(4, 3, label, scale=scale)
+
+    rows, cols = panel_grid(mode)
+    top = line + 4
+    panel_w = (width - 4) // cols
+    panel_h = (height - top - 2) // rows
+    max_points = CONST_POINTS if mode == 'CONST' else panel_w
+    traces, titles, _ = iq_trace_data(iq_data, mode, n_samples, sample_rate, 0, max_points, psd_params)
+
+    per_channel = len(TRACE_STYLES[mode])
+    for channel in range(NUM_CHANNELS):
+        row, col = divmod(channel, cols)
+        x0, y0 = 2 + col * panel_w, top + row * panel_h
+        x1, y1 = x0 + panel_w - 2, y0 + panel_h - 2
+        inner = (x0 + 1, y0 + line + 2, x1 - 1, y1 - 1)
+        ch_traces = traces[channel * per_channel:(channel + 1) * per_channel]
+
+        xs = np.concatenate([t[0] for t in ch_traces]) if ch_traces else np.zeros(0)
+        ys = np.concatenate([t[1] for t in ch_traces]) if ch_traces else np.zeros(0)
+        x_lo, x_hi = Y_RANGES[mode] if mode == 'CONST' else nice_range(xs, pad=0)
+        y_lo, y_hi = Y_RANGES.get(mode) or nice_range(ys)
+
+        # Grid at quarters, panel frame, title and y range
+        for k in range(1, 4):
+            gx = inner[0] + (inner[2] - inner[0]) * k // 4
+            gy = inner[1] + (inner[3] - inner[1]) * k // 4
+            canvas.fill(gx, inner[1], gx + 1, inner[3], GRID)
+            canvas.fill(inner[0], gy, inner[2], gy + 1, GRID)
+        canvas.rect(x0, y0 + line + 1, x1, y1, FRAME)
+        canvas.text(x0 + 2, y0 + 1, titles[channel].replace('Channel ', 'CH'), scale=scale)
+        y_label = f'{y_lo:.3g}..{y_hi:.3g}'
+        canvas.text(x1 - text_width(y_label, scale) - 2, y0 + 1, y_label, FRAME, scale=scale)
+
+        def to_pixels(x, y):
+            px = inner[0] + (np.asarray(x, dtype=np.float64) - x_lo) / (x_hi - x_lo) * (inner[2] - inner[0] - 1)
+            py = inner[3] - 1 - (np.asarray(y, dtype=np.float64) - y_lo) / (y_hi - y_lo) * (inner[3] - inner[1] - 1)
+            return px, py
+
+        for (x, y), (_, trace_mode, color) in zip(ch_traces, TRACE_STYLES[mode]):
+            rgb = COLORS[color or CHANNEL_COLORS[channel]]
+            px, py = to_pixels(x, y)
+            if trace_mode == 'markers':
+                canvas.density(px, py, rgb, inner)
+            else:
+                canvas.polyline(px, py, rgb, inner)
+    return canvas.pixels
+
+
+def _init_worker(index, options):
+    # One FFT thread per worker process; decoded blocks are used once, so no caching
+    set_workers(1)
+    BLOCK_CACHE.set_budget(0)
+    _WORKER['index'] = index
+    _WORKER['options'] = options
+
+
+def render_position(position):
+    """(block, image) of the block at an index position (runs in pool workers)"""
+    index, options = _WORKER['index'], _WORKER['options']
+    n_samples = options['samples']
+    iq_data = load_iq_block(index, position, n_samples)
+    block_index = index.block_at(position)
+    label = f"{index.session} block {block_index} {options['mode']}"
+    n = n_samples or SAMPLES_PER_BLOCK
+    return block_index, render_frame(iq_data, options['mode'], n, options['sample_rate'], options['size'],
+                                      label, options.get('psd_params'))
+
+
+def render_blocks(index, positions, options, workers=1):
+    """(block, image) per position, in order (generator)"""
+    if workers <= 1:
+        _init_worker(index, options)
+        yield from map(render_position, positions)
+        return
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(index, options)) as pool:
+        # imap keeps block order while frames stream back
+        yield from pool.imap(render_position, positions, chunksize=2)
+
+
+class ContactSheets:
+    """Tiles frames into sheets of columns x rows, writing sheet PNGs as they fill"""
+
+    def __init__(self, path, size, columns=SHEET_COLUMNS, per_sheet=SHEET_BLOCKS):
+        self.path = path
+        self.size = size
+        self.columns = columns
+        self.per_sheet = per_sheet
+        self.canvas = None
+        self.count = 0
+        self.written = []
+
+    def _sheet_path(self, number):
+        root, ext = os.path.splitext(self.path)
+        return f'{root}_{number:03d}{ext or ".png"}'
+
+    def add(self, image):
+        slot = self.count % self.per_sheet
+        if slot == 0:
+            self.flush()
+            rows = -(-self.per_sheet // self.columns)
+            self.canvas = Canvas(self.columns * self.size[0], rows * self.size[1], background=FRAME)
+        row, col = divmod(slot, self.columns)
+        self.canvas.paste(col * self.size[0], row * self.size[1], image[:-1, :-1])
+        self.count += 1
+
+    def flush(self):
+        if self.canvas is None:
+            return
+        used = -(-((self.count - 1) % self.per_sheet + 1) // self.columns)
+        path = self.path if self.count <= self.per_sheet else self._sheet_path(len(self.written))
+        write_png(path, self.canvas.pixels[:used * self.size[1]])
+        self.written.append(path)
+        self.canvas = None
+
+    def close(self):
+        self.flush()
+        # Several sheets: name them all with a number
+        if len(self.written) > 1 and self.written[0] == self.path:
+            os.replace(self.path, self._sheet_path(0))
+            self.written[0] = self._sheet_path(0)
+        return self.written
+
+
+class VideoWriter:
+    """Raw RGB frames piped into ffmpeg (H.264 MP4)"""
+
+    def __init__(self, path, size, fps):
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg not found on PATH (use --sheet or --png-dir instead)")
+        self.path = path
+        self.process = subprocess.Popen(
+            [ffmpeg, '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+             '-s', f'{size[0]}x{size[1]}', '-r', str(fps), '-i', '-',
+             '-c:v', 'libx264', '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def add(self, image):
+        self.process.stdin.write(np.ascontiguousarray(image).tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed writing {self.path}")
+        return [self.path]
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition('x')
+    # Even sizes (yuv420p video needs them)
+    return int(width) // 2 * 2, int(height or width) // 2 * 2
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render images of the blocks of a session")
+    parser.add_argument('--base', default="_logs/iq_data/session", help="session directory or archive")
+    parser.add_argument('--mode', choices=MODES, default='IQ', help="display mode (as in the viewer)")
+    parser.add_argument('--range', type=int, nargs=2, metavar=('FIRST', 'LAST'),
+                        help="blocks FIRST..LAST (inclusive); default: all")
+    parser.add_argument('--samples', type=int, default=1000,
+                        help="samples per block from the start (0 = whole block)")
+    parser.add_argument('--sample-rate', type=float, default=SAMPLE_RATE)
+    parser.add_argument('--size', type=parse_size,
+                        help=f"frame size WxH (default {FRAME_SIZE[0]}x{FRAME_SIZE[1]}, "
+                             f"{THUMB_SIZE[0]}x{THUMB_SIZE[1]} on contact sheets)")
+    out = parser.add_argument_group("output (at least one)")
+    out.add_argument('--png-dir', help="write block_XXXXX.png per block into this directory")
+    out.add_argument('--sheet', help="contact sheet PNG (numbered when more than --per-sheet blocks)")
+    out.add_argument('--mp4', help="MP4 video with one frame per block (requires ffmpeg)")
+    parser.add_argument('--columns', type=int, default=SHEET_COLUMNS, help="contact sheet columns")
+    parser.add_argument('--per-sheet', type=int, default=SHEET_BLOCKS, help="blocks per contact sheet")
+    parser.add_argument('--fps', type=float, default=10, help="video frame rate")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="render processes (0 = one per CPU)")
+    args = parser.parse_args(argv)
+    if not (args.png_dir or args.sheet or args.mp4):
+        parser.error("choose an output: --png-dir, --sheet and/or --mp4")
+    if args.size is None:
+        args.size = THUMB_SIZE if args.sheet and not (args.png_dir or args.mp4) else FRAME_SIZE
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from iq_index import load_index
+    index = load_index(args.base)
+    if index is None or len(index) == 0:
+        print(f"No blocks found in {args.base}")
+        return 1
+    positions = range(len(index))
+    if args.range is not None:
+        first, last = args.range
+        positions = [p for p in positions if first <= index.block_at(p) <= last]
+    if not positions:
+        print(f"No blocks in range in {args.base}")
+        return 1
+
+    sinks = []
+    try:
+        if args.sheet:
+            sinks.append(ContactSheets(args.sheet, args.size, args.columns, args.per_sheet))
+        if args.mp4:
+            sinks.append(VideoWriter(args.mp4, args.size, args.fps))
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        return 1
+    if args.png_dir:
+        os.makedirs(args.png_dir, exist_ok=True)
+
+    workers = args.workers or os.cpu_count() or 1
+    options = {'mode': args.mode, 'samples': args.samples or None, 'sample_rate': args.sample_rate,
+               'size': args.size}
+    print(f"Rendering {len(positions)} blocks ({args.mode}, {args.size[0]}x{args.size[1]}, {workers} worker(s))")
+    t0 = time.perf_counter()
+    for done, (block_index, image) in enumerate(render_blocks(index, positions, options, workers), 1):
+        if args.png_dir:
+            write_png(os.path.join(args.png_dir, f'block_{block_index:05d}.png'), image)
+        for sink in sinks:
+            sink.add(image)
+        if done % 50 == 0 or done == len(positions):
+            print(f"  [{done}/{len(positions)}] {done / (time.perf_counter() - t0):.1f} blocks/s")
+
+    for sink in sinks:
+        try:
+            for path in sink.close():
+                print(f"✓ Wrote {path}")
+        except RuntimeError as e:
+            print(f"✗ {e}")
+            return 1
+    if args.png_dir:
+        print(f"✓ Wrote {len(positions)} PNGs to {args.png_dir}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
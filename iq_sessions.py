@@ -0,0 +1,102 @@
+"""
+Session catalog - lazy discovery of session* directories under the data root
+Discovery only lists the root and checks the candidates concurrently; each
+session's index is loaded on first access (in a small thread pool) and cached,
+so startup does not grow with the number of recorded sessions.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from iq_blocks import ARCHIVE_SUFFIX
+from iq_index import load_index
+from iq_metrics import log, timed
+
+SESSION_PREFIX = 'session'
+# Threads for directory checks and index loads (I/O bound)
+SESSION_WORKERS = min(8, 2 * (os.cpu_count() or 1))
+
+
+def is_session_dir(path):
+    """True if path looks like a DAQ session (index.csv or ch0 directory) or is a session archive"""
+    if path.endswith(ARCHIVE_SUFFIX):
+        return os.path.isfile(path)
+    return os.path.exists(os.path.join(path, 'index.csv')) or os.path.isdir(os.path.join(path, 'ch0'))
+
+
+def discover_sessions(root, executor=None):
+    """Sorted names of the session* directories (and session*.iqpack archives) of root"""
+    try:
+        candidates = sorted(entry.name for entry in os.scandir(root)
+                            if entry.name.startswith(SESSION_PREFIX)
+                            and (entry.is_dir() or entry.name.endswith(ARCHIVE_SUFFIX)))
+    except OSError as e:
+        log.warning(f"⚠ Could not list sessions in {root}: {e}")
+        return []
+    paths = [os.path.join(root, name) for name in candidates]
+    if executor is None:
+        checks = map(is_session_dir, paths)
+    else:
+        checks = executor.map(is_session_dir, paths)
+    return [name for name, ok in zip(candidates, checks) if ok]
+
+
+class SessionCatalog:
+    """Sessions of a data root with indexes loaded on first access
+
+    Concurrent requests for a session that is still loading share one load.
+    Handles are the session directory names.
+    """
+
+    def __init__(self, root, workers=SESSION_WORKERS):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='iq-session')
+        self._lock = threading.Lock()
+        self._names = None
+        self._loads = {}   # name -> Future of the SessionIndex
+
+    def names(self, refresh=False):
+        """Discovered session names (listed once, again on refresh)"""
+        with self._lock:
+            names = self._names
+        if names is None or refresh:
+            names = discover_sessions(self.root, self._executor)
+            with self._lock:
+                self._names = names
+        return list(names)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def _load(self, name):
+        with timed('index_load'):
+            return load_index(self.path(name), session=name)
+
+    def load(self, name, reload=False):
+        """Future of the index of a session (submitted on first access or reload)"""
+        with self._lock:
+            future = self._loads.get(name)
+            if future is None or (reload and future.done()):
+                future = self._loads[name] = self._executor.submit(self._load, name)
+        return future
+
+    def get(self, name, reload=False):
+        """Index of a session, loading it if needed (None if it has no blocks)"""
+        try:
+            return self.load(name, reload).result()
+        except Exception as e:
+            log.error(f"Error loading session {name}: {e}")
+            with self._lock:
+                self._loads.pop(name, None)
+            return None
+
+    def is_loaded(self, name):
+        with self._lock:
+            future = self._loads.get(name)
+        return future is not None and future.done()
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._names or ()),
+                    'loaded': sum(1 for f in self._loads.values() if f.done())}
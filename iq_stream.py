@@ -0,0 +1,334 @@
+"""
+Binary data API - stream block ranges of a session as raw uint8, complex64 or Arrow IPC
+Samples go from the memory-mapped block files straight into the response: no
+DataFrames, no figures. Binary streams are a sequence of fixed-size records
+(one per block, the requested channels back to back), so any byte offset maps
+to a block and HTTP Range requests page through a session at disk speed.
+Decimation and Welch PSD are applied per block on the fly.
+"""
+
+import threading
+import numpy as np
+
+from iq_blocks import BYTES_PER_SAMPLE, NUM_CHANNELS, SAMPLES_PER_BLOCK, as_complex, block_path, decode_pairs, open_block
+from iq_dsp import PSD_OVERLAP, PSD_WINDOW, WINDOWS, welch_psd
+from iq_metrics import timed
+
+STREAM_FORMATS = ('uint8', 'complex64', 'arrow')
+DEFAULT_FORMAT = 'complex64'
+# Sample rate of the RTL-SDR blocks (Hz)
+SAMPLE_RATE = 2.4e6
+# Records are sent in chunks of at least this many bytes
+STREAM_CHUNK_BYTES = 1 << 20
+# Blocks per Arrow record batch
+ARROW_BATCH_BLOCKS = 16
+# Arrow IPC end-of-stream marker (continuation token, zero length)
+ARROW_EOS = b'\xff\xff\xff\xff\x00\x00\x00\x00'
+# Index columns served by the index route
+INDEX_COLUMNS = ('blocks', 'channel_masks', 'timestamps', 'frequencies', 'frame_types')
+
+_stats_lock = threading.Lock()
+_stats = {'requests': 0, 'bytes': 0}
+
+
+def stream_stats():
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(requests=0, n_bytes=0):
+    with _stats_lock:
+        _stats['requests'] += requests
+        _stats['bytes'] += n_bytes
+
+
+def _import_arrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def arrow_available():
+    return _import_arrow() is not None
+
+
+def decimate_block(x, factor):
+    """Average of every factor consecutive samples (boxcar anti-alias, then downsample)"""
+    if factor <= 1:
+        return x
+    n = len(x) // factor * factor
+    return x[:n].reshape(-1, factor).mean(axis=1, dtype=np.complex64)
+
+
+def _fixed(values, length, fill):
+    """values cut or padded with fill to length (short block files)"""
+    if len(values) == length:
+        return values
+    out = np.full(length, fill, dtype=values.dtype)
+    out[:min(len(values), length)] = values[:length]
+    return out
+
+
+class BlockStream:
+    """One stream request: blocks of an index, channels, a sample window and optional processing
+
+    Every block becomes one record of len(channels) * values_per_channel
+    values of dtype. Channels not recorded for a block are filled with NaN
+    (zero bytes in uint8 streams) in binary streams and left out of Arrow ones.
+    """
+
+    def __init__(self, index, positions, channels=None, start=0, count=None, fmt=DEFAULT_FORMAT, decimate=1,
+                 psd_params=None, sample_rate=SAMPLE_RATE):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(STREAM_FORMATS)}")
+        channels = list(range(NUM_CHANNELS)) if channels is None else [int(c) for c in channels]
+        if not channels or any(not 0 <= c < NUM_CHANNELS for c in channels):
+            raise ValueError(f"channels must be in 0..{NUM_CHANNELS - 1}")
+        decimate = int(decimate)
+        if decimate < 1:
+            raise ValueError("decimate must be at least 1")
+        if fmt == 'uint8' and (decimate > 1 or psd_params):
+            raise ValueError("uint8 streams carry the block bytes unchanged; use complex64 or arrow to decimate or get PSDs")
+        if psd_params is not None:
+            if psd_params['window'] not in WINDOWS:
+                raise ValueError(f"window must be one of {', '.join(WINDOWS)}")
+            if psd_params['fft_size'] < 16:
+                raise ValueError("fft_size must be at least 16")
+
+        self.index = index
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.channels = channels
+        self.fmt = fmt
+        self.start = min(max(int(start), 0), SAMPLES_PER_BLOCK)
+        self.stop = SAMPLES_PER_BLOCK if count is None else min(self.start + max(int(count), 0), SAMPLES_PER_BLOCK)
+        self.decimate = decimate
+        self.psd_params = psd_params
+        self.sample_rate = sample_rate / decimate
+
+        n = self.stop - self.start
+        if psd_params is not None:
+            self.dtype, self.values = np.dtype(np.float32), psd_params['fft_size']
+        elif fmt == 'uint8':
+            self.dtype, self.values = np.dtype(np.uint8), n * BYTES_PER_SAMPLE
+        else:
+            self.dtype, self.values = np.dtype(np.complex64), n // decimate
+        if self.values == 0:
+            raise ValueError("the sample window is empty")
+        self.record_bytes = len(channels) * self.values * self.dtype.itemsize
+        self.size = len(self.positions) * self.record_bytes
+
+    def headers(self):
+        """Response headers describing the record layout"""
+        headers = {
+            'X-IQ-Dtype': self.dtype.name,
+            'X-IQ-Channels': ','.join(map(str, self.channels)),
+            'X-IQ-Blocks': str(len(self.positions)),
+            'X-IQ-Values-Per-Channel': str(self.values),
+            'X-IQ-Record-Bytes': str(self.record_bytes),
+            'X-IQ-Sample-Window': f'{self.start}-{self.stop}',
+            'X-IQ-Sample-Rate': repr(self.sample_rate),
+        }
+        if len(self.positions):
+            headers['X-IQ-First-Block'] = str(self.index.block_at(self.positions[0]))
+            headers['X-IQ-Last-Block'] = str(self.index.block_at(self.positions[-1]))
+        if self.fmt != 'arrow':
+            headers['X-IQ-Size'] = str(self.size)
+        return headers
+
+    def read_block(self, position):
+        """Values of each requested channel of one block (None if not recorded)"""
+        block_index = self.index.block_at(position)
+        mask = int(self.index.channel_masks[position])
+        values = []
+        for ch in self.channels:
+            raw = open_block(block_path(self.index.path, ch, block_index)) if mask >> ch & 1 else None
+            if raw is None:
+                values.append(None)
+            elif self.fmt == 'uint8':
+                # The memmap window itself: pages are read as the response is written
+                values.append(raw[self.start * BYTES_PER_SAMPLE:self.stop * BYTES_PER_SAMPLE])
+            else:
+                with timed('decode'):
+                    x = as_complex(decode_pairs(raw, self.start, self.stop - self.start))
+                values.append(decimate_block(x, self.decimate))
+        if self.psd_params is None:
+            return values
+        present = [i for i, v in enumerate(values) if v is not None]
+        if present:
+            n = (self.stop - self.start) // self.decimate
+            with timed('dsp'):
+                psd = welch_psd(np.stack([_fixed(values[i], n, 0) for i in present]), self.sample_rate,
+                                **self.psd_params)
+            for i, row in zip(present, psd):
+                values[i] = row
+        return values
+
+    def _record(self, position):
+        """One block record: the channels back to back, missing ones filled"""
+        fill = 0 if self.dtype == np.uint8 else np.nan
+        parts = []
+        for values in self.read_block(position):
+            if values is None:
+                values = np.full(self.values, fill, dtype=self.dtype)
+            parts.append(_fixed(values, self.values, fill).tobytes())
+        return b''.join(parts)
+
+    def iter_bytes(self, first=0, stop=None):
+        """Bytes [first, stop) of the binary stream, in chunks of about STREAM_CHUNK_BYTES"""
+        stop = self.size if stop is None else min(stop, self.size)
+        _count(requests=1)
+        pending, pending_bytes = [], 0
+        for record in range(first // self.record_bytes, -(-stop // self.record_bytes)):
+            data = self._record(int(self.positions[record]))
+            offset = record * self.record_bytes
+            data = data[max(first - offset, 0):len(data) - max(offset + len(data) - stop, 0)]
+            pending.append(data)
+            pending_bytes += len(data)
+            if pending_bytes >= STREAM_CHUNK_BYTES:
+                _count(n_bytes=pending_bytes)
+                yield b''.join(pending)
+                pending, pending_bytes = [], 0
+        if pending:
+            _count(n_bytes=pending_bytes)
+            yield b''.join(pending)
+
+    def arrow_schema(self, pa):
+        """Rows are (block, channel) pairs; values are interleaved I/Q or PSD bins in dB"""
+        metadata = {
+            'kind': 'psd' if self.psd_params else 'iq',
+            'sample_rate': repr(self.sample_rate),
+            'sample_window': f'{self.start}-{self.stop}',
+            'decimate': str(self.decimate),
+        }
+        if self.psd_params:
+            metadata.update({k: str(v) for k, v in self.psd_params.items()})
+        return pa.schema([
+            pa.field('block', pa.int32()),
+            pa.field('channel', pa.int8()),
+            pa.field('timestamp', pa.int64()),
+            pa.field('frequency', pa.int64()),
+            pa.field('frame_type', pa.uint8()),
+            pa.field('values', pa.list_(pa.float32())),
+        ], metadata=metadata)
+
+    def iter_arrow(self):
+        """Arrow IPC stream: schema, one record batch per ARROW_BATCH_BLOCKS blocks, end marker"""
+        pa = _import_arrow()
+        if pa is None:
+            raise ValueError("the arrow format needs pyarrow, which is not installed")
+        schema = self.arrow_schema(pa)
+        index = self.index
+        _count(requests=1)
+        yield schema.serialize().to_pybytes()
+        for i in range(0, len(self.positions), ARROW_BATCH_BLOCKS):
+            rows, arrays = [], []
+            for position in self.positions[i:i + ARROW_BATCH_BLOCKS]:
+                for ch, values in zip(self.channels, self.read_block(int(position))):
+                    if values is not None:
+                        rows.append((position, ch))
+                        arrays.append(np.asarray(values).view(np.float32))
+            if not rows:
+                continue
+            positions = np.array([p for p, _ in rows], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum([len(a) for a in arrays])]).astype(np.int32)
+            columns = [
+                pa.array(index.blocks[positions]),
+                pa.array(np.array([ch for _, ch in rows], dtype=np.int8)),
+                pa.array(np.zeros(len(rows), np.int64) if index.timestamps is None else index.timestamps[positions]),
+                pa.array(np.zeros(len(rows), np.int64) if index.frequencies is None else index.frequencies[positions]),
+                pa.array(index.frame_types[positions]),
+                pa.ListArray.from_arrays(pa.array(offsets), pa.array(np.concatenate(arrays))),
+            ]
+            data = pa.RecordBatch.from_arrays(columns, schema=schema).serialize().to_pybytes()
+            _count(n_bytes=len(data))
+            yield data
+        yield ARROW_EOS
+
+
+def _int(args, name, default=None):
+    value = args.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def select_positions(index, args):
+    """Positions of the requested blocks: first/last block numbers or t0/t1 (ms), then offset/limit"""
+    if args.get('t0') is not None or args.get('t1') is not None:
+        if not index.timed():
+            raise ValueError("this session has no block timestamps")
+        positions = index.positions_between(_int(args, 't0', np.iinfo(np.int64).min),
+                                            _int(args, 't1', np.iinfo(np.int64).max))
+    else:
+        lo = np.searchsorted(index.blocks, _int(args, 'first', 0), side='left')
+        hi = np.searchsorted(index.blocks, _int(args, 'last', np.iinfo(np.int32).max), side='right')
+        positions = np.arange(lo, hi)
+    offset = max(_int(args, 'offset', 0), 0)
+    limit = _int(args, 'limit')
+    return positions[offset:] if limit is None else positions[offset:offset + max(limit, 0)]
+
+
+def stream_request(index, args):
+    """BlockStream of the query parameters of a data request (ValueError if invalid)
+
+    format=uint8|complex64|arrow, channels=0,1,..., frame_type, first/last or
+    t0/t1, offset/limit, start/count (samples of each block), decimate=N,
+    psd=<fft size> with window and overlap.
+    """
+    index = index.view(args.get('frame_type') or None)
+    channels = args.get('channels')
+    if channels:
+        try:
+            channels = [int(c) for c in channels.split(',')]
+        except ValueError:
+            raise ValueError("channels must be a comma separated list of channel numbers") from None
+    psd_params = None
+    fft_size = _int(args, 'psd')
+    if fft_size:
+        try:
+            overlap = float(args.get('overlap', PSD_OVERLAP))
+        except ValueError:
+            raise ValueError("overlap must be a number") from None
+        psd_params = {'fft_size': fft_size, 'overlap': min(max(overlap, 0.0), 0.9),
+                      'window': args.get('window', PSD_WINDOW)}
+    return BlockStream(index, select_positions(index, args), channels or None, _int(args, 'start', 0),
+                       _int(args, 'count'), args.get('format', DEFAULT_FORMAT), _int(args, 'decimate', 1), psd_params)
+
+
+def parse_range(header, size):
+    """(first, stop) byte range of a single-range 'Range: bytes=...' header
+
+    None if there is no usable header (the whole stream is sent), ValueError
+    if the range is outside the stream.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first == '':
+            first, stop = max(size - int(last), 0), size
+        else:
+            first, stop = int(first), size if last == '' else min(int(last) + 1, size)
+    except ValueError:
+        return None
+    if first >= stop:
+        raise ValueError(f"range {header} is outside the {size} byte stream")
+    return first, stop
+
+
+def index_column(index, name):
+    """One index column as a little-endian array (ValueError for unknown columns)"""
+    if name not in INDEX_COLUMNS:
+        raise ValueError(f"column must be one of {', '.join(INDEX_COLUMNS)}")
+    values = getattr(index, name)
+    if values is None:
+        values = np.zeros(len(index), dtype=np.int64)
+    return np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
@@ -0,0 +1,236 @@
+"""
+Live tail of a session directory while the DAQ is still writing
+Follows index.csv incrementally (inotify where available, polling otherwise)
+and publishes the extended index only for blocks whose files are complete
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+import numpy as np
+
+from iq_blocks import BYTES_PER_SAMPLE, NUM_CHANNELS, SAMPLES_PER_BLOCK, block_path
+from iq_index import (ALL_CHANNELS_MASK, FRAME_TYPE_DTYPE, INDEX_REGISTRY, SOURCE_CSV, SessionIndex,
+                      aggregate_blocks, csv_has_header, empty_columns, mask_to_channels, merge_blocks,
+                      read_index_rows, read_sidecar, scan_blocks, sidecar_path)
+from iq_metrics import log
+
+# Size of a fully written channel block file
+BLOCK_BYTES = SAMPLES_PER_BLOCK * BYTES_PER_SAMPLE
+POLL_INTERVAL = 1.0   # seconds
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+
+def _inotify_watch(paths):
+    """inotify file descriptor watching paths, or None when not available"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError, TypeError):
+        return None
+    if fd < 0:
+        return None
+    mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    watched = 0
+    for path in paths:
+        if os.path.isdir(path) and libc.inotify_add_watch(fd, os.fsencode(path), mask) >= 0:
+            watched += 1
+    if not watched:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _take(columns, keep):
+    return tuple(c[keep] for c in columns)
+
+
+class IndexFollower:
+    """Background thread that tails a session and publishes its growing index
+
+    New blocks are held back until every listed channel file has reached the
+    full block size, and until either all channels are present or a newer
+    block has appeared; a channel listed later for a block already shown
+    joins it once its own file is complete. Partially written files are
+    never read.
+    """
+
+    def __init__(self, index, poll_interval=POLL_INTERVAL):
+        self.session = index.session
+        self.path = index.path
+        self.index = index
+        self.poll_interval = poll_interval
+        self.index_path = os.path.join(self.path, 'index.csv')
+        empty = np.zeros(len(index), dtype=np.int64)
+        self._published = (index.blocks, index.channel_masks,
+                           empty if index.timestamps is None else index.timestamps,
+                           empty if index.frequencies is None else index.frequencies,
+                           index.frame_types)
+        self._pending = empty_columns()
+        self._offset = self._ingested_offset()
+        self._scan_mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def _ingested_offset(self):
+        """Bytes of index.csv already reflected in the index (from the sidecar)"""
+        cached = read_sidecar(sidecar_path(self.path))
+        if cached and cached[0]['source'] == SOURCE_CSV and os.path.exists(self.index_path):
+            if cached[0]['csv_offset'] <= os.path.getsize(self.index_path):
+                return cached[0]['csv_offset']
+        # Unknown: re-read from the start, merging is idempotent
+        return 0
+
+    def start(self):
+        watch = [self.path] + [os.path.join(self.path, f'ch{ch}') for ch in range(NUM_CHANNELS)]
+        self._fd = _inotify_watch(watch)
+        mode = 'inotify' if self._fd is not None else f'polling every {self.poll_interval:.1f}s'
+        log.info(f"✓ Following session {self.session} ({mode})")
+        self._thread = threading.Thread(target=self._run, name=f'follow-{self.session}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2 * self.poll_interval)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                log.error(f"Error following session {self.session}: {e}")
+            if self._fd is not None:
+                # Wake on file events; the timeout re-checks pending blocks
+                ready, _, _ = select.select([self._fd], [], [], self.poll_interval)
+                if ready:
+                    try:
+                        while os.read(self._fd, 65536):
+                            pass
+                    except BlockingIOError:
+                        pass
+            else:
+                self._stop.wait(self.poll_interval)
+
+    def _read_new_rows(self):
+        if os.path.exists(self.index_path):
+            if os.path.getsize(self.index_path) < self._offset:
+                # index.csv was rewritten: start over
+                self._offset = 0
+                self._published = empty_columns()
+                self._pending = empty_columns()
+            # Only a read from the start of the file can meet the header line
+            has_header = self._offset == 0 and csv_has_header(self.index_path)
+            df_raw, self._offset = read_index_rows(self.index_path, self._offset, has_header)
+            return None if df_raw is None else aggregate_blocks(df_raw)
+
+        # No index.csv: rescan directories when they change
+        mtime = max(os.stat(os.path.join(self.path, f'ch{ch}')).st_mtime_ns
+                    for ch in range(NUM_CHANNELS) if os.path.isdir(os.path.join(self.path, f'ch{ch}')))
+        if mtime == self._scan_mtime:
+            return None
+        self._scan_mtime = mtime
+        blocks, masks = scan_blocks(self.path)
+        zeros = np.zeros(len(blocks), dtype=np.int64)
+        return blocks, masks, zeros, zeros, zeros.astype(FRAME_TYPE_DTYPE)
+
+    def _complete_channels(self, block_index, mask):
+        """Mask of the listed channels whose block file is fully written"""
+        done = 0
+        for ch in mask_to_channels(mask):
+            try:
+                if os.path.getsize(block_path(self.path, ch, block_index)) >= BLOCK_BYTES:
+                    done |= 1 << ch
+            except OSError:
+                pass
+        return done
+
+    def _is_complete(self, block_index, mask, newest):
+        if mask != ALL_CHANNELS_MASK and block_index >= newest:
+            return False
+        return self._complete_channels(block_index, mask) == mask
+
+    def _publish_late_channels(self):
+        """Publish extra channel rows of blocks already shown, one channel at a time
+
+        A channel joins its block's mask only once its own file is complete;
+        the rest stays pending. True if any mask changed.
+        """
+        known = np.isin(self._pending[0], self._published[0])
+        if not known.any():
+            return False
+        late = _take(self._pending, known)
+        shown = self._published[1][np.searchsorted(self._published[0], late[0])]
+        outstanding = late[1] & ~shown
+        ready = np.array([self._complete_channels(int(b), int(m)) for b, m in zip(late[0], outstanding)],
+                         dtype=outstanding.dtype)
+        if ready.any():
+            self._published = merge_blocks(self._published, (late[0], ready) + late[2:])
+        waiting = outstanding & ~ready
+        late = (late[0], waiting) + late[2:]
+        self._pending = merge_blocks(_take(self._pending, ~known), _take(late, waiting != 0))
+        return bool(ready.any())
+
+    def poll(self):
+        """Ingest new rows and publish newly completed blocks; True if the index grew"""
+        new = self._read_new_rows()
+        if new is not None and len(new[0]):
+            self._pending = merge_blocks(self._pending, new)
+        changed = self._publish_late_channels()
+
+        if len(self._pending[0]):
+            newest = int(self._pending[0].max())
+            done = np.array([self._is_complete(int(b), int(m), newest)
+                             for b, m in zip(self._pending[0], self._pending[1])], dtype=bool)
+            if done.any():
+                self._published = merge_blocks(self._published, _take(self._pending, done))
+                self._pending = _take(self._pending, ~done)
+                changed = True
+
+        if changed:
+            self.index = SessionIndex(self.session, self.path, *self._published)
+            INDEX_REGISTRY.publish(self.session, self.index)
+        return changed
+
+    def latest_complete_position(self):
+        """Slider position of the newest block with all channels (None if none)"""
+        full = np.flatnonzero(self.index.channel_masks == ALL_CHANNELS_MASK)
+        return int(full[-1]) if len(full) else None
+
+
+# Active followers by session handle
+_FOLLOWERS = {}
+_FOLLOWERS_LOCK = threading.Lock()
+
+
+def start_following(index, poll_interval=POLL_INTERVAL):
+    """(Re)start following a session from a freshly loaded index"""
+    stop_following(index.session)
+    follower = IndexFollower(index, poll_interval)
+    with _FOLLOWERS_LOCK:
+        _FOLLOWERS[index.session] = follower
+    follower.start()
+    return follower
+
+
+def stop_following(session):
+    with _FOLLOWERS_LOCK:
+        follower = _FOLLOWERS.pop(session, None)
+    if follower is not None:
+        follower.stop()
+
+
+def get_follower(session):
+    with _FOLLOWERS_LOCK:
+        return _FOLLOWERS.get(session)
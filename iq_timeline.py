@@ -0,0 +1,169 @@
+"""
+Session timeline - block cadence, missing blocks and retunes along the capture time
+Gaps in the block numbering, capture stalls and frequency changes are found once
+per index in a few vectorized passes and kept as sorted event arrays. Binning a
+visible range is then one binary search per bin edge, so the timeline strip costs
+the same on a session of millions of blocks as on a short one.
+"""
+
+from datetime import datetime, timezone
+import numpy as np
+
+# Bins of the timeline strip
+TIMELINE_BINS = 400
+# An interval this many times the median block interval is a capture stall
+STALL_FACTOR = 3.0
+
+
+def format_time(time_ms):
+    """UTC wall-clock time of a ms timestamp, as shown on the timeline axis"""
+    return datetime.fromtimestamp(time_ms / 1000, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def to_ms(value):
+    """ms timestamp of a Plotly date axis value (date string or number)"""
+    if isinstance(value, str):
+        return int(np.datetime64(value.strip().replace(' ', 'T')).astype('datetime64[ms]').astype(np.int64))
+    return float(value)
+
+
+def parse_time(text, reference_ms):
+    """ms timestamp of a typed UTC time; a bare HH:MM[:SS[.mmm]] is taken on the day of reference_ms
+
+    Returns None if the text is not a time.
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+    if ':' in text and '-' not in text:
+        text = format_time(reference_ms)[:10] + 'T' + text
+    try:
+        return to_ms(text)
+    except ValueError:
+        return None
+
+
+def _sorted_events(x, *values):
+    """Event columns ordered by x (arrays from block order may be out of time order)"""
+    if np.all(x[1:] >= x[:-1]):
+        return (x,) + values
+    order = np.argsort(x, kind='stable')
+    return (x[order],) + tuple(v[order] for v in values)
+
+
+class SessionTimeline:
+    """Capture timeline of a session index
+
+    The x axis is the capture time in ms, or the block number for indexes
+    without timestamps (directory scans).
+    """
+
+    def __init__(self, index):
+        self.session = index.session
+        self.timed = index.timed()
+        blocks = index.blocks
+        if self.timed:
+            x_blocks = index.timestamps
+            self.x, order = index.time_sorted()
+        else:
+            x_blocks = blocks.astype(np.int64)
+            self.x, order = x_blocks, None
+        frequencies = index.frequencies
+        if frequencies is not None and order is not None:
+            frequencies = frequencies[order]
+        # Frequency of every block in x order (None if the index has none)
+        self.frequencies = frequencies if frequencies is not None and frequencies.any() else None
+
+        steps = np.diff(blocks).astype(np.int64)
+        intervals = np.diff(x_blocks)
+        self.n_blocks = len(blocks)
+        self.missing_total = int(blocks[-1] - blocks[0] + 1 - len(blocks)) if len(blocks) else 0
+
+        # Median time between consecutive block numbers
+        self.cadence_ms = None
+        if self.timed and np.any(steps == 1):
+            self.cadence_ms = float(np.median(intervals[steps == 1]))
+
+        # Missing blocks sit between their neighbours
+        gaps = np.flatnonzero(steps > 1)
+        self.gap_x, self.gap_missing = _sorted_events((x_blocks[gaps] + x_blocks[gaps + 1]) // 2, steps[gaps] - 1)
+        self.gap_cumsum = np.concatenate([[0], np.cumsum(self.gap_missing)])
+
+        # Stalls: consecutive block numbers captured much further apart than the cadence
+        if self.cadence_ms:
+            stalls = np.flatnonzero((steps == 1) & (intervals > STALL_FACTOR * self.cadence_ms))
+        else:
+            stalls = np.zeros(0, dtype=np.int64)
+        self.stall_x, = _sorted_events((x_blocks[stalls] + x_blocks[stalls + 1]) // 2)
+
+        # Retunes: first block at a new frequency
+        if index.frequencies is not None and self.frequencies is not None:
+            retunes = np.flatnonzero(np.diff(index.frequencies)) + 1
+            self.retune_x, self.retune_frequency = _sorted_events(x_blocks[retunes], index.frequencies[retunes])
+        else:
+            self.retune_x, self.retune_frequency = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    def extent(self):
+        """(first, last) x of the session"""
+        return (int(self.x[0]), int(self.x[-1])) if len(self.x) else (0, 1)
+
+    def bins(self, x0=None, x1=None, n_bins=TIMELINE_BINS):
+        """Per-bin counts over [x0, x1] (the whole session by default)
+
+        Returns a dict of bin edges and centers, received and missing blocks,
+        stalls, retunes and the frequency tuned at the end of each bin.
+        """
+        first, last = self.extent()
+        x0 = first if x0 is None else x0
+        x1 = last if x1 is None else x1
+        # At least one ms (or one block) per bin, and a non-empty range
+        pad = 0.5 * max(self.cadence_ms or 1.0, 1.0)
+        if x1 - x0 < 2 * pad:
+            x0, x1 = x0 - pad, x1 + pad
+        n_bins = int(max(1, min(n_bins, np.ceil(x1 - x0))))
+        edges = np.linspace(x0, x1, n_bins + 1)
+        # Integer bounds, so the searches do not convert the int64 arrays to float
+        lower = np.ceil(edges).astype(np.int64)
+        upper = np.int64(np.floor(x1))
+
+        def counts(x):
+            cut = np.searchsorted(x, lower, side='left')
+            cut[-1] = np.searchsorted(x, upper, side='right')
+            return cut
+
+        received = np.diff(counts(self.x))
+        missing = np.diff(self.gap_cumsum[counts(self.gap_x)])
+        stalls = np.diff(counts(self.stall_x))
+        retunes = np.diff(counts(self.retune_x))
+        frequency = None
+        if self.frequencies is not None:
+            last_block = np.maximum(np.searchsorted(self.x, np.floor(edges[1:]).astype(np.int64), side='right') - 1, 0)
+            frequency = self.frequencies[last_block]
+        return {
+            'edges': edges,
+            'centers': (edges[:-1] + edges[1:]) / 2,
+            'width': (x1 - x0) / n_bins,
+            'received': received,
+            'missing': missing,
+            'stalls': stalls,
+            'retunes': retunes,
+            'frequency': frequency,
+        }
+
+    def summary(self, x0=None, x1=None):
+        """Received / missing blocks, stalls and retunes in [x0, x1]"""
+        first, last = self.extent()
+        x0 = np.int64(first if x0 is None else np.ceil(x0))
+        x1 = np.int64(last if x1 is None else np.floor(x1))
+
+        def count(x):
+            return int(np.searchsorted(x, x1, side='right') - np.searchsorted(x, x0, side='left'))
+
+        lo = np.searchsorted(self.gap_x, x0, side='left')
+        hi = np.searchsorted(self.gap_x, x1, side='right')
+        return {
+            'received': count(self.x),
+            'missing': int(self.gap_cumsum[hi] - self.gap_cumsum[lo]),
+            'stalls': count(self.stall_x),
+            'retunes': count(self.retune_x),
+        }
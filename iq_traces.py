@@ -0,0 +1,130 @@
+"""
+Display data of a block, independent of the plotting library
+Decoded channel windows and the decimated (x, y) series of every display mode,
+shared by the Dash viewer (Plotly figures) and the batch renderer (rasters).
+"""
+
+import numpy as np
+
+from iq_blocks import BLOCK_CACHE, as_complex, block_path
+from iq_dsp import (DISPLAY_POINTS, PSD_FFT_SIZE, PSD_OVERLAP, PSD_WINDOW, fft_frequencies, minmax_decimate,
+                    stride_decimate, welch_psd)
+from iq_metrics import log
+
+
+# Trace colors per channel, and trace styles per mode (name, mode, color or None for the channel color)
+CHANNEL_COLORS = ['blue', 'red', 'green', 'orange']
+TRACE_STYLES = {
+    'IQ': [('I', 'lines', 'blue'), ('Q', 'lines', 'red')],
+    'FFT': [(None, 'lines', None)],
+    'CONST': [(None, 'markers', None)],
+    'AMP': [(None, 'lines', None)],
+}
+# Axis titles per mode: (x title on the bottom row, x title on every row, y title)
+AXIS_TITLES = {
+    'IQ': ("Time (ms)", None, None),
+    'FFT': ("Frequency (MHz)", None, "PSD (dB/Hz)"),
+    'CONST': (None, "I", "Q"),
+    'AMP': ("Time (ms)", None, "Amplitude"),
+}
+
+
+def load_iq_block(index, position, n_samples=None, start=0):
+    """Load IQ data for the block at a slider position (only n_samples starting at start are decoded)"""
+    if index is None or not 0 <= position < len(index):
+        log.debug("  Position %s not found in index", position)
+        return {}
+    
+    block_index = index.block_at(position)
+    session = index.session
+    channels = index.channels_at(position)
+    
+    log.debug("  Loading block %d from session %s, channels %s", block_index, session, channels)
+    
+    iq_data = {}
+    
+    for ch in channels:
+        filepath = block_path(index.path, ch, block_index)
+        
+        try:
+            # Memory-mapped, cached decode of the requested window (-1.0..+1.0)
+            pairs = BLOCK_CACHE.get_pairs((session, block_index, ch), filepath, start, n_samples)
+            
+            if pairs is not None:
+                I, Q = pairs[:, 0], pairs[:, 1]
+                iq_data[ch] = {'I': I, 'Q': Q, 'IQ': as_complex(pairs), 'type': index.frame_type_at(position)}
+            else:
+                log.warning("  Block file not found or empty: %s", filepath)
+                
+        except Exception:
+            log.exception("  Error loading %s", filepath)
+    
+    log.debug("  Loaded %d channels", len(iq_data))
+    return iq_data
+
+
+def channel_psd(iq_data, sample_rate, psd_params=None):
+    """Welch PSD of all loaded channels as one batched FFT; returns ({channel: dB}, freqs in MHz)"""
+    params = psd_params or {}
+    fft_size = params.get('fft_size', PSD_FFT_SIZE)
+    channels = [ch for ch in sorted(iq_data) if len(iq_data[ch]['I']) > 0]
+    if not channels:
+        return {}, fft_frequencies(fft_size, sample_rate) / 1e6
+    n = min(len(iq_data[ch]['IQ']) for ch in channels)
+    x = np.stack([iq_data[ch]['IQ'][:n] for ch in channels])
+    psd = welch_psd(x, sample_rate, fft_size,
+                    params.get('overlap', PSD_OVERLAP), params.get('window', PSD_WINDOW))
+    return dict(zip(channels, psd)), fft_frequencies(fft_size, sample_rate) / 1e6
+
+
+def iq_trace_data(iq_data, mode='IQ', n_samples=1000, sample_rate=2.4e6, start=0,
+                  max_points=DISPLAY_POINTS, psd_params=None):
+    """Decimated (x, y) of every skeleton trace, subplot titles and figure title
+
+    iq_data holds the window of n_samples starting at sample start; every trace
+    is decimated to about max_points points before it is sent to the browser.
+    FFT mode shows the Welch PSD of the whole window (psd_params: fft_size,
+    overlap, window).
+    """
+    num_channels = 4
+    empty = (np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32))
+    traces, titles = [], []
+    
+    # Calculate time parameters
+    time_per_sample = 1.0 / sample_rate  # seconds per sample
+    time_array = ((start + np.arange(n_samples)) * time_per_sample * 1000).astype(np.float32)  # in milliseconds
+    
+    if mode == 'FFT':
+        psd_by_channel, freqs_mhz = channel_psd(iq_data, sample_rate, psd_params)
+    
+    for channel in range(num_channels):
+        if channel not in iq_data or len(iq_data[channel]['I']) == 0:
+            traces.extend([empty] * len(TRACE_STYLES[mode]))
+            titles.append(f'Channel {channel} (No data)')
+            continue
+        
+        I = iq_data[channel]['I'][:n_samples]
+        Q = iq_data[channel]['Q'][:n_samples]
+        titles.append(f"Channel {channel} ({iq_data[channel].get('type', 'DATA')})")
+        
+        if mode == 'IQ':
+            traces.append(minmax_decimate(time_array[:len(I)], I, max_points))
+            traces.append(minmax_decimate(time_array[:len(Q)], Q, max_points))
+        elif mode == 'FFT':
+            if channel in psd_by_channel:
+                traces.append(minmax_decimate(freqs_mhz, psd_by_channel[channel], max_points))
+            else:
+                traces.append(empty)
+        elif mode == 'CONST':
+            step = stride_decimate(len(I), max_points)
+            traces.append((I[::step], Q[::step]) if len(I) > 10 else empty)
+        elif mode == 'AMP':
+            amplitude = np.sqrt(I**2 + Q**2)
+            traces.append(minmax_decimate(time_array[:len(amplitude)], amplitude, max_points))
+    
+    # Calculate parameters for title
+    duration_ms = n_samples / sample_rate * 1000
+    bandwidth_mhz = sample_rate / 1e6
+    title = (f"Mode: {mode} | Duration: {duration_ms:.2f} ms | Bandwidth: {bandwidth_mhz:.1f} MHz | "
+             f"Sample Rate: {sample_rate/1e6:.1f} MS/s")
+    return traces, titles, title
@@ -4,19 +4,91 @@ IQ Data Web Viewer - view IQ data through web browser
 Updated version for new file structure
 """
 
-import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import dash
-from dash import dcc, html, Input, Output, State, callback_context
+import flask
+from dash import dcc, html, Input, Output, Patch, State, callback_context
+import base64
+import copy
 import os
-from datetime import datetime
-import io
+import socket
+import threading
+import time
+from functools import lru_cache, partial, wraps
+
+from convergence import ConvergenceTracker, index_timestamps
+from iq_blocks import BLOCK_CACHE, NUM_CHANNELS, SAMPLES_PER_BLOCK, as_complex, block_path, decode_pairs, open_block
+from iq_dsp import (DISPLAY_POINTS, PSD_FFT_SIZE, PSD_OVERLAP, PSD_WINDOW, WINDOWS, fft_frequencies, pool_bins,
+                    welch_psd)
+from iq_index import FRAME_TYPES, INDEX_REGISTRY
+from iq_metrics import log, observe, register_source, render_metrics, timed
+from iq_overview import STAT_LABELS, STATS, OverviewBuilder
+from iq_player import PLAYER, SkippedFrame
+from iq_sessions import SessionCatalog
+from iq_stream import (SAMPLE_RATE, STREAM_FORMATS, arrow_available, index_column, parse_range, stream_request,
+                       stream_stats)
+from iq_tail import get_follower, start_following, stop_following
+from iq_timeline import SessionTimeline, format_time, parse_time, to_ms
+from iq_traces import AXIS_TITLES, CHANNEL_COLORS, TRACE_STYLES, iq_trace_data, load_iq_block
+
+def make_subplots(*args, **kwargs):
+    """plotly.subplots.make_subplots, imported with the first figure rather than at startup"""
+    from plotly.subplots import make_subplots
+    return make_subplots(*args, **kwargs)
 
 # Initialize Dash application
 app = dash.Dash(__name__)
 
+# Request timing: callback requests as a whole, and the part after the callback
+# body returned (response serialization and framework overhead)
+@app.server.before_request
+def start_request_timer():
+    flask.g.iq_start = time.perf_counter()
+
+@app.server.after_request
+def stop_request_timer(response):
+    start = flask.g.pop('iq_start', None)
+    if start is not None and flask.request.path.endswith('_dash-update-component'):
+        total = time.perf_counter() - start
+        observe('callback', total)
+        body = flask.g.pop('iq_callback_body', None)
+        if body is not None:
+            observe('serialize', max(total - body, 0.0))
+    return response
+
+def timed_callback(func):
+    """Record how long a callback body runs (the rest of its request counts as serialize)"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if flask.has_request_context():
+                flask.g.iq_callback_body = time.perf_counter() - t0
+    return wrapper
+
+@app.server.route('/metrics')
+def metrics():
+    """Prometheus text exposition of stage timings and cache counters"""
+    return flask.Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+# Modes with a time x axis; zooming re-queries the visible sample window
+TIME_MODES = ('IQ', 'AMP')
+
+# Blocks shown in the waterfall view (ending at the slider position)
+WATERFALL_BLOCKS = 32
+
+# Number of upcoming blocks decoded in the background while playing
+PREFETCH_BLOCKS = 4
+
+# Worker processes correlating new blocks for the PPM convergence plot
+CONVERGENCE_WORKERS = 1
+
+# Server port (IQ_WEB_PORT overrides)
+PORT = int(os.environ.get('IQ_WEB_PORT', 8050))
+
 # PATH CONFIGURATION - for _logs/iq_data/session/ structure
 BASE_PATHS = [
     '_logs/iq_data/session/',
@@ -32,302 +104,438 @@ def find_data_path():
             ch0_path = os.path.join(path, 'ch0')
             index_path = os.path.join(path, 'index.csv')
             if os.path.exists(ch0_path) or os.path.exists(index_path):
-                print(f"✓ Data path found: {path}")
+                log.info(f"✓ Data path found: {path}")
                 if os.path.exists(index_path):
-                    print(f"✓ Found index.csv")
+                    log.info("✓ Found index.csv")
                 if os.path.exists(ch0_path):
-                    print(f"✓ Found ch0 directory")
+                    log.info("✓ Found ch0 directory")
                 return path
     
-    print("⚠ WARNING: Data path not found!")
-    print(f"Looking for directories in: {BASE_PATHS}")
+    log.warning("⚠ WARNING: Data path not found!")
+    log.warning(f"Looking for directories in: {BASE_PATHS}")
     return BASE_PATHS[0]
 
-# Find correct path on startup
-DATA_PATH = find_data_path()
+# The data path is looked up on first use, not at import
+@lru_cache(maxsize=1)
+def data_path():
+    return find_data_path()
 
-def load_sessions_index():
-    """Load sessions and blocks index"""
-    if not os.path.exists(DATA_PATH):
-        print(f"Data path {DATA_PATH} not found")
-        return None
-    
-    # Check for index.csv
-    index_path = os.path.join(DATA_PATH, 'index.csv')
-    
-    if os.path.exists(index_path):
-        print(f"Loading index from {index_path}")
-        try:
-            # Check if CSV has header
-            with open(index_path, 'r') as f:
-                first_line = f.readline().strip()
-            
-            # If first line contains letters, it's a header
-            has_header = any(c.isalpha() for c in first_line.split(',')[0])
-            
-            if has_header:
-                # Read with header
-                df_raw = pd.read_csv(index_path)
-            else:
-                # Read without header, assign column names
-                # Format: timestamp,block,channel,frequency,field1,field2,filepath
-                df_raw = pd.read_csv(index_path, header=None, 
-                                     names=['Timestamp', 'Block', 'Channel', 'Frequency', 'Field1', 'Field2', 'FilePath'])
-            
-            print(f"✓ Loaded {len(df_raw)} records from index.csv")
-            print(f"  Columns: {list(df_raw.columns)}")
-            
-            # Convert to required format (group by blocks)
-            if 'Block' in df_raw.columns:
-                # Group by blocks and collect channel list
-                blocks_data = []
-                for block_num in sorted(df_raw['Block'].unique()):
-                    block_rows = df_raw[df_raw['Block'] == block_num]
-                    channels = sorted(block_rows['Channel'].unique())
-                    blocks_data.append({
-                        'Session': 'session',
-                        'BlockIndex': int(block_num),
-                        'Channels': len(channels),
-                        'ChannelList': channels,
-                        'Path': DATA_PATH
-                    })
-                
-                df = pd.DataFrame(blocks_data)
-                print(f"✓ Processed into {len(df)} unique blocks")
-                return df
-            
-            # If format is different, try to adapt
-            if 'BlockIndex' not in df_raw.columns and 'block' in df_raw.columns:
-                df_raw['BlockIndex'] = df_raw['block']
-            
-            # Add Session and Path columns if missing
-            if 'Session' not in df_raw.columns:
-                df_raw['Session'] = 'session'
-            if 'Path' not in df_raw.columns:
-                df_raw['Path'] = DATA_PATH
-            
-            if 'ChannelList' not in df_raw.columns:
-                # Assume all 4 channels are present
-                df_raw['ChannelList'] = [[0, 1, 2, 3]] * len(df_raw)
-                df_raw['Channels'] = 4
-            
-            return df_raw
-        except Exception as e:
-            print(f"Error reading index.csv: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    # If no index.csv, scan directories
-    print("No index.csv found, scanning directories...")
-    try:
-        # Look for ch0 to determine blocks
-        ch0_path = os.path.join(DATA_PATH, 'ch0')
-        if not os.path.exists(ch0_path):
-            print(f"ch0 directory not found in {DATA_PATH}")
-            return None
-        
-        # Get list of blocks
-        blocks = [f for f in os.listdir(ch0_path) if f.startswith('block_') and f.endswith('.bin')]
-        
-        records = []
-        for block_file in sorted(blocks):
-            block_num = int(block_file.replace('block_', '').replace('.bin', ''))
-            
-            # Check for all 4 channels
-            channels_exist = []
-            for ch in range(4):
-                ch_file = os.path.join(DATA_PATH, f'ch{ch}', block_file)
-                if os.path.exists(ch_file):
-                    channels_exist.append(ch)
-            
-            if channels_exist:
-                records.append({
-                    'Session': 'session',
-                    'BlockIndex': block_num,
-                    'Channels': len(channels_exist),
-                    'ChannelList': channels_exist,
-                    'Path': DATA_PATH
-                })
-        
-        df = pd.DataFrame(records)
-        print(f"✓ Loaded {len(records)} blocks from directory scan")
-        print(f"  Blocks: {len(df)} found")
-        
-        return df
-    except Exception as e:
-        print(f"Error scanning directories: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+def default_session():
+    """Session of the data path (shown first)"""
+    return os.path.basename(os.path.normpath(data_path()))
 
-def load_iq_block(block_index, session, df):
-    """Load IQ data for specific block"""
-    # Filter by BlockIndex and Session
-    block_data = df[(df['BlockIndex'] == block_index) & (df['Session'] == session)]
-    
-    if block_data.empty:
-        print(f"  Block {block_index} not found in session {session}")
+_SESSIONS = None
+_SESSIONS_LOCK = threading.Lock()
+
+def get_sessions():
+    """Catalog of the session* siblings of the data path, created on first use"""
+    global _SESSIONS
+    with _SESSIONS_LOCK:
+        if _SESSIONS is None:
+            _SESSIONS = SessionCatalog(os.path.dirname(os.path.normpath(data_path())))
+        return _SESSIONS
+
+def load_sessions_index(session=None, reload=False):
+    """Blocks index of a session (loaded on first access, cached afterwards)"""
+    return get_sessions().get(session or default_session(), reload)
+
+def prefetch_blocks(index, positions, n_samples=None, start=0):
+    """Decode upcoming blocks into the cache on background threads"""
+    requests = []
+    for position in positions:
+        block_index = index.block_at(position)
+        for ch in index.channels_at(position):
+            filepath = block_path(index.path, ch, block_index)
+            requests.append(((index.session, block_index, ch), filepath, start, n_samples))
+    BLOCK_CACHE.prefetch(requests)
+
+@lru_cache(maxsize=512)
+def block_psd(session_path, block_index, channels, sample_rate, fft_size, overlap, window):
+    """Welch PSD rows (one per channel) of a whole block, cached per block and parameters"""
+    rows = {}
+    blocks = []
+    for ch in channels:
+        raw = open_block(block_path(session_path, ch, block_index))
+        if raw is not None:
+            rows[ch] = len(blocks)
+            blocks.append(as_complex(decode_pairs(raw)))
+    if not blocks:
         return {}
+    n = min(len(b) for b in blocks)
+    psd = welch_psd(np.stack([b[:n] for b in blocks]), sample_rate, fft_size, overlap, window)
+    return {ch: psd[i] for ch, i in rows.items()}
+
+def create_waterfall(index, position, sample_rate=2.4e6, psd_params=None, n_blocks=WATERFALL_BLOCKS,
+                     max_points=DISPLAY_POINTS):
+    """Waterfall of Welch PSDs over the n_blocks blocks ending at a slider position, one heatmap per channel"""
+    params = psd_params or {}
+    fft_size = params.get('fft_size', PSD_FFT_SIZE)
+    overlap = params.get('overlap', PSD_OVERLAP)
+    window = params.get('window', PSD_WINDOW)
+    num_channels = 4
     
-    print(f"  Loading block {block_index} from session {session}")
-    
-    row = block_data.iloc[0]
-    session_path = row['Path']
-    channels_raw = row['ChannelList']
-    
-    # Convert ChannelList to list if it's a string
-    if isinstance(channels_raw, str):
-        # Parse string like "[0, 1, 2, 3]" or "0,1,2,3"
-        import json
-        try:
-            channels = json.loads(channels_raw)
-        except:
-            channels = [int(x.strip()) for x in channels_raw.strip('[]').split(',') if x.strip().isdigit()]
-    elif isinstance(channels_raw, list):
-        channels = channels_raw
-    else:
-        # Default: try all 4 channels
-        channels = [0, 1, 2, 3]
-    
-    print(f"  Channels to load: {channels}")
-    
-    iq_data = {}
+    positions = range(max(0, position - n_blocks + 1), position + 1)
+    blocks = [index.block_at(p) for p in positions]
+    with timed('dsp'):
+        rows = [block_psd(index.path, index.block_at(p), tuple(index.channels_at(p)),
+                          sample_rate, fft_size, overlap, window) for p in positions]
+    t0 = time.perf_counter()
+    freqs = pool_bins(fft_frequencies(fft_size, sample_rate)[None, :] / 1e6, max_points)[0]
     
-    for ch in channels:
-        filepath = os.path.join(session_path, f'ch{ch}', f'block_{block_index:05d}.bin')
-        
-        print(f"    Channel {ch}: {filepath}")
-        
-        if os.path.exists(filepath):
-            try:
-                file_size = os.path.getsize(filepath)
-                print(f"      File exists, size: {file_size} bytes")
-                
-                # Read IQ data (RTL-SDR format: unsigned 8-bit)
-                iq_raw = np.fromfile(filepath, dtype=np.uint8)
-                
-                if len(iq_raw) > 0:
-                    # RTL-SDR format: unsigned 8-bit (0-255)
-                    # Convert to range -1.0 to +1.0
-                    I = (iq_raw[0::2].astype(np.float32) - 127.5) / 127.5
-                    Q = (iq_raw[1::2].astype(np.float32) - 127.5) / 127.5
-                    
-                    iq_data[ch] = {'I': I, 'Q': Q, 'type': 'DATA'}
-                    print(f"      Loaded {len(I)} I/Q samples")
-                else:
-                    print(f"      Empty file")
-                    
-            except Exception as e:
-                print(f"      Error loading file: {e}")
-                import traceback
-                traceback.print_exc()
-        else:
-            print(f"      File NOT found")
-    
-    print(f"  Total channels loaded: {len(iq_data)}")
-    return iq_data
-
-def create_iq_plots(iq_data, mode='IQ', n_samples=1000, sample_rate=2.4e6):
-    """Create IQ data plots - vertical layout with synchronized zoom"""
-    # 4 rows for 4 channels (channel 0-3), 1 column
-    num_channels = 4
     fig = make_subplots(
         rows=num_channels, cols=1,
         subplot_titles=[f'Channel {i}' for i in range(num_channels)],
-        shared_xaxes=True,  # Synchronized zoom
+        shared_xaxes=True,
         vertical_spacing=0.05
     )
-    
-    colors = ['blue', 'red', 'green', 'orange']
-    
-    # Calculate time parameters
-    time_per_sample = 1.0 / sample_rate  # seconds per sample
-    time_array = np.arange(n_samples) * time_per_sample * 1000  # in milliseconds
-    
+    floor = np.full(len(freqs), np.nan, dtype=np.float32)
     for channel in range(num_channels):
-        row = channel + 1
-        col = 1
-        
-        if channel in iq_data and len(iq_data[channel]['I']) > 0:
-            I = iq_data[channel]['I'][:n_samples]
-            Q = iq_data[channel]['Q'][:n_samples]
-            frame_type = iq_data[channel].get('type', 'DATA')
-            
-            # Add frame type to title
-            fig.layout.annotations[channel].text = f'Channel {channel} ({frame_type})'
-            
-            if mode == 'IQ':
-                fig.add_trace(
-                    go.Scatter(x=time_array[:len(I)], y=I, mode='lines', name='I', 
-                              line=dict(color='blue', width=1)),
-                    row=row, col=col
-                )
-                fig.add_trace(
-                    go.Scatter(x=time_array[:len(Q)], y=Q, mode='lines', name='Q',
-                              line=dict(color='red', width=1)),
-                    row=row, col=col
-                )
-                if row == num_channels:
-                    fig.update_xaxes(title_text="Time (ms)", row=row, col=col)
-                
-            elif mode == 'FFT':
-                if len(I) > 0:
-                    complex_signal = I + 1j * Q
-                    fft_data = np.fft.fftshift(np.fft.fft(complex_signal))
-                    fft_mag = 20 * np.log10(np.abs(fft_data) + 1e-10)
-                    freqs = np.linspace(-sample_rate/2, sample_rate/2, len(fft_data)) / 1e6
-                    
-                    fig.add_trace(
-                        go.Scatter(x=freqs, y=fft_mag, mode='lines',
-                                  line=dict(color=colors[channel], width=1)),
-                        row=row, col=col
-                    )
-                if row == num_channels:
-                    fig.update_xaxes(title_text="Frequency (MHz)", row=row, col=col)
-                fig.update_yaxes(title_text="Power (dB)", row=row, col=col)
-                
-            elif mode == 'CONST':
-                if len(I) > 10:
-                    fig.add_trace(
-                        go.Scatter(x=I[::10], y=Q[::10], mode='markers',
-                                  marker=dict(size=2, color=colors[channel])),
-                        row=row, col=col
-                    )
-                fig.update_xaxes(title_text="I", row=row, col=col)
-                fig.update_yaxes(title_text="Q", row=row, col=col)
-                
-            elif mode == 'AMP':
-                if len(I) > 0:
-                    amplitude = np.sqrt(I**2 + Q**2)
-                    fig.add_trace(
-                        go.Scatter(x=time_array[:len(amplitude)], y=amplitude, mode='lines',
-                                  line=dict(color=colors[channel], width=1)),
-                        row=row, col=col
-                    )
-                if row == num_channels:
-                    fig.update_xaxes(title_text="Time (ms)", row=row, col=col)
-                fig.update_yaxes(title_text="Amplitude", row=row, col=col)
-        else:
-            # Add empty plot if no data
-            fig.add_trace(
-                go.Scatter(x=[0], y=[0], mode='lines', showlegend=False),
-                row=row, col=col
-            )
-            fig.layout.annotations[channel].text = f'Channel {channel} (No data)'
-    
-    # Calculate parameters for title
-    duration_ms = n_samples / sample_rate * 1000
-    bandwidth_mhz = sample_rate / 1e6
+        z = np.array([pool_bins(r[channel], max_points) if channel in r else floor for r in rows])
+        fig.add_trace(
+            go.Heatmap(x=freqs, y=blocks, z=z, colorscale='Viridis', showscale=(channel == 0),
+                       colorbar=dict(title='dB/Hz')),
+            row=channel + 1, col=1
+        )
+        fig.update_yaxes(title_text="Block", type='category', row=channel + 1, col=1)
+    fig.update_xaxes(title_text="Frequency (MHz)", row=num_channels, col=1)
     
     fig.update_layout(
         height=1000,
         showlegend=False,
-        title_text=f"Mode: {mode} | Duration: {duration_ms:.2f} ms | Bandwidth: {bandwidth_mhz:.1f} MHz | Sample Rate: {sample_rate/1e6:.1f} MS/s",
-        hovermode='x unified'
+        title_text=f"Mode: WATERFALL | Blocks: {blocks[0]}..{blocks[-1]} | FFT: {fft_size} ({window}, "
+                   f"{overlap:.0%} overlap) | Sample Rate: {sample_rate/1e6:.1f} MS/s"
     )
+    observe('figure_build', time.perf_counter() - t0)
+    return fig
+
+
+def typed_array(values):
+    """Plotly.js typed array (base64 float32), far smaller to send and parse than a JSON list"""
+    a = np.ascontiguousarray(values, dtype='<f4')
+    return {'dtype': 'f4', 'bdata': base64.b64encode(a.tobytes()).decode('ascii')}
+
+
+@lru_cache(maxsize=len(TRACE_STYLES))
+def figure_skeleton(mode):
+    """Layout and empty WebGL traces of a mode, built once; the same trace order is kept on every update"""
+    num_channels = 4
+    fig = make_subplots(
+        rows=num_channels, cols=1,
+        subplot_titles=[f'Channel {i}' for i in range(num_channels)],
+        shared_xaxes=True,  # Synchronized zoom
+        vertical_spacing=0.05
+    )
+    bottom_x, every_x, y_title = AXIS_TITLES[mode]
+    for channel in range(num_channels):
+        row = channel + 1
+        for name, trace_mode, color in TRACE_STYLES[mode]:
+            color = color or CHANNEL_COLORS[channel]
+            style = dict(marker=dict(size=2, color=color)) if trace_mode == 'markers' else dict(line=dict(color=color, width=1))
+            fig.add_trace(go.Scattergl(x=[], y=[], mode=trace_mode, name=name, **style), row=row, col=1)
+        if every_x or (bottom_x and row == num_channels):
+            fig.update_xaxes(title_text=every_x or bottom_x, row=row, col=1)
+        if y_title:
+            fig.update_yaxes(title_text=y_title, row=row, col=1)
+    fig.update_layout(height=1000, showlegend=False, hovermode='x unified')
+    return fig.to_plotly_json()
+
+
+def create_iq_plots(iq_data, mode='IQ', n_samples=1000, sample_rate=2.4e6, start=0,
+                    max_points=DISPLAY_POINTS, psd_params=None):
+    """Full figure (plotly JSON dict): the cached skeleton of the mode filled with data"""
+    with timed('dsp'):
+        traces, titles, title = iq_trace_data(iq_data, mode, n_samples, sample_rate, start, max_points, psd_params)
+    t0 = time.perf_counter()
+    skeleton = figure_skeleton(mode)
+    fig = {
+        'data': [dict(trace, x=typed_array(x), y=typed_array(y)) for trace, (x, y) in zip(skeleton['data'], traces)],
+        'layout': copy.deepcopy(skeleton['layout']),
+    }
+    for annotation, text in zip(fig['layout']['annotations'], titles):
+        annotation['text'] = text
+    fig['layout']['title'] = {'text': title}
+    observe('figure_build', time.perf_counter() - t0)
+    return fig
+
+
+def patch_iq_plots(iq_data, mode='IQ', n_samples=1000, sample_rate=2.4e6, start=0,
+                   max_points=DISPLAY_POINTS, psd_params=None):
+    """Partial update of a figure already showing the skeleton of mode: only data and titles are sent"""
+    with timed('dsp'):
+        traces, titles, title = iq_trace_data(iq_data, mode, n_samples, sample_rate, start, max_points, psd_params)
+    t0 = time.perf_counter()
+    patch = Patch()
+    for i, (x, y) in enumerate(traces):
+        patch['data'][i]['x'] = typed_array(x)
+        patch['data'][i]['y'] = typed_array(y)
+    for channel, text in enumerate(titles):
+        patch['layout']['annotations'][channel]['text'] = text
+    patch['layout']['title']['text'] = title
+    observe('figure_build', time.perf_counter() - t0)
+    return patch
+
+register_source('block_cache', BLOCK_CACHE.stats, counters=('hits', 'misses', 'evictions', 'prefetched'))
+register_source('psd_cache', lambda: block_psd.cache_info()._asdict(), counters=('hits', 'misses'))
+register_source('player', PLAYER.stats, counters=('frames', 'dropped', 'skipped'))
+register_source('sessions', lambda: {} if _SESSIONS is None else _SESSIONS.stats())
+register_source('stream', stream_stats, counters=('requests', 'bytes'))
+
+# Binary data API: sessions, index columns and block streams for scripts and notebooks
+def api_index(session):
+    """Index of a session for the data API: the one the viewer published, else loaded (404 if unknown)"""
+    if session not in get_sessions().names():
+        flask.abort(404, description=f"Unknown session {session}")
+    index = INDEX_REGISTRY.get(session)
+    if index is None:
+        index = load_sessions_index(session)
+    if index is None:
+        flask.abort(404, description=f"No blocks found in session {session}")
+    return index
+
+@app.server.route('/api/sessions')
+def api_sessions():
+    return flask.jsonify(get_sessions().names())
+
+@app.server.route('/api/sessions/<session>')
+def api_session(session):
+    """Summary of a session: block range, time span, frame types and stream formats"""
+    index = api_index(session)
+    summary = {
+        'session': session,
+        'blocks': len(index),
+        'first_block': index.block_at(0) if len(index) else None,
+        'last_block': index.block_at(-1) if len(index) else None,
+        'channels': NUM_CHANNELS,
+        'samples_per_block': SAMPLES_PER_BLOCK,
+        'sample_rate': SAMPLE_RATE,
+        'frame_types': {FRAME_TYPES.get(t, str(t)): n for t, n in index.type_counts().items()},
+        'formats': [f for f in STREAM_FORMATS if f != 'arrow' or arrow_available()],
+    }
+    if index.timed():
+        summary['first_timestamp'] = int(index.timestamps.min())
+        summary['last_timestamp'] = int(index.timestamps.max())
+    return flask.jsonify(summary)
+
+@app.server.route('/api/sessions/<session>/index/<column>')
+def api_index_column(session, column):
+    """One index column (blocks, timestamps, ...) as a raw little-endian array"""
+    try:
+        values = index_column(api_index(session).view(flask.request.args.get('frame_type') or None), column)
+    except ValueError as e:
+        return flask.jsonify(error=str(e)), 400
+    return flask.Response(values.tobytes(), mimetype='application/octet-stream',
+                          headers={'X-IQ-Dtype': values.dtype.name})
+
+@app.server.route('/api/sessions/<session>/data')
+def api_data(session):
+    """Stream a block range (query parameters: see iq_stream.stream_request)"""
+    index = api_index(session)
+    try:
+        stream = stream_request(index, flask.request.args)
+    except ValueError as e:
+        return flask.jsonify(error=str(e)), 400
+    headers = stream.headers()
+    if stream.fmt == 'arrow':
+        if not arrow_available():
+            return flask.jsonify(error="the arrow format needs pyarrow, which is not installed"), 501
+        return flask.Response(stream.iter_arrow(), mimetype='application/vnd.apache.arrow.stream', headers=headers)
     
+    # No Content-Length: the records go out with chunked transfer encoding as they are read
+    headers['Accept-Ranges'] = 'bytes'
+    try:
+        byte_range = parse_range(flask.request.headers.get('Range'), stream.size)
+    except ValueError as e:
+        return flask.Response(str(e), status=416, headers={'Content-Range': f'bytes */{stream.size}'})
+    if byte_range is None:
+        return flask.Response(stream.iter_bytes(), mimetype='application/octet-stream', headers=headers)
+    first, stop = byte_range
+    headers['Content-Range'] = f'bytes {first}-{stop - 1}/{stream.size}'
+    headers['Content-Length'] = str(stop - first)
+    return flask.Response(stream.iter_bytes(first, stop), status=206, mimetype='application/octet-stream',
+                          headers=headers)
+
+# Convergence trackers by session directory (delays cached across refreshes)
+_TRACKERS = {}
+
+
+def get_tracker(index):
+    tracker = _TRACKERS.get(index.path)
+    if tracker is None:
+        tracker = _TRACKERS[index.path] = ConvergenceTracker(index.path)
+    return tracker
+
+
+def create_convergence_plot(state, current_block=None):
+    """Delay and cumulative PPM correction per channel over the session"""
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        subplot_titles=("Delay vs reference (samples)", "PPM correction (cumulative)"))
+    colors = ['blue', 'red', 'green', 'orange']
+    for ch, c in state['channels'].items():
+        color = colors[ch % len(colors)]
+        fig.add_trace(go.Scatter(x=c['blocks'], y=c['delay'], mode='lines+markers', name=f'CH{ch}',
+                                 line=dict(color=color, width=1), marker=dict(size=4)), row=1, col=1)
+        fig.add_trace(go.Scatter(x=c['blocks'], y=c['cumulative'], mode='lines', name=f'CH{ch}',
+                                 line=dict(color=color, width=1), showlegend=False), row=2, col=1)
+    # The current-block marker is shape 0, moved by block_marker_patch when the slider moves
+    fig.add_shape(type='line', xref='x', yref='paper', x0=current_block or 0, x1=current_block or 0, y0=0, y1=1,
+                  visible=current_block is not None, line=dict(color='gray', dash='dot'))
+    if state['lock_block'] is not None:
+        fig.add_vline(x=state['lock_block'], line=dict(color='green', dash='dash'),
+                      annotation_text="Correction is DONE", annotation_position='top left')
+    fig.update_xaxes(title_text="Block", row=2, col=1)
+    fig.update_layout(height=500, hovermode='x unified', title_text="PPM convergence (delay_sync replay)")
+    return fig
+
+def block_marker_patch(current_block):
+    """Patch moving the current-block marker (shape 0) of a convergence or overview figure"""
+    patch = Patch()
+    patch['layout']['shapes'][0].update({'x0': current_block or 0, 'x1': current_block or 0,
+                                         'visible': current_block is not None})
+    return patch
+
+# Overview builders by session directory
+_OVERVIEWS = {}
+
+
+def get_overview(index):
+    builder = _OVERVIEWS.get(index.path)
+    if builder is None:
+        # Delays come from the convergence tracker, so each block is correlated once
+        builder = _OVERVIEWS[index.path] = OverviewBuilder(index.path, get_tracker(index))
+    return builder
+
+
+def pool_blocks(blocks, values, name, n_out=DISPLAY_POINTS):
+    """Reduce the block axis to at most n_out columns keeping the most extreme value of each bin"""
+    n = len(blocks)
+    if n <= n_out:
+        return blocks, values
+    factor = -(-n // n_out)
+    n_keep = (n // factor) * factor
+    binned = values[:n_keep].reshape((n_keep // factor, factor) + values.shape[1:])
+    if name == 'delay':
+        # Largest |delay| with its sign
+        pick = np.nanargmax(np.nan_to_num(np.abs(binned), nan=-1.0), axis=1)
+        pooled = np.take_along_axis(binned, pick[:, None], axis=1)[:, 0]
+    else:
+        pooled = np.fmax.reduce(binned, axis=1)
+    return blocks[:n_keep:factor], pooled
+
+
+def create_overview_plot(blocks, stats, current_block=None):
+    """One heatmap per statistic, channels x blocks; clicking a cell selects its block"""
+    num_channels = stats.shape[1]
+    fig = make_subplots(rows=len(STATS), cols=1, shared_xaxes=True, vertical_spacing=0.03,
+                        subplot_titles=[STAT_LABELS[name] for name in STATS])
+    for i, name in enumerate(STATS):
+        x, z = pool_blocks(blocks, stats[:, :, i], name)
+        row = i + 1
+        # Colorbar next to its own row
+        center = 1 - (i + 0.5) / len(STATS)
+        style = dict(colorscale='RdBu', zmid=0) if name in ('delay', 'iq_gain_db', 'iq_phase_deg') else dict(colorscale='Viridis')
+        fig.add_trace(
+            go.Heatmap(x=x, y=[f'CH{ch}' for ch in range(num_channels)], z=z.T, **style,
+                       colorbar=dict(y=center, len=0.9 / len(STATS), thickness=10),
+                       hovertemplate='Block %{x}<br>%{y}: %{z}<extra></extra>'),
+            row=row, col=1
+        )
+    # Current-block marker as shape 0, moved by block_marker_patch
+    fig.add_shape(type='line', xref='x', yref='paper', x0=current_block or 0, x1=current_block or 0, y0=0, y1=1,
+                  visible=current_block is not None, line=dict(color='white', width=1))
+    fig.update_xaxes(title_text="Block", row=len(STATS), col=1)
+    fig.update_layout(height=160 * len(STATS), title_text="Session overview (click a cell to open the block)")
     return fig
 
+# Capture timelines by session, rebuilt when a new index is published
+_TIMELINES = {}
+
+
+def get_timeline(index):
+    cached = _TIMELINES.get(index.session)
+    if cached is None or cached[0] is not index:
+        cached = _TIMELINES[index.session] = (index, SessionTimeline(index))
+    return cached[1]
+
+
+def timeline_x(index, position, timed):
+    """Timeline coordinate of a slider position (capture time or block number, None if out of range)"""
+    if index is None or position is None or not 0 <= position < len(index):
+        return None
+    return int(index.timestamps[position]) if timed else index.block_at(position)
+
+
+def position_at(index, x, timed):
+    """Slider position of the block nearest to a timeline coordinate (binary search)"""
+    if timed:
+        return index.position_at_time(x)
+    return int(min(np.searchsorted(index.blocks, x), len(index) - 1))
+
+
+def range_positions(index, x0, x1, timed):
+    """Ascending slider positions of the blocks in a timeline range"""
+    if timed:
+        return index.positions_between(x0, x1)
+    return np.arange(np.searchsorted(index.blocks, x0, side='left'), np.searchsorted(index.blocks, x1, side='right'))
+
+
+def create_timeline_plot(timeline, bins, current_x=None):
+    """Timeline strip: received and missing blocks per bin, capture stalls and the tuned frequency"""
+    frequency = bins['frequency']
+    rows = 1 if frequency is None else 2
+    fig = make_subplots(rows=rows, cols=1, shared_xaxes=True, vertical_spacing=0.08,
+                        row_heights=[0.65, 0.35][:rows] if rows == 2 else None)
+    x = bins['centers']
+    where = '%{x|%H:%M:%S.%L}' if timeline.timed else 'Block %{x:.0f}'
+    fig.add_trace(go.Bar(x=x, y=bins['received'], width=bins['width'], name='Received', marker_color='#1f77b4',
+                         hovertemplate=where + '<br>%{y} blocks<extra></extra>'), row=1, col=1)
+    fig.add_trace(go.Bar(x=x, y=bins['missing'], width=bins['width'], name='Missing', marker_color='#d62728',
+                         hovertemplate=where + '<br>%{y} missing<extra></extra>'), row=1, col=1)
+    stalled = bins['stalls'] > 0
+    fig.add_trace(go.Scatter(x=x[stalled], y=(bins['received'] + bins['missing'])[stalled], mode='markers',
+                             name='Stall', marker=dict(symbol='triangle-down', color='#ff7f0e', size=8),
+                             customdata=bins['stalls'][stalled],
+                             hovertemplate=where + '<br>%{customdata} stall(s)<extra></extra>'), row=1, col=1)
+    if frequency is not None:
+        mhz = frequency / 1e6
+        retuned = bins['retunes'] > 0
+        fig.add_trace(go.Scatter(x=x, y=mhz, mode='lines', line=dict(color='gray', shape='hv'), name='Frequency',
+                                 hovertemplate=where + '<br>%{y:.3f} MHz<extra></extra>'), row=2, col=1)
+        fig.add_trace(go.Scatter(x=x[retuned], y=mhz[retuned], mode='markers', name='Retune',
+                                 marker=dict(symbol='diamond', color='#2ca02c', size=8),
+                                 customdata=bins['retunes'][retuned],
+                                 hovertemplate=where + '<br>%{customdata} retune(s) to %{y:.3f} MHz<extra></extra>'),
+                      row=2, col=1)
+        fig.update_yaxes(title_text="MHz", row=2, col=1)
+    fig.update_yaxes(title_text="Blocks", row=1, col=1)
+    if timeline.timed:
+        fig.update_xaxes(type='date')
+    else:
+        fig.update_xaxes(title_text="Block", row=rows, col=1)
+    # Shape 0 marks the block on screen; slider moves patch only its position
+    fig.add_shape(type='line', xref='x', yref='paper', x0=current_x or 0, x1=current_x or 0, y0=0, y1=1,
+                  visible=current_x is not None, line=dict(color='black', width=1, dash='dot'))
+    fig.update_layout(height=230, barmode='stack', bargap=0, margin=dict(l=60, r=20, t=30, b=30),
+                      legend=dict(orientation='h', y=1.15, x=0), hovermode='closest')
+    return fig
+
+
+def timeline_info(timeline, x_range):
+    """Counts under the timeline strip for the shown range"""
+    summary = timeline.summary(*(x_range or (None, None)))
+    if x_range is None:
+        span = "Session"
+    elif timeline.timed:
+        span = f"{format_time(x_range[0])[11:]} – {format_time(x_range[1])[11:]}"
+    else:
+        span = f"Blocks {x_range[0]:.0f} – {x_range[1]:.0f}"
+    info = (f"{span}: {summary['received']} blocks | {summary['missing']} missing | "
+            f"{summary['stalls']} stalls | {summary['retunes']} retunes")
+    if timeline.cadence_ms:
+        info += f" | cadence {timeline.cadence_ms:.0f} ms"
+    if x_range is not None:
+        info += " | slider limited to this range (double-click the timeline to reset)"
+    return info
+
 # Application layout
 app.layout = html.Div([
     html.H1("KrakenSDR IQ Frame Analyzer", style={'text-align': 'center'}),
@@ -337,13 +545,25 @@ app.layout = html.Div([
             html.Button('Load/Refresh Data', id='refresh-button', n_clicks=0),
         ], style={'display': 'inline-block', 'margin': '10px'}),
         
+        html.Div([
+            html.Label("Session:"),
+            dcc.Dropdown(
+                id='session-selector',
+                options=[],
+                value=None,
+                clearable=False,
+                style={'width': '200px', 'display': 'inline-block', 'vertical-align': 'middle'}
+            ),
+        ], style={'display': 'inline-block', 'margin': '10px'}),
+        
         html.Div([
             html.Label("Display Mode:"),
             dcc.RadioItems(
                 id='mode-selector',
                 options=[
                     {'label': 'I/Q', 'value': 'IQ'},
-                    {'label': 'FFT', 'value': 'FFT'},
+                    {'label': 'FFT (Welch PSD)', 'value': 'FFT'},
+                    {'label': 'Waterfall', 'value': 'WATERFALL'},
                     {'label': 'Constellation', 'value': 'CONST'},
                     {'label': 'Amplitude', 'value': 'AMP'}
                 ],
@@ -354,7 +574,29 @@ app.layout = html.Div([
         
         html.Div([
             html.Label("Samples:"),
-            dcc.Input(id='samples-input', type='number', value=1000, min=100, max=100000),
+            dcc.Input(id='samples-input', type='number', value=1000, min=100, max=SAMPLES_PER_BLOCK),
+        ], style={'display': 'inline-block', 'margin': '10px'}),
+        
+        html.Div([
+            html.Label("Window:"),
+            dcc.Dropdown(
+                id='psd-window',
+                options=[{'label': name, 'value': name} for name in WINDOWS],
+                value=PSD_WINDOW,
+                clearable=False,
+                style={'width': '110px', 'display': 'inline-block', 'vertical-align': 'middle'}
+            ),
+            html.Label("FFT size:", style={'margin-left': '10px'}),
+            dcc.Dropdown(
+                id='psd-fft-size',
+                options=[{'label': str(2 ** k), 'value': 2 ** k} for k in range(8, 15)],
+                value=PSD_FFT_SIZE,
+                clearable=False,
+                style={'width': '90px', 'display': 'inline-block', 'vertical-align': 'middle'}
+            ),
+            html.Label("Overlap:", style={'margin-left': '10px'}),
+            dcc.Input(id='psd-overlap', type='number', value=PSD_OVERLAP, min=0, max=0.9, step=0.05,
+                      style={'width': '60px'}),
         ], style={'display': 'inline-block', 'margin': '10px'}),
         
         html.Div([
@@ -387,9 +629,20 @@ app.layout = html.Div([
         ),
     ], style={'margin': '20px'}),
     
+    html.Div([
+        html.Label("Jump to time (UTC):"),
+        dcc.Input(id='time-jump', type='text', placeholder='HH:MM:SS.mmm', debounce=True,
+                  style={'width': '200px', 'margin-left': '5px'}),
+        html.Span(id='timeline-info', style={'margin-left': '20px', 'color': 'gray', 'font-size': '12px'}),
+    ], style={'text-align': 'center', 'margin': '5px'}),
+    
+    dcc.Graph(id='timeline-plot', style={'display': 'none'}),
+    
     html.Div(id='info-div', style={'text-align': 'center', 'margin': '10px'}),
     
     dcc.Graph(id='iq-plot'),
+    # Mode whose figure skeleton the plot shows (updates then send only data)
+    dcc.Store(id='plot-skeleton'),
     
     dcc.Interval(
         id='interval-component',
@@ -402,23 +655,127 @@ app.layout = html.Div([
         html.Button('▶ Play', id='play-button', n_clicks=0),
         html.Label("Speed (ms):", style={'margin-left': '20px'}),
         dcc.Input(id='speed-input', type='number', value=500, min=100, max=5000, style={'width': '80px'}),
+        html.Span(id='play-stats', style={'margin-left': '20px', 'color': 'gray', 'font-size': '12px'}),
+        dcc.Checklist(
+            id='follow-toggle',
+            options=[
+                {'label': 'Follow live', 'value': 'follow'},
+                {'label': 'Auto-advance', 'value': 'advance'}
+            ],
+            value=[],
+            inline=True,
+            style={'display': 'inline-block', 'margin-left': '20px'}
+        ),
+    ], style={'text-align': 'center', 'margin': '10px'}),
+    
+    dcc.Interval(
+        id='follow-interval',
+        interval=1000,
+        n_intervals=0,
+        disabled=True
+    ),
+    
+    html.Div([
+        dcc.Checklist(
+            id='convergence-toggle',
+            options=[{'label': 'Show PPM convergence', 'value': 'show'}],
+            value=[],
+            inline=True
+        ),
+        html.Div(id='convergence-info', style={'margin': '5px'}),
     ], style={'text-align': 'center', 'margin': '10px'}),
     
+    dcc.Graph(id='convergence-plot', style={'display': 'none'}),
+    
+    html.Div([
+        dcc.Checklist(
+            id='overview-toggle',
+            options=[{'label': 'Show session overview', 'value': 'show'}],
+            value=[],
+            inline=True
+        ),
+        html.Div(id='overview-info', style={'margin': '5px'}),
+    ], style={'text-align': 'center', 'margin': '10px'}),
+    
+    dcc.Graph(id='overview-plot', style={'display': 'none'}),
+    
+    dcc.Interval(
+        id='overview-interval',
+        interval=2000,
+        n_intervals=0,
+        disabled=True
+    ),
+    
+    dcc.Interval(
+        id='convergence-interval',
+        interval=2000,
+        n_intervals=0,
+        disabled=True
+    ),
+    
     html.Div(id='path-info', style={'text-align': 'center', 'margin': '10px', 'color': 'gray', 'font-size': '12px'}),
     
     # Hidden state
     dcc.Store(id='frames-data-store'),
     dcc.Store(id='play-state', data={'playing': False}),
     dcc.Store(id='current-block', data={'block': 0}),
+    # Session and x range shown by the timeline (x0/x1 None: whole session)
+    dcc.Store(id='timeline-range'),
 ])
 
 # Callback for path
 @app.callback(
     Output('path-info', 'children'),
-    Input('refresh-button', 'n_clicks')
+    Input('frames-data-store', 'data')
+)
+def show_data_path(frames_data):
+    session = frames_data.get('session') if frames_data else None
+    if not session:
+        return f"Data path: {data_path()}"
+    return f"Data path: {get_sessions().path(session)}"
+
+# Callback for the session list (directories are listed again on refresh)
+@app.callback(
+    Output('session-selector', 'options'),
+    Output('session-selector', 'value'),
+    Input('refresh-button', 'n_clicks'),
+    State('session-selector', 'value')
 )
-def show_data_path(n_clicks):
-    return f"Data path: {DATA_PATH}"
+def list_sessions(n_clicks, current):
+    sessions = get_sessions()
+    names = sessions.names(refresh=bool(n_clicks))
+    if current not in names:
+        current = default_session() if default_session() in names or not names else names[0]
+    # Start indexing the selected session while the response goes out
+    if current in names:
+        sessions.load(current)
+    return [{'label': name, 'value': name} for name in names], current
+
+def session_index(frames_data):
+    """Published index of the session shown, narrowed to the selected frame type (None if unknown)"""
+    if not frames_data:
+        return None
+    index = INDEX_REGISTRY.get(frames_data.get('session'))
+    return None if index is None else index.view(frames_data.get('frame_type'))
+
+def slider_block(index, position):
+    """Block number at a slider position (None if out of range)"""
+    if index is None or position is None or not 0 <= position < len(index):
+        return None
+    return index.block_at(position)
+
+def slider_marks(index, first=0, last=None):
+    """About ten evenly spaced slider marks (positions first..last) labelled with block numbers"""
+    blocks = index.blocks
+    if not len(blocks):
+        return {}
+    last = len(blocks) - 1 if last is None else last
+    step = max(1, (last - first + 1) // 10)
+    marks = {}
+    for i in range(first, last + 1, step):
+        marks[i] = str(blocks[i])
+    marks[last] = str(blocks[last])
+    return marks
 
 # Callback for data loading
 @app.callback(
@@ -428,42 +785,92 @@ def show_data_path(n_clicks):
     Output('block-slider', 'marks'),
     Output('current-block', 'data'),
     Input('refresh-button', 'n_clicks'),
-    State('frame-type-filter', 'value')
+    Input('session-selector', 'value'),
+    Input('frame-type-filter', 'value')
 )
-def load_data(n_clicks, frame_type_filter):
-    df = load_sessions_index()
-    if df is None:
-        return {}, 0, 100, {}, {'block': 0, 'session': ''}
+def load_data(n_clicks, session, frame_type_filter):
+    if session is None:
+        # The session list is not filled yet; list_sessions triggers the load
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    reload = 'refresh-button.n_clicks' in callback_context.triggered_prop_ids
     
-    # Use all data (frame type filter no longer used)
-    df_filtered = df
+    # Switching back to a session reuses its published index (kept current by a follower)
+    index = None if reload else INDEX_REGISTRY.get(session)
+    if index is not None:
+        version = INDEX_REGISTRY.version(session)
+    else:
+        index = load_sessions_index(session, reload)
+        if index is None or len(index) == 0:
+            return {}, 0, 100, {}, {'block': 0, 'session': ''}
+        # Keep the index server-side; the client only gets a handle and version
+        version = INDEX_REGISTRY.publish(index.session, index)
     
-    if df_filtered.empty:
-        return {}, 0, 100, {}, {'block': 0, 'session': ''}
+    # A running follower continues from the refreshed index
+    if get_follower(index.session) is not None:
+        start_following(index)
     
-    # Get unique blocks (across all sessions)
-    blocks = sorted(df_filtered['BlockIndex'].unique())
-    if not blocks:
-        return {}, 0, 100, {}, {'block': 0, 'session': ''}
+    # The slider steps through the blocks of the selected frame type only
+    view = index.view(frame_type_filter)
+    frames_data = {
+        'session': index.session,
+        'version': version,
+        'frame_type': frame_type_filter,
+        'count': len(view)
+    }
     
-    # Create mapping
-    block_mapping = {i: block for i, block in enumerate(blocks)}
+    return frames_data, 0, max(len(view) - 1, 0), slider_marks(view), {'block': 0, 'session': index.session}
+
+# Callback for live follow on/off
+@app.callback(
+    Output('follow-interval', 'disabled'),
+    Input('follow-toggle', 'value'),
+    State('frames-data-store', 'data')
+)
+def toggle_follow(follow_value, frames_data):
+    following = 'follow' in (follow_value or [])
+    session = frames_data.get('session') if frames_data else None
+    index = INDEX_REGISTRY.get(session)
+    if following and index is not None:
+        if get_follower(session) is None:
+            start_following(index)
+    elif session:
+        stop_following(session)
+    return not following
+
+# Callback for live follow: extend the slider when the follower published new blocks
+@app.callback(
+    Output('frames-data-store', 'data', allow_duplicate=True),
+    Output('block-slider', 'max', allow_duplicate=True),
+    Output('block-slider', 'marks', allow_duplicate=True),
+    Output('block-slider', 'value', allow_duplicate=True),
+    Input('follow-interval', 'n_intervals'),
+    State('follow-toggle', 'value'),
+    State('frames-data-store', 'data'),
+    prevent_initial_call=True
+)
+def follow_session(n_intervals, follow_value, frames_data):
+    if not frames_data:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
     
-    # Marks for slider
-    step = max(1, len(blocks) // 10)
-    marks = {}
-    for i, block in enumerate(blocks):
-        if i % step == 0 or i == 0 or i == len(blocks) - 1:
-            marks[i] = str(block)
+    session = frames_data.get('session')
+    follower = get_follower(session)
+    version = INDEX_REGISTRY.version(session)
+    if follower is None or version == frames_data.get('version'):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
     
-    # Save data
-    frames_data = {
-        'df_json': df_filtered.to_json(orient='records', date_format='iso'),
-        'block_mapping': block_mapping,
-        'blocks': blocks
-    }
+    frames_data = dict(frames_data, version=version)
+    index = session_index(frames_data)
+    frames_data['count'] = len(index)
+    
+    value = dash.no_update
+    if 'advance' in (follow_value or []):
+        position = follower.latest_complete_position()
+        if position is not None:
+            position = index.position_of(follower.index.block_at(position))
+        if position is not None:
+            value = position
     
-    return frames_data, 0, len(blocks) - 1, marks, {'block': 0}
+    return frames_data, max(len(index) - 1, 0), slider_marks(index), value
 
 # Callback for slider and play
 @app.callback(
@@ -473,13 +880,12 @@ def load_data(n_clicks, frame_type_filter):
     Output('play-button', 'children'),
     Input('block-slider', 'value'),
     Input('play-button', 'n_clicks'),
-    Input('interval-component', 'n_intervals'),
     State('play-state', 'data'),
     State('current-block', 'data'),
     State('block-slider', 'max'),
     State('block-slider', 'min')
 )
-def handle_block_changes(slider_value, play_clicks, n_intervals, play_state, current_block, max_val, min_val):
+def handle_block_changes(slider_value, play_clicks, play_state, current_block, max_val, min_val):
     ctx = callback_context
     
     if not ctx.triggered:
@@ -489,17 +895,11 @@ def handle_block_changes(slider_value, play_clicks, n_intervals, play_state, cur
     
     if trigger_id == 'play-button':
         new_playing = not play_state['playing']
+        # Fresh frame buffer and FPS/drop counters for every play run
+        PLAYER.pause()
         button_text = '⏸ Pause' if new_playing else '▶ Play'
         return slider_value, {'playing': new_playing}, not new_playing, button_text
     
-    elif trigger_id == 'interval-component' and play_state['playing']:
-        if slider_value < max_val:
-            new_value = slider_value + 1
-        else:
-            new_value = min_val
-        button_text = '⏸ Pause' if play_state['playing'] else '▶ Play'
-        return new_value, play_state, not play_state['playing'], button_text
-    
     elif trigger_id == 'block-slider':
         button_text = '⏸ Pause' if play_state['playing'] else '▶ Play'
         return slider_value, play_state, not play_state['playing'], button_text
@@ -507,99 +907,434 @@ def handle_block_changes(slider_value, play_clicks, n_intervals, play_state, cur
     button_text = '⏸ Pause' if play_state['playing'] else '▶ Play'
     return slider_value, play_state, not play_state['playing'], button_text
 
+def psd_settings(psd_window, psd_fft_size, psd_overlap):
+    """Welch PSD parameters from the controls, with defaults and overlap clamped to 0..0.9"""
+    return {
+        'window': psd_window or PSD_WINDOW,
+        'fft_size': int(psd_fft_size or PSD_FFT_SIZE),
+        'overlap': min(max(float(psd_overlap if psd_overlap is not None else PSD_OVERLAP), 0.0), 0.9),
+    }
+
+def axis_range(relayout_data):
+    """(x0, x1) of a zoomed x axis from relayoutData, or None if the x range did not change"""
+    x0 = x1 = None
+    for key, value in relayout_data.items():
+        if not key.startswith('xaxis'):
+            continue
+        if key.endswith('.range[0]'):
+            x0 = value
+        elif key.endswith('.range[1]'):
+            x1 = value
+        elif key.endswith('.range') and isinstance(value, list) and len(value) == 2:
+            x0, x1 = value
+    if x0 is None or x1 is None:
+        return None
+    return x0, x1
+
+def zoom_window(relayout_data, sample_rate):
+    """Sample window (start, count) of a zoomed time axis in ms, or None if the x range did not change"""
+    x_range = axis_range(relayout_data)
+    if x_range is None:
+        return None
+    x0, x1 = x_range
+    first = max(0, int(np.floor(x0 / 1000 * sample_rate)))
+    last = min(SAMPLES_PER_BLOCK, int(np.ceil(x1 / 1000 * sample_rate)) + 1)
+    return first, max(last - first, 2)
+
 # Callback for plots
 @app.callback(
     Output('iq-plot', 'figure'),
     Output('info-div', 'children'),
+    Output('plot-skeleton', 'data'),
     Input('block-slider', 'value'),
     Input('mode-selector', 'value'),
     Input('samples-input', 'value'),
-    State('frames-data-store', 'data')
+    Input('iq-plot', 'relayoutData'),
+    Input('psd-window', 'value'),
+    Input('psd-fft-size', 'value'),
+    Input('psd-overlap', 'value'),
+    State('frames-data-store', 'data'),
+    State('play-state', 'data'),
+    State('plot-skeleton', 'data')
 )
-def update_plot(slider_position, mode, n_samples, frames_data):
-    print(f"\n=== update_plot ===")
-    print(f"Slider position: {slider_position}, Mode: {mode}, Samples: {n_samples}")
+@timed_callback
+def update_plot(slider_position, mode, n_samples, relayout_data, psd_window, psd_fft_size, psd_overlap,
+                frames_data, play_state=None, skeleton=None):
+    log.debug("update_plot: position %s, mode %s, samples %s", slider_position, mode, n_samples)
+    
+    # Sample rate fixed for RTLSDR
+    sample_rate = 2.4e6
+    
+    # Zooming a time axis re-queries full resolution samples of the visible window; patched
+    # figures keep their axis range, so other blocks are re-queried over the same window
+    start = 0
+    zoom = skeleton.get('zoom') if skeleton and skeleton.get('mode') == mode else None
+    if callback_context.triggered_id == 'iq-plot':
+        if mode not in TIME_MODES or not relayout_data:
+            return dash.no_update, dash.no_update, dash.no_update
+        zoom = zoom_window(relayout_data, sample_rate)
+        if zoom is not None:
+            log.debug("Zoom window: samples %d..%d", zoom[0], zoom[0] + zoom[1])
+        elif not any(k.endswith('.autorange') for k in relayout_data):
+            return dash.no_update, dash.no_update, dash.no_update
+    if zoom is not None:
+        start, n_samples = zoom
     
     if not frames_data:
-        print("No frames data")
+        log.debug("No frames data")
         empty_fig = go.Figure()
         empty_fig.update_layout(height=1000)
-        return empty_fig, "No data available. Please click 'Load/Refresh Data'."
+        return empty_fig, "No data available. Please click 'Load/Refresh Data'.", None
     
-    # Extract data
-    try:
-        df = pd.read_json(io.StringIO(frames_data['df_json']), orient='records')
-        
-        block_mapping = frames_data.get('block_mapping', {})
-        
-        # Get real block number
-        if block_mapping:
-            block_mapping = {int(k): v for k, v in block_mapping.items()}
-            block_index = block_mapping.get(slider_position, 0)
-            print(f"Mapped position {slider_position} to block {block_index}")
-        else:
-            blocks = sorted(df['BlockIndex'].unique())
-            if slider_position < len(blocks):
-                block_index = blocks[slider_position]
-            else:
-                block_index = blocks[0]
-            print(f"Using fallback: position {slider_position} -> block {block_index}")
-    except Exception as e:
-        print(f"Error parsing data: {e}")
-        import traceback
-        traceback.print_exc()
+    # Look up the server-side index
+    index = session_index(frames_data)
+    if index is None or len(index) == 0:
         empty_fig = go.Figure()
         empty_fig.update_layout(height=1000)
-        return empty_fig, "Error parsing data"
-    
-    # Find session for this block
-    block_data = df[df['BlockIndex'] == block_index]
-    if block_data.empty:
-        print(f"Block {block_index} not found")
+        return empty_fig, "No blocks of the selected frame type in this session.", None
+    if not 0 <= slider_position < len(index):
+        log.debug("Position %s not in index", slider_position)
         empty_fig = go.Figure()
         empty_fig.update_layout(height=1000)
-        return empty_fig, f"Block {block_index} not found"
+        return empty_fig, "No data available. Please click 'Load/Refresh Data'.", None
+    
+    block_index = index.block_at(slider_position)
+    log.debug("Mapped position %d to block %d", slider_position, block_index)
+    
+    psd_params = psd_settings(psd_window, psd_fft_size, psd_overlap)
+    
+    # The player already showed this position while playing
+    if (callback_context.triggered_id == 'block-slider' and play_state and play_state.get('playing')
+            and PLAYER.shown == (play_key(frames_data, mode, n_samples, psd_params, start), slider_position)):
+        return dash.no_update, dash.no_update, dash.no_update
     
-    session = block_data.iloc[0]['Session']
+    if mode == 'WATERFALL':
+        fig = create_waterfall(index, slider_position, sample_rate, psd_params)
+        info = (f"Position: {slider_position + 1}/{len(index)} | "
+                f"Session: {index.session} | "
+                f"Blocks: up to #{block_index} | "
+                f"FFT size: {psd_params['fft_size']}")
+        return fig, info, None
     
-    print(f"Loading IQ data for block {block_index} from session {session}")
-    iq_data = load_iq_block(block_index, session, df)
+    # The PSD averages over the whole block
+    if mode == 'FFT':
+        start, n_samples = 0, SAMPLES_PER_BLOCK
+    
+    iq_data = load_iq_block(index, slider_position, n_samples, start)
     
     if not iq_data:
-        print("No IQ data loaded")
+        log.warning("No IQ data for block %d", block_index)
         empty_fig = go.Figure()
         empty_fig.update_layout(height=1000)
-        return empty_fig, f"No IQ data for block {block_index}"
+        return empty_fig, f"No IQ data for block {block_index}", None
     
-    print(f"Loaded IQ data for channels: {list(iq_data.keys())}")
     
-    # Sample rate fixed for RTLSDR
-    sample_rate = 2.4e6
+    # While playing, decode the next blocks before the interval asks for them
+    if play_state and play_state.get('playing'):
+        upcoming = [(slider_position + k) % len(index) for k in range(1, PREFETCH_BLOCKS + 1)]
+        prefetch_blocks(index, upcoming, n_samples, start)
     
-    # Create plot
+    # Create plot: the first figure of a mode is sent whole, later ones only patch the data
+    patch = skeleton is not None and skeleton.get('mode') == mode
     try:
-        fig = create_iq_plots(iq_data, mode, n_samples, sample_rate)
-        print("Figure created successfully")
+        render = patch_iq_plots if patch else create_iq_plots
+        fig = render(iq_data, mode, n_samples, sample_rate, start, psd_params=psd_params)
     except Exception as e:
-        print(f"Error creating figure: {e}")
+        log.exception("Error creating figure")
         empty_fig = go.Figure()
         empty_fig.update_layout(height=1000)
-        return empty_fig, f"Error creating plot: {str(e)}"
+        return empty_fig, f"Error creating plot: {str(e)}", None
     
-    # Block information
-    if not block_data.empty:
-        block_info = block_data.iloc[0]
-        
-        info = (f"Position: {slider_position + 1}/{len(block_mapping) if block_mapping else 1} | "
-                f"Session: {session} | "
-                f"Block: #{block_index} | "
-                f"Channels: {len(iq_data)} | "
-                f"Samples: {n_samples}")
+    info = block_info(index, slider_position, iq_data, start, n_samples)
+    log.debug("%s figure: %s", "Patched" if patch else "Created", info)
+    # A whole figure is sent with its axes reset
+    if patch and zoom is not None:
+        return fig, info, {'mode': mode, 'zoom': [start, n_samples]}
+    return fig, info, {'mode': mode}
+
+def block_info(index, position, iq_data, start, n_samples):
+    """Info line under the slider"""
+    info = (f"Position: {position + 1}/{len(index)} | "
+            f"Session: {index.session} | "
+            f"Block: #{index.block_at(position)} | ")
+    if index.timed():
+        info += f"Time: {format_time(index.timestamps[position])[11:]} | "
+    return info + (f"Channels: {len(iq_data)} | "
+                   f"Samples: {start}..{start + n_samples}")
+
+def play_key(frames_data, mode, n_samples, psd_params, start=0):
+    """What the player renders; any change discards frames rendered ahead"""
+    return (frames_data.get('session'), frames_data.get('version'), frames_data.get('frame_type'), mode,
+            start, n_samples, tuple(sorted(psd_params.items())))
+
+def render_play_frame(index, position, mode, n_samples, sample_rate, psd_params, start=0):
+    """Patch and info text of one Play frame (runs on the player thread)"""
+    if mode == 'FFT':
+        start, n_samples = 0, SAMPLES_PER_BLOCK
+    iq_data = load_iq_block(index, position, n_samples, start)
+    fig = patch_iq_plots(iq_data, mode, n_samples, sample_rate, start, psd_params=psd_params)
+    return fig, block_info(index, position, iq_data, start, n_samples)
+
+# Callback for Play ticks: show the frame the player rendered ahead
+@app.callback(
+    Output('iq-plot', 'figure', allow_duplicate=True),
+    Output('info-div', 'children', allow_duplicate=True),
+    Output('block-slider', 'value', allow_duplicate=True),
+    Output('play-stats', 'children'),
+    Input('interval-component', 'n_intervals'),
+    State('play-state', 'data'),
+    State('block-slider', 'value'),
+    State('block-slider', 'min'),
+    State('block-slider', 'max'),
+    State('mode-selector', 'value'),
+    State('samples-input', 'value'),
+    State('psd-window', 'value'),
+    State('psd-fft-size', 'value'),
+    State('psd-overlap', 'value'),
+    State('frames-data-store', 'data'),
+    State('plot-skeleton', 'data'),
+    prevent_initial_call=True
+)
+@timed_callback
+def play_tick(n_intervals, play_state, slider_value, min_val, max_val, mode, n_samples,
+              psd_window, psd_fft_size, psd_overlap, frames_data, skeleton):
+    if not play_state or not play_state.get('playing') or not frames_data:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    index = session_index(frames_data)
+    if index is None or len(index) == 0:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    next_position = slider_value + 1 if slider_value < max_val else min_val
+    
+    # Modes without a patchable skeleton on screen (waterfall, first frame) render in update_plot
+    if mode not in TRACE_STYLES or not skeleton or skeleton.get('mode') != mode:
+        return dash.no_update, dash.no_update, next_position, "Rendering in request"
+    
+    psd_params = psd_settings(psd_window, psd_fft_size, psd_overlap)
+    # Frames of a zoomed figure cover its visible window
+    start, n_samples = skeleton.get('zoom') or (0, n_samples)
+    key = play_key(frames_data, mode, n_samples, psd_params, start)
+    render = partial(render_play_frame, index, mode=mode, n_samples=n_samples, sample_rate=2.4e6,
+                     psd_params=psd_params, start=start)
+    PLAYER.configure(key, render, next_position, min_val, max_val)
+    frame = PLAYER.pop(key, next_position)
+    
+    stats = PLAYER.stats()
+    text = f"{stats['fps']:.1f} FPS | dropped: {stats['dropped']} | buffered: {stats['buffered']}"
+    if frame is None:
+        # Not rendered yet: skip this tick instead of queueing work
+        return dash.no_update, dash.no_update, dash.no_update, text
+    if isinstance(frame, SkippedFrame):
+        # Keep the last figure and move on instead of retrying the failing block
+        return (dash.no_update, f"⚠ Position {next_position + 1}: could not render block: {frame.error}",
+                next_position, text)
+    fig, info = frame
+    return fig, info, next_position, text
+
+# Callback for the PPM convergence plot
+@app.callback(
+    Output('convergence-plot', 'figure'),
+    Output('convergence-plot', 'style'),
+    Output('convergence-info', 'children'),
+    Output('convergence-interval', 'disabled'),
+    Input('convergence-toggle', 'value'),
+    Input('convergence-interval', 'n_intervals'),
+    Input('frames-data-store', 'data'),
+    Input('block-slider', 'value')
+)
+def update_convergence(toggle, n_intervals, frames_data, slider_position):
+    hidden = {'display': 'none'}
+    if 'show' not in (toggle or []):
+        return dash.no_update, hidden, "", True
+    index = INDEX_REGISTRY.get(frames_data.get('session')) if frames_data else None
+    if index is None:
+        return dash.no_update, hidden, "No data available. Please click 'Load/Refresh Data'.", True
+    
+    # Moving the slider (or Play) only moves the marker of the figure on screen
+    if callback_context.triggered_id == 'block-slider':
+        current = slider_block(session_index(frames_data), slider_position)
+        return block_marker_patch(current), dash.no_update, dash.no_update, dash.no_update
+    
+    # Correlate blocks not cached yet without blocking the callback
+    tracker = get_tracker(index)
+    if tracker.missing_blocks(index.blocks):
+        tracker.update_in_background(index.blocks, CONVERGENCE_WORKERS)
+    updating = tracker.is_updating()
+    
+    state = tracker.replay(index_timestamps(index))
+    current = slider_block(session_index(frames_data), slider_position)
+    fig = create_convergence_plot(state, current)
+    if state['lock_block'] is not None:
+        elapsed = "" if state['time_to_lock'] is None else f", time to lock {state['time_to_lock']:.1f} s"
+        info = f"✓ Correction is DONE at block {state['lock_block']}{elapsed}"
     else:
-        info = f"Block: {block_index}"
+        info = "Correction not done yet"
+    if updating:
+        info += f" | estimating delays: {tracker.pending} blocks left"
+    return fig, {'display': 'block'}, info, not updating
+
+# Callback for the session overview heatmaps
+@app.callback(
+    Output('overview-plot', 'figure'),
+    Output('overview-plot', 'style'),
+    Output('overview-info', 'children'),
+    Output('overview-interval', 'disabled'),
+    Input('overview-toggle', 'value'),
+    Input('overview-interval', 'n_intervals'),
+    Input('frames-data-store', 'data'),
+    Input('block-slider', 'value')
+)
+def update_overview(toggle, n_intervals, frames_data, slider_position):
+    hidden = {'display': 'none'}
+    if 'show' not in (toggle or []):
+        return dash.no_update, hidden, "", True
+    index = INDEX_REGISTRY.get(frames_data.get('session')) if frames_data else None
+    if index is None:
+        return dash.no_update, hidden, "No data available. Please click 'Load/Refresh Data'.", True
+    
+    # Blocks without statistics are processed in the background, one at a time
+    builder = get_overview(index)
+    if callback_context.triggered_id == 'block-slider':
+        # The heatmaps stay; only the marker follows the slider (and Play)
+        if not len(builder):
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        current = slider_block(session_index(frames_data), slider_position)
+        return block_marker_patch(current), dash.no_update, dash.no_update, dash.no_update
+    if builder.missing_blocks(index.blocks):
+        builder.update_in_background(index.blocks)
+    updating = builder.is_updating()
+    
+    blocks, stats = builder.snapshot()
+    if not len(blocks):
+        return dash.no_update, hidden, f"Computing overview: {builder.pending} blocks left", not updating
+    current = slider_block(session_index(frames_data), slider_position)
+    info = f"Overview of {len(blocks)} blocks"
+    if updating:
+        info += f" | computing: {builder.pending} blocks left"
+    return create_overview_plot(blocks, stats, current), {'display': 'block'}, info, not updating
+
+# Clicking an overview cell jumps the slider to its block
+@app.callback(
+    Output('block-slider', 'value', allow_duplicate=True),
+    Input('overview-plot', 'clickData'),
+    State('frames-data-store', 'data'),
+    prevent_initial_call=True
+)
+def jump_to_overview_block(click_data, frames_data):
+    # Blocks of other frame types than the selected one are not on the slider
+    index = session_index(frames_data)
+    if index is None or not click_data or not click_data.get('points'):
+        return dash.no_update
+    position = index.position_of(int(click_data['points'][0]['x']))
+    return dash.no_update if position is None else position
+
+# Callback for the capture timeline strip
+@app.callback(
+    Output('timeline-plot', 'figure'),
+    Output('timeline-plot', 'style'),
+    Output('timeline-info', 'children'),
+    Output('timeline-range', 'data'),
+    Input('frames-data-store', 'data'),
+    Input('timeline-plot', 'relayoutData'),
+    Input('block-slider', 'value'),
+    State('timeline-range', 'data')
+)
+def update_timeline(frames_data, relayout_data, slider_position, time_range):
+    index = INDEX_REGISTRY.get(frames_data.get('session')) if frames_data else None
+    if index is None or len(index) == 0:
+        return dash.no_update, {'display': 'none'}, "", None
+    timeline = get_timeline(index)
+    current = timeline_x(session_index(frames_data), slider_position, timeline.timed)
+    shown = time_range if time_range and time_range.get('session') == index.session else None
+    trigger = callback_context.triggered_id
+    
+    # Moving the slider (or Play) only moves the marker of the strip on screen
+    if trigger == 'block-slider':
+        if shown is None:
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        patch = Patch()
+        patch['layout']['shapes'][0].update({'x0': current or 0, 'x1': current or 0, 'visible': current is not None})
+        return patch, dash.no_update, dash.no_update, dash.no_update
+    
+    # Zooming re-bins the visible range; double-click (autorange) goes back to the whole session
+    x_range = None
+    if trigger == 'timeline-plot':
+        if not relayout_data:
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        zoomed = axis_range(relayout_data)
+        if zoomed is not None:
+            x_range = tuple(sorted((to_ms(zoomed[0]), to_ms(zoomed[1]))))
+        elif not any(k.endswith('.autorange') for k in relayout_data):
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    elif shown is not None and shown.get('x0') is not None:
+        # Refreshed or followed index: keep the selected range
+        x_range = shown['x0'], shown['x1']
+    
+    bins = timeline.bins(*(x_range or (None, None)))
+    fig = create_timeline_plot(timeline, bins, current)
+    x0, x1 = x_range or (None, None)
+    return (fig, {'display': 'block'}, timeline_info(timeline, x_range),
+            {'session': index.session, 'x0': x0, 'x1': x1})
+
+# The slider (and Play) covers the blocks of the range shown on the timeline
+@app.callback(
+    Output('block-slider', 'min', allow_duplicate=True),
+    Output('block-slider', 'max', allow_duplicate=True),
+    Output('block-slider', 'marks', allow_duplicate=True),
+    Output('block-slider', 'value', allow_duplicate=True),
+    Input('timeline-range', 'data'),
+    State('frames-data-store', 'data'),
+    State('block-slider', 'value'),
+    prevent_initial_call=True
+)
+def limit_slider_to_range(time_range, frames_data, slider_value):
+    index = session_index(frames_data)
+    if index is None or len(index) == 0 or not time_range:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    first, last = 0, len(index) - 1
+    if time_range.get('x0') is not None:
+        positions = range_positions(index, time_range['x0'], time_range['x1'], index.timed())
+        if len(positions):
+            first, last = int(positions[0]), int(positions[-1])
+    value = slider_value if slider_value is not None and first <= slider_value <= last else first
+    return first, last, slider_marks(index, first, last), value
+
+# Typing a time or clicking the timeline opens the block captured closest to it
+@app.callback(
+    Output('block-slider', 'value', allow_duplicate=True),
+    Output('timeline-info', 'children', allow_duplicate=True),
+    Input('time-jump', 'value'),
+    Input('timeline-plot', 'clickData'),
+    State('frames-data-store', 'data'),
+    State('block-slider', 'min'),
+    State('block-slider', 'max'),
+    prevent_initial_call=True
+)
+def jump_to_time(time_text, click_data, frames_data, min_val, max_val):
+    index = session_index(frames_data)
+    if index is None or len(index) == 0:
+        return dash.no_update, dash.no_update
+    timed = index.timed()
+    if callback_context.triggered_id == 'timeline-plot':
+        if not click_data or not click_data.get('points'):
+            return dash.no_update, dash.no_update
+        x = to_ms(click_data['points'][0]['x'])
+    elif not timed:
+        return dash.no_update, "⚠ This session has no block timestamps"
+    else:
+        x = parse_time(time_text, int(index.timestamps[0]))
+        if x is None:
+            return dash.no_update, f"⚠ Not a time: {time_text}"
     
-    print(f"Returning figure with info: {info}")
-    return fig, info
+    position = position_at(index, x, timed)
+    if position is None:
+        return dash.no_update, dash.no_update
+    if not min_val <= position <= max_val:
+        return dash.no_update, "⚠ That time is outside the range shown (double-click the timeline to reset)"
+    if not timed:
+        return position, dash.no_update
+    offset = int(index.timestamps[position]) - x
+    return position, (f"✓ Block #{index.block_at(position)} at {format_time(index.timestamps[position])[11:]} "
+                      f"({offset:+.0f} ms from the requested time)")
 
 # Callback for speed
 @app.callback(
@@ -609,43 +1344,49 @@ def update_plot(slider_position, mode, n_samples, frames_data):
 def update_interval_speed(speed):
     return speed if speed else 500
 
+def wait_for_port(port, timeout=30.0):
+    """True once a local server accepts connections on port"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def warm_up(port):
+    """Index the default session once the server is listening and print its statistics
+
+    The load goes through the session catalog, so the first load_data callback
+    waits for (or reuses) this load instead of starting another one.
+    """
+    wait_for_port(port)
+    sessions = get_sessions()
+    names = sessions.names()
+    index = load_sessions_index()
+    print(f"Data path: {data_path()}")
+    if index is not None and len(index) > 0:
+        print(f"\nIndex info:")
+        print(f"  Blocks: {len(index)}")
+        print(f"✓ Found {len(index)} unique blocks (range: {index.blocks[0]} to {index.blocks[-1]})")
+        print(f"✓ Found {len(names)} session(s) in {sessions.root}")
+        print("\nSession statistics:")
+        print(f"  {index.session}: {len(index)} blocks")
+        
+        print(f"\nChannel statistics:")
+        num_ch, counts = np.unique(index.channel_counts(), return_counts=True)
+        for n, count in sorted(zip(num_ch, counts), key=lambda x: -x[1]):
+            print(f"  {n} channels: {count} blocks")
+    print("-"*60)
+
 if __name__ == '__main__':
     print("="*60)
     print(" "*15 + "KrakenSDR IQ Frame Viewer")
     print("="*60)
-    print(f"Data path: {DATA_PATH}")
-    
-    # Check data availability
-    df = load_sessions_index()
-    if df is not None and len(df) > 0:
-        print(f"\nDataFrame info:")
-        print(f"  Shape: {df.shape}")
-        print(f"  Columns: {list(df.columns)}")
-        
-        if 'BlockIndex' in df.columns:
-            unique_blocks = df['BlockIndex'].nunique()
-            min_block = df['BlockIndex'].min()
-            max_block = df['BlockIndex'].max()
-            print(f"✓ Found {unique_blocks} unique blocks (range: {min_block} to {max_block})")
-        
-        if 'Session' in df.columns:
-            unique_sessions = df['Session'].nunique()
-            print(f"✓ Found {unique_sessions} session(s)")
-            
-            # Session statistics
-            session_stats = df.groupby('Session').size()
-            print("\nSession statistics:")
-            for session, count in session_stats.items():
-                print(f"  {session}: {count} blocks")
-        
-        if 'Channels' in df.columns:
-            print(f"\nChannel statistics:")
-            channel_stats = df['Channels'].value_counts()
-            for num_ch, count in channel_stats.items():
-                print(f"  {num_ch} channels: {count} blocks")
-    
-    print("-"*60)
-    print("Starting server at http://localhost:8050")
+    print(f"Starting server at http://localhost:{PORT}")
     print("="*60)
     
-    app.run(debug=False, host='0.0.0.0', port=8050)
\ No newline at end of file
+    # Data path discovery and indexing happen once the port is open
+    threading.Thread(target=warm_up, args=(PORT,), name='iq-warm-up', daemon=True).start()
+    app.run(debug=False, host='0.0.0.0', port=PORT)
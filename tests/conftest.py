@@ -0,0 +1,142 @@
+"""
+Shared fixtures: synthetic sessions written to a temporary directory
+Block files hold full-size interleaved uint8 I/Q blocks; index.csv rows use the
+DAQ layout (timestamp,block,channel,frequency,field1,frame_type,filepath).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The tools are flat modules at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from iq_blocks import BYTES_PER_SAMPLE, NUM_CHANNELS, SAMPLES_PER_BLOCK, block_path  # noqa: E402
+from iq_index import INDEX_COLUMNS  # noqa: E402
+
+# Capture time of block 0 and block interval of the synthetic sessions (ms)
+T0_MS = 1770822898000
+BLOCK_MS = 110
+
+
+def write_block(session_path, channel, block, data):
+    """Write one channel block file (uint8 bytes)"""
+    path = block_path(session_path, channel, block)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.asarray(data, dtype=np.uint8).tofile(path)
+    return path
+
+
+def random_block(rng, n_samples=SAMPLES_PER_BLOCK):
+    return rng.integers(0, 256, n_samples * BYTES_PER_SAMPLE, dtype=np.uint8)
+
+
+def delayed_pairs(rng, delays, n=SAMPLES_PER_BLOCK, margin=4096):
+    """uint8 I/Q bytes per channel from one noise sequence: ch[m] = ch0[m + delay] ({channel: delay})"""
+    noise = rng.integers(0, 256, (n + 2 * margin, 2), dtype=np.uint8)
+    out = {0: noise[margin:margin + n].ravel()}
+    for ch, d in delays.items():
+        out[ch] = noise[margin + d:margin + d + n].ravel()
+    return out
+
+
+def index_rows(blocks, channels=range(NUM_CHANNELS), timestamps=None, frequency=700000000, frame_types=None):
+    """index.csv lines for blocks (one per channel)"""
+    lines = []
+    for i, block in enumerate(blocks):
+        t = T0_MS + block * BLOCK_MS if timestamps is None else timestamps[i]
+        frame_type = 0 if frame_types is None else frame_types[i]
+        for ch in channels:
+            lines.append(f"{t},{block},{ch},{frequency},0,{frame_type},ch{ch}/block_{block:05d}.bin\n")
+    return ''.join(lines)
+
+
+@pytest.fixture
+def make_session(tmp_path):
+    """Factory writing a session directory: block files for every channel and an index.csv
+
+    blocks: block numbers; data: callable (channel, block) -> uint8 array (random by default);
+    index: False to leave out index.csv; header: write a header line first.
+    """
+    rng = np.random.default_rng(0)
+
+    def make(blocks=range(4), name='session', data=None, index=True, header=False, **row_options):
+        path = str(tmp_path / name)
+        for block in blocks:
+            for ch in row_options.get('channels', range(NUM_CHANNELS)):
+                write_block(path, ch, block, random_block(rng) if data is None else data(ch, block))
+        if index:
+            with open(os.path.join(path, 'index.csv'), 'w') as f:
+                if header:
+                    f.write(",".join(INDEX_COLUMNS) + "\n")
+                f.write(index_rows(list(blocks), **row_options))
+        return path
+
+    return make
+
+
+@pytest.fixture
+def delayed_session(make_session):
+    """Factory of sessions whose blocks carry known channel delays ({block: {channel: delay}})"""
+    def make(block_delays, name='session'):
+        rng = np.random.default_rng(7)
+        data = {b: delayed_pairs(rng, d) for b, d in block_delays.items()}
+        return make_session(sorted(block_delays), name=name, data=lambda ch, b: data[b][ch])
+    return make
+
+
+class DashClient:
+    """Posts Dash callback requests to the viewer's Flask app, addressed by callback function name"""
+
+    def __init__(self, app):
+        self.http = app.server.test_client()
+        self.callbacks = {}
+        for output, spec in app.callback_map.items():
+            func = spec['callback']
+            while hasattr(func, '__wrapped__'):
+                func = func.__wrapped__
+            self.callbacks[func.__name__] = (output, spec)
+
+    def call(self, name, values=None, changed=()):
+        """Run a callback with {'id.property': value} inputs/state; returns its response ({} if no update)"""
+        output, spec = self.callbacks[name]
+        values = values or {}
+
+        def dependencies(deps):
+            return [{'id': d['id'], 'property': d['property'], 'value': values.get(f"{d['id']}.{d['property']}")}
+                    for d in deps]
+
+        pieces = output.strip('.').split('...') if output.startswith('..') else [output]
+        outputs = [dict(zip(('id', 'property'), piece.split('.', 1))) for piece in pieces]
+        payload = {
+            'output': output,
+            'outputs': outputs if output.startswith('..') else outputs[0],
+            'inputs': dependencies(spec['inputs']),
+            'state': dependencies(spec['state']),
+            'changedPropIds': list(changed),
+        }
+        response = self.http.post('/_dash-update-component', json=payload)
+        if response.status_code == 204:
+            return {}
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response.get_json()['response']
+
+
+@pytest.fixture
+def web(make_session, monkeypatch):
+    """iq_web pointed at a synthetic 'session' (8 blocks) with a clean index registry
+
+    Returns (iq_web module, DashClient, session path).
+    """
+    import iq_web
+    path = make_session(range(8))
+    monkeypatch.setattr(iq_web, 'BASE_PATHS', [path + os.sep])
+    monkeypatch.setattr(iq_web, '_SESSIONS', None)
+    iq_web.data_path.cache_clear()
+    with iq_web.INDEX_REGISTRY._lock:
+        iq_web.INDEX_REGISTRY._indexes.clear()
+        iq_web.INDEX_REGISTRY._versions.clear()
+    yield iq_web, DashClient(iq_web.app), path
+    iq_web.data_path.cache_clear()
@@ -0,0 +1,158 @@
+import filecmp
+import os
+
+import numpy as np
+import pytest
+
+import iq_archive
+from conftest import index_rows
+from iq_archive import (ARCHIVE_HEADER, CHUNK_DTYPE, SessionArchive, available_codecs, export_session,
+                        import_archive, open_archive, read_archive_block, split_archive_path)
+from iq_blocks import NUM_CHANNELS, block_path, open_block
+from iq_index import FRAME_TYPE_DTYPE, INDEX_COLUMNS, load_index
+
+BLOCKS = [0, 1, 3, 5]
+FRAME_TYPES = [0, 0, 3, 4]
+
+
+@pytest.fixture
+def session(make_session):
+    """Session with a block gap, frame types and one channel missing from block 3"""
+    path = make_session(BLOCKS, frame_types=FRAME_TYPES)
+    os.remove(block_path(path, 2, 3))
+    rows = index_rows(BLOCKS, frame_types=FRAME_TYPES).splitlines(keepends=True)
+    with open(os.path.join(path, 'index.csv'), 'w') as f:
+        f.writelines(row for row in rows if 'ch2/block_00003' not in row)
+    return path
+
+
+def same_columns(a, b):
+    for name in ('blocks', 'channel_masks', 'timestamps', 'frequencies', 'frame_types'):
+        np.testing.assert_array_equal(getattr(a, name), getattr(b, name))
+
+
+@pytest.mark.parametrize('codec', [pytest.param(c, marks=pytest.mark.skipif(c not in available_codecs(),
+                                                                               reason=f"{c} not installed"))
+                                   for c in iq_archive.CODECS])
+def test_round_trip_is_byte_identical(session, tmp_path, codec):
+    archive_path = export_session(session, str(tmp_path / 'packed.iqpack'), codec=codec, workers=2)
+    restored = import_archive(archive_path, str(tmp_path / 'restored'))
+    for block in BLOCKS:
+        for ch in range(NUM_CHANNELS):
+            original = block_path(session, ch, block)
+            if os.path.exists(original):
+                assert filecmp.cmp(original, block_path(restored, ch, block), shallow=False)
+            else:
+                assert not os.path.exists(block_path(restored, ch, block))
+    assert filecmp.cmp(os.path.join(session, 'index.csv'), os.path.join(restored, 'index.csv'), shallow=False)
+    # Exporting the restored session gives the same archive again
+    again = export_session(restored, str(tmp_path / 'again.iqpack'), codec=codec, workers=1)
+    assert filecmp.cmp(archive_path, again, shallow=False)
+
+
+def test_blocks_are_read_through_archive_paths(session, tmp_path):
+    archive_path = export_session(session, str(tmp_path / 'session.iqpack'))
+    member = block_path(archive_path, 1, 3)
+    assert split_archive_path(member) == (archive_path, 1, 3)
+    assert split_archive_path(os.path.join(session, 'ch1', 'block_00003.bin')) is None
+    np.testing.assert_array_equal(open_block(member), np.fromfile(block_path(session, 1, 3), dtype=np.uint8))
+    assert open_block(block_path(archive_path, 2, 3)) is None
+    assert open_block(block_path(archive_path, 0, 2)) is None
+    same_columns(load_index(archive_path), load_index(session))
+
+    archive = open_archive(archive_path)
+    assert open_archive(archive_path) is archive
+    stats = archive.stats()
+    assert stats['chunks'] == 4 * NUM_CHANNELS - 1
+    assert stats['raw_bytes'] == sum(os.path.getsize(block_path(session, ch, b))
+                                     for b in BLOCKS for ch in range(NUM_CHANNELS)
+                                     if os.path.exists(block_path(session, ch, b)))
+
+
+def older_version(archive_path, version, out_path):
+    """Copy of an archive cut back to an older format version"""
+    with open(archive_path, 'rb') as f:
+        data = bytearray(f.read())
+    fields = list(ARCHIVE_HEADER.unpack_from(data))
+    fields[1] = version
+    ARCHIVE_HEADER.pack_into(data, 0, *fields)
+    # Version 2 ends after the frame type column, version 1 after the channel masks
+    end = fields[8] + len(BLOCKS) * (8 + 8 + 4 + 1 + (np.dtype(FRAME_TYPE_DTYPE).itemsize if version >= 2 else 0))
+    with open(out_path, 'wb') as f:
+        f.write(data[:end])
+    return out_path
+
+
+def test_version_1_archives_read_as_data_frames(session, tmp_path):
+    archive_path = export_session(session, str(tmp_path / 'v3.iqpack'))
+    v1_path = older_version(archive_path, 1, str(tmp_path / 'v1.iqpack'))
+
+    v1, v3 = SessionArchive(v1_path), SessionArchive(archive_path)
+    for old, new in zip(v1.columns()[:4], v3.columns()[:4]):
+        np.testing.assert_array_equal(old, new)
+    assert v1.columns()[4].tolist() == [0] * len(BLOCKS)
+    assert v3.columns()[4].tolist() == FRAME_TYPES
+    np.testing.assert_array_equal(v1.raw(5, 3), v3.raw(5, 3))
+    assert v1.index_csv() is None
+
+
+def test_index_csv_round_trips_row_for_row(make_session, tmp_path):
+    # Field1 and per-channel timestamps differ between the rows of a block
+    path = make_session(BLOCKS, index=False)
+    rows = [row.split(',') for row in index_rows(BLOCKS, frame_types=FRAME_TYPES).splitlines()]
+    for i, row in enumerate(rows):
+        row[0] = str(int(row[0]) + i % NUM_CHANNELS)
+        row[4] = ('0', '229', '496')[i % 3]
+    with open(os.path.join(path, 'index.csv'), 'w') as f:
+        f.write(','.join(INDEX_COLUMNS) + '\n' + ''.join(','.join(row) + '\n' for row in rows))
+    archive_path = export_session(path, str(tmp_path / 'session.iqpack'))
+    restored = import_archive(archive_path, str(tmp_path / 'restored'))
+    with open(os.path.join(path, 'index.csv')) as original, open(os.path.join(restored, 'index.csv')) as copy:
+        assert copy.read().splitlines() == original.read().splitlines()
+    same_columns(load_index(restored), load_index(path))
+
+    # Older archives carry no index.csv: one row per stored block and channel is rebuilt
+    v2_path = older_version(archive_path, 2, str(tmp_path / 'v2.iqpack'))
+    assert SessionArchive(v2_path).index_csv() is None
+    rebuilt = import_archive(v2_path, str(tmp_path / 'rebuilt'))
+    with open(os.path.join(rebuilt, 'index.csv')) as f:
+        assert f.read() == index_rows(BLOCKS, frame_types=FRAME_TYPES)
+
+
+def test_invalid_archives(session, tmp_path):
+    archive_path = export_session(session, str(tmp_path / 'session.iqpack'))
+    with open(archive_path, 'rb') as f:
+        data = bytearray(f.read())
+    future = bytearray(data)
+    fields = list(ARCHIVE_HEADER.unpack_from(future))
+    fields[1] = iq_archive.ARCHIVE_VERSION + 1
+    ARCHIVE_HEADER.pack_into(future, 0, *fields)
+    for name, content in (('short.iqpack', data[:10]), ('magic.iqpack', b'X' * 8 + data[8:]),
+                          ('future.iqpack', future)):
+        with open(tmp_path / name, 'wb') as f:
+            f.write(content)
+        with pytest.raises(ValueError):
+            SessionArchive(str(tmp_path / name))
+
+    # A chunk whose size does not match the table is reported, not returned
+    table_offset = ARCHIVE_HEADER.unpack_from(data)[7]
+    table = np.frombuffer(data, dtype=CHUNK_DTYPE, count=1, offset=table_offset).copy()
+    table['size'] += 1
+    data[table_offset:table_offset + CHUNK_DTYPE.itemsize] = table.tobytes()
+    corrupt = str(tmp_path / 'corrupt.iqpack')
+    with open(corrupt, 'wb') as f:
+        f.write(data)
+    with pytest.raises(ValueError):
+        SessionArchive(corrupt).raw(0, 0)
+    assert read_archive_block(block_path(corrupt, 0, 0)) is None
+    assert read_archive_block(block_path(corrupt, 1, 0)) is not None
+
+
+def test_cli(session, tmp_path, capsys):
+    archive_path = str(tmp_path / 'cli.iqpack')
+    assert iq_archive.main(['export', '--base', session, '--out', archive_path, '--codec', 'zlib']) == 0
+    assert iq_archive.main(['import', archive_path, '--out', str(tmp_path / 'cli')]) == 0
+    assert iq_archive.main(['info', archive_path]) == 0
+    out = capsys.readouterr().out
+    assert "Blocks: 4 (range: 0 to 5), 15 chunks" in out
+    assert iq_archive.main(['info', str(tmp_path / 'missing.iqpack')]) == 1
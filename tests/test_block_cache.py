@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pytest
+
+from conftest import write_block
+from iq_blocks import BlockCache, decode_pairs
+
+# Decoded size of a 100-sample block: (100, 2) float32
+ENTRY_BYTES = 100 * 2 * 4
+
+
+@pytest.fixture
+def blocks(tmp_path):
+    """Paths and contents of five 100-sample blocks of channel 0"""
+    rng = np.random.default_rng(3)
+    data = [rng.integers(0, 256, 200, dtype=np.uint8) for _ in range(5)]
+    return [write_block(str(tmp_path), 0, b, d) for b, d in enumerate(data)], data
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_hits_misses_and_values(blocks):
+    paths, data = blocks
+    cache = BlockCache(max_bytes=10 * ENTRY_BYTES)
+    first = cache.get_pairs(('s', 0, 0), paths[0], 10, 20)
+    np.testing.assert_array_equal(first, decode_pairs(data[0])[10:30])
+    again = cache.get_pairs(('s', 0, 0), paths[0], 12, 5)
+    np.testing.assert_array_equal(again, decode_pairs(data[0])[12:17])
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+    # Cached windows are shared, so they must not be writable
+    assert not again.flags.writeable
+
+
+def test_overlapping_request_widens_the_entry(blocks):
+    paths, data = blocks
+    cache = BlockCache(max_bytes=10 * ENTRY_BYTES)
+    key = ('s', 0, 0)
+    cache.get_pairs(key, paths[0], 0, 40)
+    window = cache.get_pairs(key, paths[0], 30, 40)
+    np.testing.assert_array_equal(window, decode_pairs(data[0])[30:70])
+    assert cache.stats()['entries'] == 1
+    assert cache.current_bytes == 70 * 2 * 4
+    # Now inside the widened window
+    cache.get_pairs(key, paths[0], 0, 70)
+    assert cache.stats()['hits'] == 1
+
+
+def test_lru_eviction_order(blocks):
+    paths, _ = blocks
+    cache = BlockCache(max_bytes=2 * ENTRY_BYTES)
+    cache.get_pairs('a', paths[0])
+    cache.get_pairs('b', paths[1])
+    cache.get_pairs('a', paths[0])         # a is now the most recently used
+    cache.get_pairs('c', paths[2])         # evicts b
+    assert list(cache._entries) == ['a', 'c']
+    assert cache.stats()['evictions'] == 1
+    assert cache.current_bytes == 2 * ENTRY_BYTES
+
+    cache.set_budget(ENTRY_BYTES)
+    assert list(cache._entries) == ['c']
+    assert cache.current_bytes == ENTRY_BYTES
+
+
+def test_oversized_windows_are_not_cached(blocks):
+    paths, data = blocks
+    cache = BlockCache(max_bytes=ENTRY_BYTES // 2)
+    np.testing.assert_array_equal(cache.get_pairs('a', paths[0]), decode_pairs(data[0]))
+    assert cache.stats()['entries'] == 0
+    assert cache.current_bytes == 0
+
+
+def test_missing_file(tmp_path):
+    cache = BlockCache()
+    assert cache.get_pairs('x', str(tmp_path / 'none.bin')) is None
+    assert cache.get_iq('x', str(tmp_path / 'none.bin')) is None
+
+
+def test_prefetch_fills_the_cache(blocks):
+    paths, data = blocks
+    cache = BlockCache(max_bytes=10 * ENTRY_BYTES)
+    requests = [(('s', b, 0), paths[b], 0, None) for b in range(3)]
+    cache.prefetch(requests + requests[:1])
+    wait_for(lambda: cache.stats()['prefetched'] == 3 and not cache._pending)
+    # Prefetching is not counted as a miss; the reads after it are hits
+    assert cache.stats()['misses'] == 0
+    for b in range(3):
+        np.testing.assert_array_equal(cache.get_pairs(('s', b, 0), paths[b]), decode_pairs(data[b]))
+    assert cache.stats()['hits'] == 3
+
+    # Already cached: nothing is submitted again
+    cache.prefetch(requests)
+    assert not cache._pending
+    assert cache.stats()['prefetched'] == 3
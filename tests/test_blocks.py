@@ -0,0 +1,61 @@
+import numpy as np
+
+from conftest import write_block
+from iq_blocks import (BYTES_PER_SAMPLE, BlockReader, as_complex, block_path, decode_iq, decode_pairs,
+                       num_samples, open_block)
+
+
+def test_open_block_maps_the_file_read_only(tmp_path):
+    path = write_block(str(tmp_path), 1, 7, np.arange(64) % 256)
+    raw = open_block(path)
+    assert isinstance(raw, np.memmap)
+    assert not raw.flags.writeable
+    assert num_samples(raw) == 32
+    np.testing.assert_array_equal(raw, np.arange(64))
+
+
+def test_open_block_missing_or_empty(tmp_path):
+    assert open_block(str(tmp_path / 'missing.bin')) is None
+    assert open_block(write_block(str(tmp_path), 0, 0, [])) is None
+    assert open_block(write_block(str(tmp_path), 0, 1, [5])) is None
+
+
+def test_block_path_layout():
+    assert block_path('/data/session', 2, 12).endswith('session/ch2/block_00012.bin')
+
+
+def test_decode_pairs_scale():
+    iq = decode_pairs(np.array([0, 255, 128, 127], dtype=np.uint8))
+    assert iq.dtype == np.float32
+    np.testing.assert_allclose(iq, [[-1.0, 1.0], [0.5 / 127.5, -0.5 / 127.5]], rtol=1e-6)
+
+
+def test_decode_window_matches_full_decode():
+    raw = np.random.default_rng(1).integers(0, 256, 2000 * BYTES_PER_SAMPLE, dtype=np.uint8)
+    full = decode_pairs(raw)
+    np.testing.assert_array_equal(decode_pairs(raw, 300, 500), full[300:800])
+    # Windows are clamped to the block
+    np.testing.assert_array_equal(decode_pairs(raw, 1900, 500), full[1900:])
+    assert len(decode_pairs(raw, 5000, 10)) == 0
+    i, q = decode_iq(raw, 10, 20)
+    np.testing.assert_array_equal(i, full[10:30, 0])
+    np.testing.assert_array_equal(q, full[10:30, 1])
+
+
+def test_as_complex_is_a_view():
+    pairs = decode_pairs(np.array([0, 255, 255, 0], dtype=np.uint8))
+    x = as_complex(pairs)
+    assert x.dtype == np.complex64
+    assert np.shares_memory(x, pairs)
+    np.testing.assert_allclose(x, [-1 + 1j, 1 - 1j])
+
+
+def test_block_reader(tmp_path):
+    data = np.random.default_rng(2).integers(0, 256, 400, dtype=np.uint8)
+    write_block(str(tmp_path), 3, 4, data)
+    reader = BlockReader(str(tmp_path))
+    i, q = reader.read_iq(4, 3, start=50, count=10)
+    expected = decode_pairs(data)[50:60]
+    np.testing.assert_array_equal(i, expected[:, 0])
+    np.testing.assert_array_equal(q, expected[:, 1])
+    assert reader.read_iq(5, 3) is None
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+import convergence
+from conftest import BLOCK_MS
+from convergence import (BASE_PPM_CORRECTION, NOMINAL_SAMPLE_RATE, ConvergenceTracker, cache_path, index_timestamps,
+                         lock_start, ppm_correction)
+from iq_index import load_index
+
+# Delays of ch1..ch3 per block: ch1 and ch2 converge, ch3 is synchronized from the start
+CONVERGING = {0: {1: 40, 2: -8, 3: 0}, 1: {1: 10, 2: -2, 3: 0}, 2: {1: 0, 2: 0, 3: 0},
+              3: {1: 0, 2: 0, 3: 0}, 4: {1: 0, 2: 0, 3: 0}}
+
+
+def test_ppm_correction():
+    # README synchronization table: delay 617 -> -0.003085
+    assert ppm_correction(617) == pytest.approx(-0.003085)
+    np.testing.assert_allclose(ppm_correction([0, -20, 10 ** 6, -10 ** 6]), [0, 1e-4, -0.01, 0.01])
+    assert ppm_correction(10, gain=1) == pytest.approx(-1e-6)
+
+
+def test_lock_start():
+    assert lock_start([5, 3, 0, 0, 0]) == 2
+    assert lock_start([0, 0, 0, 0]) == 0
+    assert lock_start([5, 0, 0]) is None
+    assert lock_start([0, 0, 0, 1]) is None
+    assert lock_start([]) is None
+    assert lock_start([3, 1, -1, 1], tolerance=1) == 1
+    assert lock_start([3, 0, 0], lock_blocks=2) == 1
+
+
+def test_update_and_replay(delayed_session):
+    path = delayed_session(CONVERGING)
+    tracker = ConvergenceTracker(path)
+    assert tracker.missing_blocks() == [0, 1, 2, 3, 4]
+    assert tracker.update() == 5
+    assert tracker.update() == 0
+    assert os.path.exists(cache_path(path))
+
+    state = tracker.replay(index_timestamps(load_index(path)))
+    ch1 = state['channels'][1]
+    assert ch1['blocks'].tolist() == [0, 1, 2, 3, 4]
+    assert ch1['delay'].tolist() == [40, 10, 0, 0, 0]
+    np.testing.assert_allclose(ch1['cumulative'], BASE_PPM_CORRECTION + np.cumsum(ppm_correction([40, 10, 0, 0, 0])))
+    np.testing.assert_allclose(ch1['frequency'], NOMINAL_SAMPLE_RATE * (1 + ch1['ppm'] * 1000 / 1e6))
+    assert [state['channels'][ch]['lock_block'] for ch in (1, 2, 3)] == [2, 2, 0]
+    assert state['channels'][3]['time_to_lock'] == 0.0
+    assert (state['first_block'], state['lock_block']) == (0, 2)
+    assert state['time_to_lock'] == pytest.approx(2 * BLOCK_MS / 1000)
+    # Without timestamps the lock block is still known
+    assert tracker.replay()['time_to_lock'] is None
+
+
+def test_cache_is_reused(delayed_session, monkeypatch):
+    path = delayed_session(CONVERGING)
+    ConvergenceTracker(path).update([0, 1, 2])
+
+    correlated = []
+    real = convergence.estimate_block_delays
+
+    def counting(base, block, *args, **kwargs):
+        correlated.append(block)
+        return real(base, block, *args, **kwargs)
+
+    monkeypatch.setattr(convergence, 'estimate_block_delays', counting)
+    tracker = ConvergenceTracker(path)
+    assert sorted(tracker.done) == [0, 1, 2]
+    assert tracker.missing_blocks() == [3, 4]
+    assert [r['delay'] for r in tracker.block_delays(1)] == [10, -2, 0]
+    assert correlated == []
+    assert [r['delay'] for r in tracker.block_delays(4)] == [0, 0, 0]
+    assert tracker.block_delays(4) == tracker.rows[4]
+    assert correlated == [4]
+    # Every block lands in the cache file once
+    assert ConvergenceTracker(path).missing_blocks() == [3]
+    with open(cache_path(path)) as f:
+        assert len(f.readlines()) == 1 + 4 * 3
+
+
+def test_cache_of_other_block_size_is_ignored(delayed_session):
+    path = delayed_session({0: CONVERGING[0]})
+    ConvergenceTracker(path).update()
+    assert ConvergenceTracker(path, n=1024).rows == {}
+    assert ConvergenceTracker(path, use_cache=False).missing_blocks() == [0]
+
+
+def test_cli_writes_every_channel(delayed_session, tmp_path, capsys):
+    pd = pytest.importorskip('pandas')
+    path = delayed_session(CONVERGING)
+    output = str(tmp_path / 'convergence.csv')
+    assert convergence.main(['--base', path, '-q', '-o', output]) == 0
+    assert "Correction is DONE at block 2" in capsys.readouterr().out
+    df = pd.read_csv(output)
+    assert len(df) == 5 * 3
+    assert df[df.channel == 2].delay.tolist() == [-8, -2, 0, 0, 0]
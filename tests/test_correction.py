@@ -0,0 +1,180 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import delayed_pairs
+from correction import (LAG_SEGMENTS, N, RESULT_COLUMNS, Throughput, correlate_lag_window, correlate_with_reference,
+                        correlation_power, estimate_block_delays, estimate_session_delays, lag_window_plan, main,
+                        peak_metrics, reference_spectrum, session_blocks)
+from iq_blocks import NUM_CHANNELS, block_path
+
+# Delays of ch1..ch3 against ch0 in the synthetic sessions (samples)
+DELAYS = {1: 5, 2: -17, 3: 300}
+
+
+def by_channel(results):
+    return {r['channel']: r for r in results}
+
+
+def test_full_search_finds_the_delays(delayed_session):
+    path = delayed_session({0: DELAYS})
+    results = estimate_block_delays(path, 0)
+    assert [r['channel'] for r in results] == [1, 2, 3]
+    for r in results:
+        assert set(RESULT_COLUMNS) <= set(r)
+        assert r['delay'] == DELAYS[r['channel']]
+        assert r['peak_index'] == N - r['delay']
+        assert r['search'] == 'full'
+
+
+def test_missing_files(delayed_session):
+    path = delayed_session({0: DELAYS})
+    os.remove(block_path(path, 2, 0))
+    assert [r['channel'] for r in estimate_block_delays(path, 0)] == [1, 3]
+    assert [r['channel'] for r in estimate_block_delays(path, 0, channels=[3, 1])] == [3, 1]
+    os.remove(block_path(path, 0, 0))
+    assert estimate_block_delays(path, 0) == []
+
+
+def test_batch_cli_writes_every_block(delayed_session, tmp_path):
+    pd = pytest.importorskip('pandas')
+    path = delayed_session({0: DELAYS, 1: {1: 1, 2: 2, 3: 3}, 2: {1: -1, 2: -2, 3: -3}})
+    assert session_blocks(path) == [0, 1, 2]
+    output = str(tmp_path / 'delays.csv')
+    assert main(['--base', path, '--range', '1', '2', '-q', '-o', output]) == 0
+    df = pd.read_csv(output)
+    assert list(df.columns) == RESULT_COLUMNS
+    assert df[['block', 'channel', 'delay']].values.tolist() == [
+        [1, 1, 1], [1, 2, 2], [1, 3, 3], [2, 1, -1], [2, 2, -2], [2, 3, -3]]
+
+
+def test_correlation_peak_of_each_channel():
+    rng = np.random.default_rng(8)
+    pairs = delayed_pairs(rng, DELAYS, n=8192)
+    x = {ch: (p.reshape(-1, 2).astype(np.float32) - 127.5).view(np.complex64)[:, 0] for ch, p in pairs.items()}
+    corr = correlate_with_reference(reference_spectrum(x[0]), np.stack([x[ch] for ch in range(1, NUM_CHANNELS)]))
+    assert corr.shape == (3, 2 * 8192) and corr.dtype == np.complex64
+    peaks = np.argmax(correlation_power(corr), axis=-1)
+    assert [8192 - int(p) for p in peaks] == [DELAYS[ch] for ch in range(1, NUM_CHANNELS)]
+
+
+def test_process_pool_matches_sequential(delayed_session):
+    path = delayed_session({b: {1: b, 2: -b, 3: 2 * b} for b in range(4)})
+    sequential = list(estimate_session_delays(path, [3, 0, 2, 1], workers=1))
+    pooled = list(estimate_session_delays(path, [3, 0, 2, 1], workers=2))
+    assert [[r['block'] for r in results] for results in pooled] == [[3] * 3, [0] * 3, [2] * 3, [1] * 3]
+    assert pooled == sequential
+    assert [r['delay'] for r in pooled[0]] == [3, -3, 6]
+
+
+def test_throughput_counts_loaded_bytes(capsys):
+    meter = Throughput(total=2, interval=3600)
+    meter.update([{}, {}, {}], n=1000)
+    meter.update([], n=1000)
+    assert (meter.blocks, meter.bytes) == (2, 4 * 1000 * 2)
+    assert "[2/2]" in capsys.readouterr().out
+
+
+def test_window_and_full_search_metrics_share_a_scale(delayed_session):
+    path = delayed_session({0: DELAYS})
+    full = by_channel(estimate_block_delays(path, 0))
+    window = by_channel(estimate_block_delays(path, 0, max_lag=64, keep_corr=True))
+    for ch in (1, 2):
+        assert window[ch]['search'] == 'window'
+        assert window[ch]['peak_value'] == pytest.approx(full[ch]['peak_value'], rel=0.05)
+        assert window[ch]['corr_power'].max() == window[ch]['peak_value']
+
+    # Bytes are the samples each search actually read: windows of every channel, then the fallback
+    n_window = lag_window_plan(64)[3]
+    meter, bounded = Throughput(total=2, interval=3600), Throughput(total=2, interval=3600)
+    meter.update(list(full.values()))
+    bounded.update(list(window.values()), max_lag=64)
+    assert meter.bytes == 4 * N * 2
+    assert bounded.bytes == 4 * n_window * 2 + 2 * N * 2
+
+
+def test_lag_window_plan():
+    segment, fft_size, n_segments, n_window = lag_window_plan(64)
+    assert segment == 1024 and fft_size == 2048 and n_segments == LAG_SEGMENTS
+    assert n_window == LAG_SEGMENTS * 1024 + 128
+    assert lag_window_plan(1000)[:2] == (4096, 8192)
+    # Short blocks use fewer segments
+    assert lag_window_plan(64, n=3000)[2:] == (2, 2176)
+    assert lag_window_plan(64, n=1000)[2] == 0
+
+
+def test_lag_window_equals_direct_sum():
+    rng = np.random.default_rng(9)
+    ref, ch = (rng.standard_normal((2, 4096)) + 1j * rng.standard_normal((2, 4096))).astype(np.complex64)
+    max_lag, segments = 16, 2
+    delays, corr = correlate_lag_window(ref, ch[None], max_lag, segments)
+    assert corr.shape == (1, 2 * max_lag + 1)
+    assert delays[0] == max_lag and delays[-1] == -max_lag
+    n_window = lag_window_plan(max_lag, 4096, segments)[3]
+    covered = slice(max_lag, n_window - max_lag)
+    n = np.arange(4096)[covered]
+    direct = [np.sum(np.conj(ref[n]) * ch[n - d]) for d in delays]
+    np.testing.assert_allclose(corr[0], direct, rtol=1e-3, atol=1e-2)
+    with pytest.raises(ValueError):
+        correlate_lag_window(ref[:100], ch[None, :100], max_lag)
+
+
+def test_lag_window_matches_full_search(delayed_session):
+    path = delayed_session({0: DELAYS})
+    full = by_channel(estimate_block_delays(path, 0))
+    window = by_channel(estimate_block_delays(path, 0, max_lag=64, keep_corr=True))
+    assert [window[ch]['search'] for ch in (1, 2, 3)] == ['window', 'window', 'full']
+    for ch in (1, 2, 3):
+        assert window[ch]['delay'] == full[ch]['delay'] == DELAYS[ch]
+        assert window[ch]['peak_index'] == full[ch]['peak_index']
+        r = window[ch]
+        assert int(np.argmax(r['corr_power'])) + r['corr_offset'] == r['peak_index']
+    # Window and full search see the same peak up to the shorter integration
+    assert window[1]['frac_delay'] == pytest.approx(full[1]['frac_delay'], abs=0.05)
+    assert window[2]['phase_deg'] == pytest.approx(full[2]['phase_deg'], abs=5)
+
+
+def test_weak_window_peak_falls_back(delayed_session):
+    path = delayed_session({0: DELAYS})
+    results = by_channel(estimate_block_delays(path, 0, max_lag=64, min_peak_ratio=1e12))
+    assert {ch: (r['search'], r['delay']) for ch, r in results.items()} == {
+        1: ('full', 5), 2: ('full', -17), 3: ('full', 300)}
+
+
+def test_peak_metrics_parabola_phase_and_psr():
+    k = np.arange(64)
+    magnitude = 10 - 0.5 * (k - 20.3) ** 2
+    corr = np.where(magnitude > 0, magnitude, 0.5).astype(np.complex64) * np.exp(1j * np.radians(40))
+    corr[50] = 1.0
+    offset, phase_deg, psr_db = peak_metrics(corr, 20)
+    assert offset == pytest.approx(0.3, abs=1e-4)
+    assert phase_deg == pytest.approx(40, abs=1e-3)
+    # Strongest value more than 2 samples from the peak is at 23 (20.3 + 2.7 -> 10 - 0.5 * 2.7^2)
+    assert psr_db == pytest.approx(10 * np.log10(abs(corr[20]) ** 2 / abs(corr[23]) ** 2), abs=1e-4)
+
+
+def test_peak_metrics_edges():
+    corr = np.array([5, 1, 0, 0, 0], dtype=np.complex64)
+    assert peak_metrics(corr, 0)[0] == 0.0
+    assert peak_metrics(corr, 0, exclude=4)[2] == float('inf')
+    assert peak_metrics(corr, 0, exclude=0)[2] == pytest.approx(10 * np.log10(25))
+
+
+def test_fractional_delay_and_phase_of_a_channel():
+    rng = np.random.default_rng(10)
+    n, delay, phase = 8192, 10.25, 55.0
+    spectrum = np.zeros(n, dtype=np.complex128)
+    band = np.r_[1:n // 8, n - n // 8:n]
+    spectrum[band] = rng.standard_normal(len(band)) + 1j * rng.standard_normal(len(band))
+    freq = np.fft.fftfreq(n)
+    ref = np.fft.ifft(spectrum).astype(np.complex64)
+    # ch[m] = ref(m + delay), rotated by the phase
+    ch = np.fft.ifft(spectrum * np.exp(2j * np.pi * freq * delay) * np.exp(1j * np.radians(phase)))
+    corr = correlate_with_reference(reference_spectrum(ref), ch[None].astype(np.complex64))[0]
+    peak = int(np.argmax(correlation_power(corr)))
+    assert n - peak == 10
+    offset, phase_deg, psr_db = peak_metrics(corr, peak)
+    assert (n - peak) - offset == pytest.approx(delay, abs=0.1)
+    assert phase_deg == pytest.approx(phase, abs=2)
+    assert psr_db > 0
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from iq_dsp import fft_frequencies, minmax_decimate, minmax_indices, pool_bins, stride_decimate, welch_psd
+from iq_index import load_index
+
+
+def test_short_traces_are_kept_whole():
+    np.testing.assert_array_equal(minmax_indices(50, np.zeros(50), n_out=100), np.arange(50))
+
+
+def test_minmax_decimation_keeps_the_envelope():
+    rng = np.random.default_rng(5)
+    y = rng.normal(size=100_003).astype(np.float32)
+    # Isolated spikes must survive decimation
+    y[12_345], y[77_777] = 50.0, -50.0
+    x = np.arange(len(y))
+    xd, yd = minmax_decimate(x, y, n_out=1000)
+    assert len(xd) <= 1000
+    assert np.all(np.diff(xd) > 0)
+    np.testing.assert_array_equal(yd, y[xd])
+    assert 12_345 in xd and 77_777 in xd
+    # Every bucket keeps its own extremes
+    size = -(-len(y) // 500)
+    for b in (0, 123, 400):
+        lo, hi = b * size, min((b + 1) * size, len(y))
+        kept = yd[(xd >= lo) & (xd < hi)]
+        assert kept.max() == y[lo:hi].max() and kept.min() == y[lo:hi].min()
+
+
+def test_stride_decimate():
+    assert stride_decimate(1000, 2000) == 1
+    assert stride_decimate(2001, 2000) == 2
+    assert -(-262144 // stride_decimate(262144, 2000)) <= 2000
+
+
+def test_zoom_window_maps_ms_to_samples(web):
+    iq_web = web[0]
+    assert iq_web.zoom_window({'xaxis.autorange': True}, 2.4e6) is None
+    start, count = iq_web.zoom_window({'xaxis.range[0]': 1.0, 'xaxis.range[1]': 2.0}, 2.4e6)
+    assert (start, count) == (2400, 2401)
+    # Clamped to the block, and never fewer than two samples
+    start, count = iq_web.zoom_window({'xaxis2.range': [-5.0, 1e6]}, 2.4e6)
+    assert (start, count) == (0, iq_web.SAMPLES_PER_BLOCK)
+    assert iq_web.zoom_window({'xaxis.range': [3.0, 3.0]}, 2.4e6)[1] == 2
+
+
+def test_zoomed_plot_requeries_the_window(web):
+    iq_web, dash_client, _ = web
+    frames_data = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                                   changed=['session-selector.value'])['frames-data-store']['data']
+    values = {'block-slider.value': 1, 'mode-selector.value': 'IQ', 'samples-input.value': 1000,
+              'psd-window.value': 'hann', 'psd-fft-size.value': 1024, 'psd-overlap.value': 0.5,
+              'frames-data-store.data': frames_data}
+    dash_client.call('update_plot', values, changed=['block-slider.value'])
+    # Zooming to 10..20 ms decodes that window, far beyond the first 1000 samples
+    zoomed = dash_client.call('update_plot', dict(values, **{'iq-plot.relayoutData': {
+        'xaxis.range[0]': 10.0, 'xaxis.range[1]': 20.0}}), changed=['iq-plot.relayoutData'])
+    info = str(zoomed['info-div']['children'])
+    assert 'Samples: 24000..48001' in info
+
+
+def test_zoom_is_kept_when_the_block_changes(web):
+    iq_web, dash_client, _ = web
+    frames_data = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                                   changed=['session-selector.value'])['frames-data-store']['data']
+    values = {'block-slider.value': 1, 'mode-selector.value': 'IQ', 'samples-input.value': 1000,
+              'psd-window.value': 'hann', 'psd-fft-size.value': 1024, 'psd-overlap.value': 0.5,
+              'frames-data-store.data': frames_data, 'plot-skeleton.data': {'mode': 'IQ'},
+              'iq-plot.relayoutData': {'xaxis.range[0]': 10.0, 'xaxis.range[1]': 20.0}}
+    zoomed = dash_client.call('update_plot', values, changed=['iq-plot.relayoutData'])
+    skeleton = zoomed['plot-skeleton']['data']
+    assert skeleton == {'mode': 'IQ', 'zoom': [24000, 24001]}
+
+    # The patched figure keeps its axis range: the next block is re-queried over the same window
+    moved = dash_client.call('update_plot', dict(values, **{'block-slider.value': 2, 'plot-skeleton.data': skeleton}),
+                             changed=['block-slider.value'])
+    assert 'Samples: 24000..48001' in str(moved['info-div']['children'])
+    assert moved['plot-skeleton']['data'] == skeleton
+    frame, info = iq_web.render_play_frame(iq_web.session_index(frames_data), 3, 'IQ', 24001, 2.4e6,
+                                           iq_web.psd_settings(None, None, None), start=24000)
+    assert 'Samples: 24000..48001' in info
+
+    # Autorange goes back to the first samples; a whole figure resets its axes and the zoom
+    reset = dash_client.call('update_plot', dict(values, **{'plot-skeleton.data': skeleton,
+                                                            'iq-plot.relayoutData': {'xaxis.autorange': True}}),
+                             changed=['iq-plot.relayoutData'])
+    assert 'Samples: 0..1000' in str(reset['info-div']['children'])
+    assert reset['plot-skeleton']['data'] == {'mode': 'IQ'}
+    other = dash_client.call('update_plot', dict(values, **{'mode-selector.value': 'AMP',
+                                                            'plot-skeleton.data': skeleton}),
+                             changed=['mode-selector.value'])
+    assert 'Samples: 0..1000' in str(other['info-div']['children'])
+
+
+def test_welch_psd_matches_scipy():
+    signal = pytest.importorskip('scipy.signal')
+    rng = np.random.default_rng(6)
+    x = (rng.normal(size=(2, 50_000)) + 1j * rng.normal(size=(2, 50_000))).astype(np.complex64)
+    for window, overlap in (('hann', 0.5), ('blackman', 0.75), ('rect', 0.0)):
+        psd = welch_psd(x, 2.4e6, fft_size=512, overlap=overlap, window=window)
+        w = {'hann': np.hanning, 'blackman': np.blackman, 'rect': np.ones}[window](512)
+        _, expected = signal.welch(x, fs=2.4e6, window=w, nperseg=512, noverlap=int(512 * overlap),
+                                   detrend=False, return_onesided=False, scaling='density', axis=-1)
+        assert psd.shape == (2, 512) and psd.dtype == np.float32
+        np.testing.assert_allclose(psd, 10 * np.log10(np.fft.fftshift(expected, axes=-1)), atol=1e-3)
+
+
+def test_welch_psd_finds_a_tone():
+    fs, f0 = 2.4e6, 300e3
+    t = np.arange(262144) / fs
+    x = np.exp(2j * np.pi * f0 * t).astype(np.complex64)
+    psd = welch_psd(x, fs, fft_size=1024)
+    freqs = fft_frequencies(1024, fs)
+    assert abs(freqs[np.argmax(psd[0])] - f0) <= fs / 1024
+    # Windows shorter than the FFT are zero-padded into one segment
+    assert welch_psd(x[:100], fs, fft_size=1024).shape == (1, 1024)
+
+
+def test_pool_bins_keeps_peaks():
+    values = np.zeros((2, 10_000))
+    values[1, 4321] = 9.0
+    pooled = pool_bins(values, n_out=100)
+    assert pooled.shape == (2, 100)
+    assert pooled[1].max() == 9.0
+    assert pool_bins(values[:, :50], n_out=100).shape == (2, 50)
+
+
+def test_waterfall_has_a_row_per_block(web):
+    iq_web, _, path = web
+    index = load_index(path)
+    fig = iq_web.create_waterfall(index, 6, psd_params={'fft_size': 4096, 'overlap': 0.5, 'window': 'hann'},
+                                  n_blocks=4, max_points=1000)
+    assert len(fig.data) == 4
+    for heatmap in fig.data:
+        assert list(heatmap.y) == [3, 4, 5, 6]
+        z = np.asarray(heatmap.z)
+        assert z.shape == (4, len(heatmap.x)) and z.shape[1] <= 1000
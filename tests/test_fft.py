@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import iq_fft
+from iq_fft import BACKENDS, FFTBackend, available_backends
+
+BACKEND_PARAMS = [pytest.param(name, marks=pytest.mark.skipif(name not in available_backends(),
+                                                              reason=f"{name} not installed"))
+                  for name in BACKENDS]
+
+
+@pytest.fixture
+def signal():
+    rng = np.random.default_rng(11)
+    return (rng.standard_normal((3, 4096)) + 1j * rng.standard_normal((3, 4096))).astype(np.complex64)
+
+
+@pytest.fixture
+def restore_backend():
+    saved = iq_fft._BACKEND
+    yield
+    iq_fft._BACKEND = saved
+
+
+@pytest.mark.parametrize('name', BACKEND_PARAMS)
+def test_backend_matches_double_precision(name, signal):
+    backend = FFTBackend(name, workers=2)
+    expected = np.fft.fft(signal.astype(np.complex128), axis=-1)
+    result = backend.fft(signal)
+    assert result.dtype == np.complex64 and result.shape == signal.shape
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-3 * np.abs(expected).max())
+    # Other axis, float input, inverse round trip
+    np.testing.assert_allclose(backend.fft(signal.real, axis=0), np.fft.fft(signal.real, axis=0), atol=1e-3)
+    np.testing.assert_allclose(backend.ifft(result), signal, atol=1e-4)
+
+
+@pytest.mark.parametrize('name', BACKEND_PARAMS)
+def test_backend_is_thread_safe(name):
+    backend = FFTBackend(name, workers=1)
+    rng = np.random.default_rng(12)
+    inputs = [(rng.standard_normal(2048) + 1j * rng.standard_normal(2048)).astype(np.complex64) for _ in range(64)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(backend.fft, inputs))
+    for x, result in zip(inputs, results):
+        np.testing.assert_allclose(result, np.fft.fft(x), atol=1e-2)
+
+
+def test_plans_are_cached_per_shape():
+    pytest.importorskip('pyfftw')
+    backend = FFTBackend('pyfftw', workers=1)
+    x = np.ones(256, dtype=np.complex64)
+    plan, lock = backend._plan(x, -1, False)
+    assert backend._plan(x, -1, False) == (plan, lock)
+    assert backend._plan(x, -1, True)[0] is not plan
+    for size in range(iq_fft.PLAN_CACHE_SIZE + 1):
+        backend._plan(np.ones(8 + size, dtype=np.complex64), -1, False)
+    assert len(backend._plans) == iq_fft.PLAN_CACHE_SIZE
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        FFTBackend('fftpack')
+
+
+def test_module_backend_selection(restore_backend, monkeypatch):
+    monkeypatch.setenv('IQ_FFT_BACKEND', 'numpy')
+    iq_fft._BACKEND = None
+    assert iq_fft.get_backend().name == 'numpy'
+    assert iq_fft.get_backend() is iq_fft.get_backend()
+    backend = iq_fft.set_workers(1)
+    assert (backend.name, backend.workers) == ('numpy', 1)
+    assert iq_fft.set_backend(available_backends()[0]).workers == 1
+    assert iq_fft.fft(np.ones(4)).tolist() == [4, 0, 0, 0]
+    assert iq_fft.ifft(np.ones(4)).dtype == np.complex64
@@ -0,0 +1,287 @@
+import io
+import os
+import threading
+
+import numpy as np
+
+from conftest import BLOCK_MS, T0_MS, index_rows, write_block
+from iq_index import (SIDECAR_NAME, SOURCE_CSV, SOURCE_SCAN, IndexRegistry, SessionIndex, aggregate_blocks,
+                      channels_to_mask, count_channels, load_index, mask_to_channels, merge_blocks, parse_channel_list,
+                      read_index_csv, read_sidecar, sidecar_path, write_sidecar)
+
+
+def test_session_index_maps_positions_to_blocks():
+    index = SessionIndex('s', '/data/s', [12, 10, 11], [0b1111, 0b0001, 0b0101])
+    assert len(index) == 3
+    # Positions follow block order whatever order the rows came in
+    assert [index.block_at(p) for p in range(3)] == [10, 11, 12]
+    assert index.channels_at(0) == [0]
+    assert index.channels_at(1) == [0, 2]
+    assert index.channels_at(2) == [0, 1, 2, 3]
+    assert index.position_of(11) == 1
+    assert index.position_of(13) is None
+    assert index.position_of(9) is None
+
+
+def test_registry_versions():
+    registry = IndexRegistry()
+    first = SessionIndex('s', '/data/s', [0], [1])
+    assert registry.get('s') is None and registry.version('s') == 0
+    assert registry.publish('s', first) == 1
+    second = SessionIndex('s', '/data/s', [0, 1], [1, 1])
+    assert registry.publish('s', second) == 2
+    assert registry.get('s') is second
+    assert registry.version('s') == 2
+    assert registry.handles() == ['s']
+
+
+def test_frames_data_store_holds_only_a_handle(web):
+    iq_web, dash_client, path = web
+    response = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                                changed=['session-selector.value'])
+    frames_data = response['frames-data-store']['data']
+    assert frames_data == {'session': 'session', 'version': 1, 'frame_type': 'all', 'count': 8}
+    assert response['block-slider']['max'] == 7
+    index = iq_web.INDEX_REGISTRY.get('session')
+    np.testing.assert_array_equal(index.blocks, np.arange(8))
+    assert index.path.rstrip('/') == path
+
+    # Refresh reloads and publishes a new version of the same handle
+    response = dash_client.call('load_data', {'refresh-button.n_clicks': 1, 'session-selector.value': 'session',
+                                              'frame-type-filter.value': 'all'}, changed=['refresh-button.n_clicks'])
+    assert response['frames-data-store']['data']['version'] == 2
+
+
+def write_index(path, text):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, 'index.csv'), 'w') as f:
+        f.write(text)
+
+
+def test_channel_masks():
+    assert channels_to_mask([0, 2, 3]) == 0b1101
+    assert mask_to_channels(0b1101) == [0, 2, 3]
+    np.testing.assert_array_equal(count_channels([0, 1, 0b1111, 0b1010]), [0, 1, 4, 2])
+    assert parse_channel_list("[0, 1, 3]") == [0, 1, 3]
+    assert parse_channel_list("0,2") == [0, 2]
+    assert parse_channel_list(None) == [0, 1, 2, 3]
+
+
+def test_aggregate_blocks():
+    rows = ("1005,1,1,700000000,0,3,ch1/block_00001.bin\n"
+            "1000,1,0,700000000,0,3,ch0/block_00001.bin\n"
+            "900,0,0,600000000,0,0,ch0/block_00000.bin\n"
+            "901,0,0,600000000,0,0,ch0/block_00000.bin\n"      # duplicate channel row
+            "902,0,3,600000000,0,0,ch3/block_00000.bin\n")
+    blocks, masks, timestamps, frequencies, frame_types = aggregate_blocks(read_index_csv(io.StringIO(rows)))
+    np.testing.assert_array_equal(blocks, [0, 1])
+    np.testing.assert_array_equal(masks, [0b1001, 0b0011])
+    np.testing.assert_array_equal(timestamps, [900, 1000])
+    np.testing.assert_array_equal(frequencies, [600000000, 700000000])
+    np.testing.assert_array_equal(frame_types, [0, 3])
+    assert blocks.dtype == np.int32 and masks.dtype == np.uint8
+
+
+def test_load_index_from_csv(make_session):
+    path = make_session(range(3))
+    # ch2 of block 3 never written
+    with open(f'{path}/index.csv', 'a') as f:
+        f.write(f"{T0_MS + 3 * BLOCK_MS},3,0,700000000,0,0,ch0/block_00003.bin\n")
+    index = load_index(path)
+    np.testing.assert_array_equal(index.blocks, [0, 1, 2, 3])
+    np.testing.assert_array_equal(index.channel_counts(), [4, 4, 4, 1])
+    np.testing.assert_array_equal(index.timestamps, T0_MS + BLOCK_MS * np.arange(4))
+
+
+def test_load_index_with_header(make_session):
+    index = load_index(make_session(range(3), header=True))
+    np.testing.assert_array_equal(index.blocks, [0, 1, 2])
+
+
+def test_load_block_table(tmp_path):
+    path = str(tmp_path / 'session')
+    write_index(path, 'BlockIndex,ChannelList,Channels\n0,"[0, 1, 2, 3]",4\n1,"[0, 2]",2\n')
+    index = load_index(path)
+    np.testing.assert_array_equal(index.blocks, [0, 1])
+    assert index.channels_at(1) == [0, 2]
+    assert not index.timed()
+
+
+def test_load_index_from_directory_scan(make_session):
+    path = make_session(range(3), index=False)
+    os.remove(f'{path}/ch1/block_00002.bin')
+    index = load_index(path)
+    np.testing.assert_array_equal(index.blocks, [0, 1, 2])
+    assert index.channels_at(2) == [0, 2, 3]
+
+
+def test_merge_blocks_ors_masks():
+    old = (np.array([0, 1], np.int32), np.array([0b0001, 0b0011], np.uint8), np.array([100, 200]),
+           np.array([7, 8]), np.array([0, 0], np.uint8))
+    new = (np.array([1, 2], np.int32), np.array([0b0100, 0b1111], np.uint8), np.array([150, 300]),
+           np.array([9, 9]), np.array([1, 2], np.uint8))
+    blocks, masks, timestamps, frequencies, frame_types = merge_blocks(old, new)
+    np.testing.assert_array_equal(blocks, [0, 1, 2])
+    np.testing.assert_array_equal(masks, [0b0001, 0b0111, 0b1111])
+    np.testing.assert_array_equal(timestamps, [100, 150, 300])
+    # Frequency and frame type of a shared block stay the first ones seen
+    np.testing.assert_array_equal(frequencies, [7, 8, 9])
+    np.testing.assert_array_equal(frame_types, [0, 0, 2])
+
+
+def parsed_offsets(monkeypatch):
+    """Byte offsets from which load_index parses index.csv"""
+    import iq_index
+    offsets = []
+    read_rows = iq_index.read_index_rows
+
+    def recording(index_path, offset=0, has_header=False):
+        offsets.append(offset)
+        return read_rows(index_path, offset, has_header)
+
+    monkeypatch.setattr(iq_index, 'read_index_rows', recording)
+    return offsets
+
+
+def test_sidecar_ingests_only_appended_rows(make_session, monkeypatch):
+    path = make_session(range(3), channels=[0, 1])
+    csv_path = os.path.join(path, 'index.csv')
+    first = load_index(path)
+    header, columns = read_sidecar(sidecar_path(path))
+    assert header['source'] == SOURCE_CSV
+    assert header['csv_offset'] == os.path.getsize(csv_path)
+    np.testing.assert_array_equal(columns[0], first.blocks)
+
+    offsets = parsed_offsets(monkeypatch)
+    # Unchanged index.csv: served from the sidecar without parsing
+    np.testing.assert_array_equal(load_index(path).blocks, [0, 1, 2])
+    assert offsets == []
+
+    # Appended rows: a late channel of block 2, a new block and a line still being written
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'a') as f:
+        f.write(index_rows([2], channels=[3]) + index_rows([3], channels=[0]) + "1770822898999,4,0,7000")
+    index = load_index(path)
+    assert offsets == [size]
+    np.testing.assert_array_equal(index.blocks, [0, 1, 2, 3])
+    np.testing.assert_array_equal(index.channel_masks, [0b0011, 0b0011, 0b1011, 0b0001])
+    # The partial line is parsed on the next load, once it is complete
+    assert read_sidecar(sidecar_path(path))[0]['csv_offset'] < os.path.getsize(csv_path)
+    with open(csv_path, 'a') as f:
+        f.write("00000,0,0,ch0/block_00004.bin\n")
+    np.testing.assert_array_equal(load_index(path).blocks, [0, 1, 2, 3, 4])
+
+
+def test_rewritten_index_csv_rebuilds_the_sidecar(make_session, monkeypatch):
+    path = make_session(range(3))
+    csv_path = os.path.join(path, 'index.csv')
+    load_index(path)
+    offsets = parsed_offsets(monkeypatch)
+
+    # Same size, different beginning: the head CRC no longer matches
+    with open(csv_path) as f:
+        text = f.read()
+    with open(csv_path, 'w') as f:
+        f.write(text.replace(',0,0,700000000,', ',5,0,700000000,', 1))
+    np.testing.assert_array_equal(load_index(path).blocks, [0, 1, 2, 5])
+    assert offsets == [0]
+
+    # Shorter file (a new recording): parsed from the start again
+    with open(csv_path, 'w') as f:
+        f.write(index_rows([7]))
+    np.testing.assert_array_equal(load_index(path).blocks, [7])
+    assert offsets == [0, 0]
+
+
+def test_scan_sidecar_follows_directory_changes(make_session):
+    path = make_session(range(2), index=False)
+    np.testing.assert_array_equal(load_index(path).blocks, [0, 1])
+    assert read_sidecar(sidecar_path(path))[0]['source'] == SOURCE_SCAN
+    write_block(path, 0, 2, np.zeros(8, np.uint8))
+    os.utime(os.path.join(path, 'ch0'), ns=(1, os.stat(os.path.join(path, 'ch0')).st_mtime_ns + 10 ** 9))
+    np.testing.assert_array_equal(load_index(path).blocks, [0, 1, 2])
+
+
+def test_frame_type_positions_and_views():
+    index = SessionIndex('s', '/data/s', [4, 1, 3, 2, 0], [1] * 5, timestamps=[40, 10, 30, 20, 0],
+                         frame_types=[3, 0, 0, 3, 1])
+    assert {t: p.tolist() for t, p in index.type_positions.items()} == {0: [1, 3], 1: [0], 3: [2, 4]}
+    assert index.type_counts() == {0: 2, 1: 1, 3: 2}
+    assert [index.frame_type_at(p) for p in range(5)] == ['DUMMY', 'DATA', 'CAL', 'DATA', 'CAL']
+
+    cal = index.view('3')
+    assert index.view(3) is cal
+    assert index.view('all') is index and index.view(None) is index
+    assert [cal.block_at(p) for p in range(len(cal))] == [2, 4]
+    assert cal.timestamps.tolist() == [20, 40]
+    assert cal.position_of(4) == 1 and cal.position_of(3) is None
+    assert len(index.view(2)) == 0
+    # Without frame types every block is DATA
+    assert SessionIndex('s', '/data/s', [0, 1], [1, 1]).type_counts() == {0: 2}
+
+
+def test_frame_types_survive_csv_and_sidecar(make_session):
+    path = make_session(range(4), frame_types=[0, 4, 4, 2])
+    for _ in range(2):
+        # First from index.csv, then from the binary sidecar
+        index = load_index(path)
+        assert index.frame_types.tolist() == [0, 4, 4, 2]
+        assert index.view(4).blocks.tolist() == [1, 2]
+
+
+def test_frame_type_filter_drives_the_slider(web):
+    iq_web, dash_client, path = web
+    with open(os.path.join(path, 'index.csv'), 'w') as f:
+        f.write(index_rows(range(8), frame_types=[0, 3, 0, 3, 3, 0, 0, 4]))
+    response = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': '3'},
+                                changed=['frame-type-filter.value'])
+    frames_data = response['frames-data-store']['data']
+    assert frames_data['frame_type'] == '3' and frames_data['count'] == 3
+    assert response['block-slider']['max'] == 2
+    assert iq_web.slider_block(iq_web.session_index(frames_data), 2) == 4
+
+    values = {'block-slider.value': 1, 'mode-selector.value': 'IQ', 'samples-input.value': 1000,
+              'psd-window.value': 'hann', 'psd-fft-size.value': 1024, 'psd-overlap.value': 0.5,
+              'frames-data-store.data': frames_data}
+    info = str(dash_client.call('update_plot', values, changed=['block-slider.value'])['info-div']['children'])
+    assert 'Position: 2/3' in info and 'Block: #3' in info
+    # Overview clicks on blocks of another type do not move the slider
+    jump = {'frames-data-store.data': frames_data}
+    assert dash_client.call('jump_to_overview_block', dict(jump, **{'overview-plot.clickData': {
+        'points': [{'x': 4}]}}))['block-slider']['value'] == 2
+    assert dash_client.call('jump_to_overview_block', dict(jump, **{'overview-plot.clickData': {
+        'points': [{'x': 5}]}})) == {}
+    empty = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': '2'},
+                             changed=['frame-type-filter.value'])
+    assert empty['frames-data-store']['data']['count'] == 0 and empty['block-slider']['max'] == 0
+
+
+def test_concurrent_sidecar_writers_never_tear_the_file(tmp_path):
+    path = str(tmp_path / SIDECAR_NAME)
+    columns = [(np.arange(n, dtype=np.int32), np.full(n, 0b1111, np.uint8), np.arange(n, dtype=np.int64),
+                np.zeros(n, np.int64), np.zeros(n, np.uint8)) for n in (1000, 50000)]
+
+    def write(i):
+        for _ in range(20):
+            write_sidecar(path, columns[i % 2], SOURCE_CSV)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    header, result = read_sidecar(path)
+    assert len(result[0]) in (1000, 50000)
+    np.testing.assert_array_equal(result[0], np.arange(len(result[0])))
+    assert os.listdir(tmp_path) == [SIDECAR_NAME]
+
+
+def test_failed_sidecar_write_leaves_no_temporary_file(tmp_path, monkeypatch):
+    def fail(src, dst):
+        raise OSError("read-only")
+
+    monkeypatch.setattr(os, 'replace', fail)
+    write_sidecar(str(tmp_path / SIDECAR_NAME), (np.arange(3, dtype=np.int32), np.ones(3, np.uint8),
+                                                 np.zeros(3, np.int64), np.zeros(3, np.int64), np.zeros(3, np.uint8)),
+                  SOURCE_CSV)
+    assert os.listdir(tmp_path) == []
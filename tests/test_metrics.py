@@ -0,0 +1,80 @@
+import logging
+
+import pytest
+
+import iq_metrics
+from iq_metrics import STAGES, Histogram, observe, register_source, render_metrics, set_log_level, timed
+
+
+@pytest.fixture
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(iq_metrics, 'HISTOGRAMS', {stage: Histogram() for stage in STAGES})
+    monkeypatch.setattr(iq_metrics, '_SOURCES', {})
+    level = iq_metrics.log.level
+    yield
+    iq_metrics.log.setLevel(level)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for seconds in (0.005, 0.01, 0.05, 0.5, 3.0):
+        histogram.observe(seconds)
+    cumulative, total, count = histogram.snapshot()
+    # A value on a bound belongs to that bucket (le = less or equal)
+    assert cumulative == [2, 3, 4, 5]
+    assert total == pytest.approx(3.565) and count == 5
+
+
+def test_timed_and_observe(fresh_metrics):
+    with timed('dsp'):
+        pass
+    with pytest.raises(RuntimeError):
+        with timed('dsp'):
+            raise RuntimeError
+    observe('file_read', 0.2)
+    assert iq_metrics.HISTOGRAMS['dsp'].count == 2
+    assert iq_metrics.HISTOGRAMS['file_read'].snapshot()[0][-1] == 1
+
+
+def test_render_metrics(fresh_metrics):
+    observe('decode', 0.003)
+
+    def broken():
+        raise OSError("gone")
+
+    register_source('cache', lambda: {'hits': 3, 'size': 1.5, 'enabled': True, 'name': 'x'}, counters=('hits',))
+    register_source('broken', broken)
+    text = render_metrics()
+    lines = text.splitlines()
+    assert '# TYPE iq_stage_seconds histogram' in lines
+    assert 'iq_stage_seconds_bucket{stage="decode",le="0.0025"} 0' in lines
+    assert 'iq_stage_seconds_bucket{stage="decode",le="0.005"} 1' in lines
+    assert 'iq_stage_seconds_bucket{stage="decode",le="+Inf"} 1' in lines
+    assert 'iq_stage_seconds_count{stage="decode"} 1' in lines
+    assert 'iq_stage_seconds_sum{stage="decode"} 0.003000' in lines
+    assert lines[lines.index('iq_cache_hits_total 3') - 1] == '# TYPE iq_cache_hits_total counter'
+    assert lines[lines.index('iq_cache_size 1.5') - 1] == '# TYPE iq_cache_size gauge'
+    # Flags, text and failing sources are left out
+    assert 'enabled' not in text and 'iq_cache_name' not in text and 'broken' not in text
+    assert text.endswith('\n')
+
+
+def test_set_log_level(fresh_metrics):
+    set_log_level('warning')
+    assert iq_metrics.log.level == logging.WARNING
+    set_log_level(logging.DEBUG)
+    assert iq_metrics.log.isEnabledFor(logging.DEBUG)
+    with pytest.raises(ValueError):
+        set_log_level('chatty')
+
+
+def test_metrics_route_counts_callbacks(web):
+    _, dash_client, _ = web
+    before = iq_metrics.HISTOGRAMS['callback'].count
+    dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                     changed=['session-selector.value'])
+    response = dash_client.http.get('/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'iq_block_cache_hits_total' in text and 'iq_player_dropped_total' in text
+    assert iq_metrics.HISTOGRAMS['callback'].count > before
@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pytest
+
+from convergence import ConvergenceTracker, cache_path
+from iq_blocks import NUM_CHANNELS, block_path
+from iq_overview import (OVERVIEW_HEADER, RECORD_DTYPE, STATS, OverviewBuilder, channel_stats, overview_path,
+                         read_overview)
+
+
+class NoDelays:
+    """Stands in for the ConvergenceTracker where delays do not matter"""
+
+    def block_delays(self, block):
+        return []
+
+
+def direct_stats(raw):
+    i = (raw[0::2].astype(np.float64) - 127.5) / 127.5
+    q = (raw[1::2].astype(np.float64) - 127.5) / 127.5
+    rms_db = 10 * np.log10(np.mean(i ** 2 + q ** 2))
+    dc = abs(np.mean(i) + 1j * np.mean(q))
+    clip = (np.mean((raw[0::2] == 0) | (raw[0::2] == 255)) + np.mean((raw[1::2] == 0) | (raw[1::2] == 255))) / 2
+    gain_db = 10 * np.log10(np.var(i) / np.var(q))
+    phase_deg = np.degrees(np.arcsin(np.cov(i, q, bias=True)[0, 1] / np.sqrt(np.var(i) * np.var(q))))
+    return rms_db, dc, clip, gain_db, phase_deg
+
+
+def test_channel_stats_match_a_float_decode():
+    rng = np.random.default_rng(13)
+    n = 100_000
+    i = rng.normal(10, 50, n)
+    q = 0.5 * rng.normal(0, 50, n) + 0.3 * i
+    raw = np.empty(2 * n, dtype=np.uint8)
+    raw[0::2] = np.clip(np.round(127.5 + i), 0, 255)
+    raw[1::2] = np.clip(np.round(127.5 + q), 0, 255)
+    np.testing.assert_allclose(channel_stats(raw), direct_stats(raw), rtol=1e-9, atol=1e-12)
+    rms_db, dc, clip, gain_db, phase_deg = channel_stats(raw)
+    assert gain_db > 3 and phase_deg > 10 and dc > 0.05
+
+
+def test_channel_stats_of_a_clipped_block():
+    raw = np.tile(np.array([0, 255, 255, 0], dtype=np.uint8), 1000)
+    rms_db, dc, clip, gain_db, phase_deg = channel_stats(raw)
+    assert clip == 1.0
+    assert dc == pytest.approx(0)
+    assert rms_db == pytest.approx(10 * np.log10(2))
+    assert phase_deg == pytest.approx(-90)
+
+
+def test_builder_records_statistics_and_cached_delays(delayed_session):
+    path = delayed_session({0: {1: 5, 2: -17, 3: 300}, 1: {1: 6, 2: 0, 3: -1}})
+    os.remove(block_path(path, 2, 1))
+    tracker = ConvergenceTracker(path)
+    builder = OverviewBuilder(path, tracker)
+    assert builder.update([1, 0]) == 2
+    assert len(builder) == 2
+    blocks, stats = builder.snapshot()
+    assert blocks.tolist() == [0, 1]
+    delay = STATS.index('delay')
+    assert stats[0, :, delay].tolist() == [0, 5, -17, 300]
+    assert stats[1, [0, 1, 3], delay].tolist() == [0, 6, -1]
+    # A missing channel file leaves NaN
+    assert np.isnan(stats[1, 2]).all()
+    raw = np.fromfile(block_path(path, 3, 0), dtype=np.uint8)
+    np.testing.assert_allclose(stats[0, 3, :5], channel_stats(raw), rtol=1e-5)
+    # The delays went through the shared cache
+    assert sorted(tracker.done) == [0, 1] and os.path.exists(cache_path(path))
+
+
+def test_builder_appends_to_the_file(make_session):
+    path = make_session(range(5))
+    builder = OverviewBuilder(path, NoDelays())
+    builder.update([0, 1, 2])
+    assert builder.update([0, 1, 2]) == 0
+    blocks, stats = read_overview(overview_path(path))
+    assert blocks.tolist() == [0, 1, 2] and stats.shape == (3, NUM_CHANNELS, len(STATS))
+
+    reloaded = OverviewBuilder(path, NoDelays())
+    assert len(reloaded) == 3
+    assert reloaded.missing_blocks(range(5)) == [3, 4]
+    assert reloaded.update(range(5)) == 2
+    np.testing.assert_array_equal(reloaded.snapshot()[1][:3], stats)
+    assert os.path.getsize(overview_path(path)) == OVERVIEW_HEADER.size + 5 * RECORD_DTYPE.itemsize
+
+
+def test_partial_record_is_trimmed_and_bad_header_reset(make_session):
+    path = make_session(range(3))
+    OverviewBuilder(path, NoDelays()).update([0, 1])
+    with open(overview_path(path), 'ab') as f:
+        f.write(b'\x01' * 10)
+    builder = OverviewBuilder(path, NoDelays())
+    assert len(builder) == 2
+    builder.update([2])
+    assert read_overview(overview_path(path))[0].tolist() == [0, 1, 2]
+
+    with open(overview_path(path), 'r+b') as f:
+        f.write(b'NOTSTATS')
+    assert read_overview(overview_path(path)) is None
+    assert len(OverviewBuilder(path, NoDelays())) == 0
+    assert os.path.getsize(overview_path(path)) == OVERVIEW_HEADER.size
+
+
+def test_pool_blocks_keeps_extremes(web):
+    iq_web = web[0]
+    blocks = np.arange(10)
+    values = np.array([[1, -3], [2, 5], [0, -7], [4, 1], [3, 2], [1, 0], [9, 6], [8, -8], [0, 0], [1, 1]], float)
+    x, pooled = iq_web.pool_blocks(blocks, values, 'rms_db', n_out=5)
+    assert x.tolist() == [0, 2, 4, 6, 8]
+    assert pooled[:, 0].tolist() == [2, 4, 3, 9, 1]
+    # Delays keep the largest magnitude with its sign
+    assert iq_web.pool_blocks(blocks, values, 'delay', n_out=5)[1][:, 1].tolist() == [5, -7, 2, -8, 1]
+
+
+def test_overview_figure_and_slider_marker(web, monkeypatch):
+    iq_web, dash_client, path = web
+    builder = OverviewBuilder(path, NoDelays())
+    builder.update(range(8))
+    monkeypatch.setitem(iq_web._OVERVIEWS, path, builder)
+    frames_data = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                                   changed=['session-selector.value'])['frames-data-store']['data']
+    values = {'overview-toggle.value': ['show'], 'frames-data-store.data': frames_data, 'block-slider.value': 3}
+    full = dash_client.call('update_overview', values, changed=['frames-data-store.data'])
+    figure = full['overview-plot']['figure']
+    assert [trace['type'] for trace in figure['data']] == ['heatmap'] * len(STATS)
+    assert figure['layout']['shapes'][0]['x0'] == 3
+    assert full['overview-info']['children'] == "Overview of 8 blocks"
+
+    moved = dash_client.call('update_overview', dict(values, **{'block-slider.value': 5}),
+                             changed=['block-slider.value'])
+    assert list(moved) == ['overview-plot']
+    operation, = moved['overview-plot']['figure']['operations']
+    assert operation['location'] == ['layout', 'shapes', 0]
+    assert operation['params']['value'] == {'x0': 5, 'x1': 5, 'visible': True}
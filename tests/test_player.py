@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from iq_player import FramePlayer, SkippedFrame
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.001)
+
+
+def buffered(player, n):
+    return lambda: player.stats()['buffered'] >= n
+
+
+def test_frames_play_in_order_and_wrap_inside_the_range():
+    rendered = []
+    player = FramePlayer(depth=3)
+
+    def render(position):
+        rendered.append(position)
+        return f"frame {position}"
+
+    player.configure('key', render, 3, 2, 4)
+    wait_for(buffered(player, 3))
+    # Never more than depth frames ahead
+    assert rendered == [3, 4, 2]
+    shown = []
+    for position in [3, 4, 2, 3, 4, 2]:
+        wait_for(buffered(player, 1))
+        shown.append(player.pop('key', position))
+    assert shown == [f"frame {p}" for p in [3, 4, 2, 3, 4, 2]]
+    assert player.stats()['frames'] == 6 and player.dropped == 0
+    assert player.shown == ('key', 2)
+
+
+def test_late_frames_are_dropped_not_queued():
+    release = threading.Event()
+    player = FramePlayer(depth=2)
+
+    def render(position):
+        release.wait()
+        return position
+
+    player.configure('key', render, 0, 0, 9)
+    assert player.pop('key', 0) is None
+    assert player.pop('key', 0) is None
+    assert (player.frames, player.dropped) == (0, 2)
+    release.set()
+    wait_for(buffered(player, 2))
+    assert player.pop('key', 0) == 0
+    assert player.stats()['frames'] == 1
+    # Another key (e.g. the mode changed) gets nothing and does not count as dropped
+    assert player.pop('other', 1) is None
+    assert player.dropped == 2
+    player.pause()
+    assert player.stats() == {'fps': 0.0, 'frames': 0, 'dropped': 0, 'skipped': 0, 'buffered': 0}
+
+
+def test_jump_restarts_from_the_new_position():
+    player = FramePlayer(depth=2)
+    player.configure('key', lambda p: p, 0, 0, 9)
+    wait_for(buffered(player, 2))
+    assert player.pop('key', 6) is None
+    assert player.dropped == 1
+    wait_for(buffered(player, 2))
+    assert [player.pop('key', 6), player.pop('key', 7)] == [6, 7]
+
+
+@pytest.mark.parametrize('position, first, last, expected', [(5, 2, 4, 2), (3, 2, 4, 3), (0, 4, 2, None)])
+def test_start_position_is_clamped_to_the_range(position, first, last, expected):
+    player = FramePlayer(depth=1)
+    player.configure('key', lambda p: p, position, first, last)
+    if expected is None:
+        time.sleep(0.05)
+        assert player.stats()['buffered'] == 0
+    else:
+        wait_for(buffered(player, 1))
+        assert player.pop('key', expected) == expected
+
+
+def test_new_range_discards_buffered_frames():
+    player = FramePlayer(depth=2)
+    player.configure('key', lambda p: p, 0, 0, 9)
+    wait_for(buffered(player, 2))
+    # Same key and range: nothing is re-rendered
+    player.configure('key', lambda p: -p, 0, 0, 9)
+    assert player.pop('key', 0) == 0
+    player.configure('key', lambda p: -p, 5, 5, 6)
+    wait_for(buffered(player, 2))
+    assert [player.pop('key', 5), player.pop('key', 6)] == [-5, -6]
+
+
+def test_render_errors_skip_the_frame():
+    player = FramePlayer(depth=2)
+
+    def render(position):
+        if position == 1:
+            raise ValueError("bad block")
+        return position
+
+    player.configure('key', render, 0, 0, 2)
+    wait_for(buffered(player, 2))
+    assert player.pop('key', 0) == 0
+    # The failed position is handed out as skipped, so the consumer moves past it
+    wait_for(buffered(player, 1))
+    skipped = player.pop('key', 1)
+    assert isinstance(skipped, SkippedFrame) and (skipped.position, skipped.error) == (1, "bad block")
+    wait_for(buffered(player, 1))
+    assert player.pop('key', 2) == 2
+    wait_for(buffered(player, 1))
+    assert player.pop('key', 0) == 0
+    assert {k: player.stats()[k] for k in ('frames', 'dropped', 'skipped')} == {'frames': 3, 'dropped': 0,
+                                                                               'skipped': 1}
@@ -0,0 +1,115 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+import iq_render
+from iq_raster import COLORS, WHITE, Canvas, encode_png, nice_range, text_width
+from iq_render import ContactSheets, parse_size, render_frame
+from iq_index import load_index
+from iq_traces import load_iq_block
+
+
+def decode_png(data):
+    """(h, w, 3) pixels of an 8-bit RGB PNG with unfiltered scanlines"""
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    pos, chunks = 8, {}
+    while pos < len(data):
+        length, = struct.unpack('>I', data[pos:pos + 4])
+        kind, body = data[pos + 4:pos + 8], data[pos + 8:pos + 8 + length]
+        assert struct.unpack('>I', data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(kind + body)
+        chunks[kind] = chunks.get(kind, b'') + body
+        pos += 12 + length
+    w, h, depth, color_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    assert (depth, color_type) == (8, 2) and b'IEND' in chunks
+    rows = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(h, 1 + 3 * w)
+    assert not rows[:, 0].any()
+    return rows[:, 1:].reshape(h, w, 3)
+
+
+def test_png_round_trip():
+    rng = np.random.default_rng(14)
+    pixels = rng.integers(0, 256, (7, 5, 3), dtype=np.uint8)
+    np.testing.assert_array_equal(decode_png(encode_png(pixels)), pixels)
+
+
+def ink(canvas, color):
+    return np.all(canvas.pixels == color, axis=-1)
+
+
+def test_polyline_is_connected_and_clipped():
+    canvas = Canvas(40, 20)
+    canvas.polyline([0, 30], [2, 12], COLORS['red'], (0, 0, 20, 20))
+    hit = ink(canvas, COLORS['red'])
+    # One pixel per column up to the clip edge, rising one row every three columns
+    assert hit[:, :20].sum(axis=0).min() == 1 and not hit[:, 20:].any()
+    assert hit[2, 0]
+    ys = hit[:, :20].argmax(axis=0)
+    assert np.all(np.diff(ys) >= 0) and np.all(np.diff(ys) <= 1)
+
+
+def test_density_shades_by_count():
+    canvas = Canvas(10, 10)
+    canvas.density([2] * 100 + [7], [3] * 100 + [7], COLORS['blue'], (0, 0, 10, 10))
+    assert tuple(canvas.pixels[3, 2]) == COLORS['blue']
+    light = canvas.pixels[7, 7].astype(int)
+    assert tuple(light) != COLORS['blue'] and tuple(light) != WHITE
+    assert (light > np.array(COLORS['blue'])).all()
+    assert (canvas.pixels.reshape(-1, 3) != WHITE).any(axis=1).sum() == 2
+
+
+def test_text_and_ranges():
+    canvas = Canvas(20, 10)
+    canvas.text(1, 1, 'i', color=(0, 0, 0))
+    assert ink(canvas, (0, 0, 0)).sum() == 9
+    assert text_width('abc', scale=2) == 24
+    assert nice_range([]) == (0.0, 1.0)
+    assert nice_range([2, 2]) == pytest.approx((1.45, 2.55))
+    assert nice_range([0, np.nan, 10, np.inf], pad=0.1) == pytest.approx((-1.0, 11.0))
+    assert parse_size('320x200') == (320, 200) and parse_size('241') == (240, 240)
+
+
+@pytest.mark.parametrize('mode', iq_render.MODES)
+def test_render_frame(make_session, mode):
+    index = load_index(make_session(range(1)))
+    iq_data = load_iq_block(index, 0, 2000)
+    image = render_frame(iq_data, mode, 2000, size=(320, 240), label='block 0')
+    assert image.shape == (240, 320, 3) and image.dtype == np.uint8
+    np.testing.assert_array_equal(image, render_frame(iq_data, mode, 2000, size=(320, 240), label='block 0'))
+    colors = {tuple(c) for c in image.reshape(-1, 3)}
+    if mode == 'IQ':
+        assert {COLORS['blue'], COLORS['red']} <= colors
+    elif mode != 'CONST':
+        assert {COLORS[c] for c in ('blue', 'red', 'green', 'orange')} <= colors
+
+
+def test_contact_sheets(tmp_path):
+    sheets = ContactSheets(str(tmp_path / 'sheet.png'), (4, 3), columns=2, per_sheet=4)
+    for value in range(5):
+        sheets.add(np.full((3, 4, 3), value * 40, dtype=np.uint8))
+    written = sheets.close()
+    assert [os.path.basename(p) for p in written] == ['sheet_000.png', 'sheet_001.png']
+    first = decode_png(open(written[0], 'rb').read())
+    assert first.shape == (6, 8, 3)
+    # Tiles lose their last row and column, which keeps a separating line
+    assert first[0, 0, 0] == 0 and first[0, 4, 0] == 40 and first[3, 4, 0] == 120
+    assert decode_png(open(written[1], 'rb').read()).shape == (3, 8, 3)
+
+    single = ContactSheets(str(tmp_path / 'one.png'), (4, 3), columns=2, per_sheet=4)
+    single.add(np.zeros((3, 4, 3), dtype=np.uint8))
+    assert single.close() == [str(tmp_path / 'one.png')]
+
+
+def test_cli_pool_matches_sequential(make_session, tmp_path):
+    path = make_session(range(4))
+    args = ['--base', path, '--mode', 'AMP', '--range', '1', '3', '--size', '120x80', '--samples', '500']
+    assert iq_render.main(args + ['--png-dir', str(tmp_path / 'seq'), '--sheet', str(tmp_path / 'seq.png')]) == 0
+    assert iq_render.main(args + ['--png-dir', str(tmp_path / 'pool'), '-w', '2']) == 0
+    names = sorted(os.listdir(tmp_path / 'seq'))
+    assert names == ['block_00001.png', 'block_00002.png', 'block_00003.png']
+    for name in names:
+        assert open(tmp_path / 'seq' / name, 'rb').read() == open(tmp_path / 'pool' / name, 'rb').read()
+    assert decode_png(open(tmp_path / 'seq.png', 'rb').read()).shape == (80, iq_render.SHEET_COLUMNS * 120, 3)
+    assert iq_render.main(['--base', path, '--range', '7', '9', '--sheet', str(tmp_path / 'x.png')]) == 1
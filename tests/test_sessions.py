@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+
+import iq_sessions
+from iq_sessions import SessionCatalog, discover_sessions, is_session_dir
+
+
+def test_discovery(make_session, tmp_path):
+    make_session(range(2), name='session_b')
+    make_session(range(2), name='session_a', index=False)
+    make_session(range(1), name='other')
+    os.makedirs(tmp_path / 'session_empty' / 'ch1')
+    (tmp_path / 'session_c.iqpack').write_bytes(b'')
+    (tmp_path / 'session_notes.txt').write_text('')
+    assert is_session_dir(str(tmp_path / 'session_a'))
+    assert not is_session_dir(str(tmp_path / 'session_empty'))
+    assert discover_sessions(str(tmp_path)) == ['session_a', 'session_b', 'session_c.iqpack']
+    assert discover_sessions(str(tmp_path / 'missing')) == []
+
+
+def test_names_are_listed_once(make_session, tmp_path):
+    make_session(range(1), name='session_a')
+    catalog = SessionCatalog(str(tmp_path))
+    assert catalog.names() == ['session_a']
+    make_session(range(1), name='session_b')
+    assert catalog.names() == ['session_a']
+    assert catalog.names(refresh=True) == ['session_a', 'session_b']
+    assert catalog.stats() == {'sessions': 2, 'loaded': 0}
+
+
+def test_concurrent_gets_share_one_load(make_session, tmp_path, monkeypatch):
+    make_session(range(3), name='session_a')
+    loads = []
+    real = iq_sessions.load_index
+
+    def slow_load(path, session=None):
+        loads.append(session)
+        time.sleep(0.05)
+        return real(path, session=session)
+
+    monkeypatch.setattr(iq_sessions, 'load_index', slow_load)
+    catalog = SessionCatalog(str(tmp_path))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(catalog.get('session_a'))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == ['session_a']
+    assert len({id(index) for index in results}) == 1
+    assert results[0].session == 'session_a' and len(results[0]) == 3
+    assert catalog.is_loaded('session_a') and not catalog.is_loaded('session_b')
+    # Reload submits a new load once the previous one is done
+    assert catalog.get('session_a', reload=True) is not results[0]
+    assert loads == ['session_a', 'session_a']
+
+
+def test_failed_load_is_retried(make_session, tmp_path, monkeypatch):
+    make_session(range(2), name='session_a')
+    real = iq_sessions.load_index
+    calls = []
+
+    def flaky_load(path, session=None):
+        calls.append(session)
+        if len(calls) == 1:
+            raise OSError("busy")
+        return real(path, session=session)
+
+    monkeypatch.setattr(iq_sessions, 'load_index', flaky_load)
+    catalog = SessionCatalog(str(tmp_path))
+    assert catalog.get('session_a') is None
+    assert not catalog.is_loaded('session_a')
+    assert len(catalog.get('session_a')) == 2
+    assert catalog.stats()['loaded'] == 1
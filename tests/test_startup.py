@@ -0,0 +1,38 @@
+import socket
+
+from bench_startup import measure_import
+
+
+def test_import_has_no_side_effects():
+    seconds, loaded, looked_up, output = measure_import()
+    assert loaded == [], f"imported at startup: {loaded}"
+    assert not looked_up
+    assert output == []
+
+
+def test_wait_for_port(web):
+    iq_web = web[0]
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    port = server.getsockname()[1]
+    assert iq_web.wait_for_port(port, timeout=5)
+    server.close()
+    assert not iq_web.wait_for_port(port, timeout=0.2)
+
+
+def test_warm_up_loads_the_default_session_once(web, monkeypatch, capsys):
+    iq_web, dash_client, path = web
+    monkeypatch.setattr(iq_web, 'wait_for_port', lambda port, timeout=30.0: True)
+    assert iq_web.data_path.cache_info().currsize == 0
+    iq_web.warm_up(0)
+    out = capsys.readouterr().out
+    assert f"Data path: {path}" in out and "Found 8 unique blocks (range: 0 to 7)" in out
+    assert "4 channels: 8 blocks" in out
+    sessions = iq_web.get_sessions()
+    assert sessions.is_loaded('session')
+    warmed = sessions.get('session')
+    # The first page load reuses the warmed-up index
+    dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                     changed=['session-selector.value'])
+    assert iq_web.INDEX_REGISTRY.get('session') is warmed
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pytest
+
+from iq_blocks import block_path
+from iq_dsp import welch_psd
+from iq_stream import arrow_available, parse_range, stream_stats
+
+
+def raw_block(path, channel, block):
+    return np.fromfile(block_path(path, channel, block), dtype=np.uint8)
+
+
+def as_iq(raw):
+    pairs = (raw.astype(np.float32) - 127.5) / 127.5
+    return pairs[0::2] + 1j * pairs[1::2]
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None), ('', None), ('bytes=0-99', (0, 100)), ('bytes=500-', (500, 1000)), ('bytes=-100', (900, 1000)),
+    ('bytes=-5000', (0, 1000)), ('bytes=990-2000', (990, 1000)), ('items=0-10', None), ('bytes=0-1,5-6', None),
+    ('bytes=a-b', None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=1000-', 'bytes=1200-1300', 'bytes=20-10', 'bytes=-0'])
+def test_parse_range_outside_the_stream(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+def test_session_routes(web):
+    _, dash_client, _ = web
+    http = dash_client.http
+    assert http.get('/api/sessions').get_json() == ['session']
+    summary = http.get('/api/sessions/session').get_json()
+    assert (summary['blocks'], summary['first_block'], summary['last_block']) == (8, 0, 7)
+    assert summary['frame_types'] == {'DATA': 8} and 'complex64' in summary['formats']
+    response = http.get('/api/sessions/session/index/blocks')
+    assert response.headers['X-IQ-Dtype'] == 'int32'
+    assert np.frombuffer(response.data, dtype='<i4').tolist() == list(range(8))
+    assert http.get('/api/sessions/session/index/filepath').status_code == 400
+    assert http.get('/api/sessions/nothing').status_code == 404
+
+
+def test_uint8_stream_is_the_block_bytes(web):
+    _, dash_client, path = web
+    response = dash_client.http.get('/api/sessions/session/data?format=uint8&channels=0,2&first=2&last=3'
+                                    '&start=100&count=50')
+    assert response.status_code == 200
+    assert response.headers['X-IQ-Record-Bytes'] == str(2 * 100)
+    assert (response.headers['X-IQ-First-Block'], response.headers['X-IQ-Last-Block']) == ('2', '3')
+    expected = b''.join(raw_block(path, ch, block)[200:300].tobytes() for block in (2, 3) for ch in (0, 2))
+    assert response.data == expected
+    assert int(response.headers['X-IQ-Size']) == len(expected)
+
+
+def test_complex64_decimate_and_missing_channels(web):
+    _, dash_client, path = web
+    os.remove(block_path(path, 1, 5))
+    with open(os.path.join(path, 'index.csv')) as f:
+        rows = [row for row in f if 'ch1/block_00005' not in row]
+    with open(os.path.join(path, 'index.csv'), 'w') as f:
+        f.writelines(rows)
+    response = dash_client.http.get('/api/sessions/session/data?channels=1&first=4&last=5&count=400&decimate=4')
+    values = np.frombuffer(response.data, dtype=np.complex64).reshape(2, 100)
+    expected = as_iq(raw_block(path, 1, 4)[:800]).reshape(100, 4).mean(axis=1)
+    np.testing.assert_allclose(values[0], expected, atol=1e-6)
+    assert np.isnan(values[1]).all()
+    assert response.headers['X-IQ-Sample-Rate'] == repr(2.4e6 / 4)
+
+
+def test_psd_stream_matches_welch(web):
+    _, dash_client, path = web
+    response = dash_client.http.get('/api/sessions/session/data?channels=3&first=6&last=6&psd=256&window=hann'
+                                    '&overlap=0.5')
+    psd = np.frombuffer(response.data, dtype=np.float32)
+    assert response.headers['X-IQ-Values-Per-Channel'] == '256' and len(psd) == 256
+    x = as_iq(raw_block(path, 3, 6)).astype(np.complex64)
+    expected = welch_psd(x[None], 2.4e6, fft_size=256, overlap=0.5, window='hann')[0]
+    np.testing.assert_allclose(psd, expected, rtol=1e-4, atol=1e-3)
+
+
+def test_range_requests(web):
+    _, dash_client, _ = web
+    url = '/api/sessions/session/data?format=uint8&channels=0&first=0&last=3&count=1000'
+    http = dash_client.http
+    full = http.get(url)
+    assert full.status_code == 200 and full.headers['Accept-Ranges'] == 'bytes'
+    size = len(full.data)
+    assert size == 4 * 2000
+    # A range straddling two block records
+    partial = http.get(url, headers={'Range': 'bytes=1990-2009'})
+    assert partial.status_code == 206
+    assert partial.data == full.data[1990:2010]
+    assert partial.headers['Content-Range'] == f'bytes 1990-2009/{size}'
+    assert partial.headers['Content-Length'] == '20'
+    assert http.get(url, headers={'Range': 'bytes=-16'}).data == full.data[-16:]
+    outside = http.get(url, headers={'Range': f'bytes={size}-'})
+    assert outside.status_code == 416
+    assert outside.headers['Content-Range'] == f'bytes */{size}'
+
+
+@pytest.mark.parametrize('query', ['format=wav', 'format=uint8&decimate=2', 'channels=4', 'channels=a',
+                                   'decimate=0', 'start=10&count=0', 'psd=8', 'psd=256&window=boxcar', 'first=x'])
+def test_invalid_requests(web, query):
+    _, dash_client, _ = web
+    response = dash_client.http.get(f'/api/sessions/session/data?{query}')
+    assert response.status_code == 400 and response.get_json()['error']
+
+
+def test_time_selection_and_stats(web):
+    _, dash_client, _ = web
+    before = stream_stats()
+    response = dash_client.http.get('/api/sessions/session/data?format=uint8&channels=0&t0=1770822898220'
+                                    '&t1=1770822898440&count=10&offset=1&limit=2')
+    assert (response.headers['X-IQ-First-Block'], response.headers['X-IQ-Last-Block']) == ('3', '4')
+    after = stream_stats()
+    assert after['requests'] == before['requests'] + 1
+    assert after['bytes'] == before['bytes'] + len(response.data) == before['bytes'] + 2 * 20
+
+
+@pytest.mark.skipif(arrow_available(), reason="pyarrow is installed")
+def test_arrow_without_pyarrow(web):
+    _, dash_client, _ = web
+    assert dash_client.http.get('/api/sessions/session/data?format=arrow').status_code == 501
@@ -0,0 +1,112 @@
+import os
+
+import numpy as np
+
+from conftest import index_rows, random_block, write_block
+from iq_blocks import NUM_CHANNELS
+from iq_index import INDEX_REGISTRY, SessionIndex, empty_columns
+from iq_tail import IndexFollower
+
+
+def follower_of(path, session='follow-test'):
+    """Follower of a session nothing has been read from yet"""
+    return IndexFollower(SessionIndex(session, path, *empty_columns()))
+
+
+def append(path, text):
+    with open(os.path.join(path, 'index.csv'), 'a') as f:
+        f.write(text)
+
+
+def test_blocks_are_published_once_complete(make_session):
+    rng = np.random.default_rng(4)
+    path = make_session(range(2))
+    follower = follower_of(path)
+    # Block 2: ch3 is still being written
+    for ch in range(NUM_CHANNELS):
+        data = random_block(rng)
+        write_block(path, ch, 2, data[:len(data) // 2] if ch == 3 else data)
+    append(path, index_rows([2]))
+
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.index.blocks, [0, 1])
+    assert INDEX_REGISTRY.get('follow-test') is follower.index
+
+    write_block(path, 3, 2, random_block(rng))
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.index.blocks, [0, 1, 2])
+    assert not follower.poll()
+
+    # The newest block with only some channels waits: more may be listed later
+    for ch in (0, 1):
+        write_block(path, ch, 3, random_block(rng))
+    append(path, index_rows([3], channels=[0, 1]))
+    assert not follower.poll()
+    assert follower.latest_complete_position() == 2
+
+    # ... until a newer block shows up
+    for ch in range(NUM_CHANNELS):
+        write_block(path, ch, 4, random_block(rng))
+    append(path, index_rows([4]))
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.index.blocks, [0, 1, 2, 3, 4])
+    assert follower.index.channels_at(3) == [0, 1]
+
+    # A late channel row of a published block updates its mask
+    write_block(path, 2, 3, random_block(rng))
+    append(path, index_rows([3], channels=[2]))
+    assert follower.poll()
+    assert follower.index.channels_at(3) == [0, 1, 2]
+    assert follower.latest_complete_position() == 4
+
+
+def test_follower_reads_a_headered_index_from_the_start(make_session):
+    path = make_session(range(3), header=True)
+    follower = follower_of(path)
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.index.blocks, [0, 1, 2])
+
+
+def test_rewritten_index_csv_starts_over(make_session):
+    path = make_session(range(3), header=True)
+    follower = follower_of(path)
+    follower.poll()
+    # A new recording replaces index.csv with a shorter one (with its header)
+    make_session(range(1), header=True)
+    assert follower.poll()
+    np.testing.assert_array_equal(follower.index.blocks, [0])
+
+
+def test_follower_continues_after_the_sidecar_offset(make_session):
+    from iq_index import load_index
+    path = make_session(range(2))
+    index = load_index(path, session='follow-sidecar')
+    follower = IndexFollower(index)
+    assert follower._offset == os.path.getsize(os.path.join(path, 'index.csv'))
+    assert not follower.poll()
+
+
+def test_late_channel_rows_wait_for_their_file(make_session):
+    rng = np.random.default_rng(6)
+    path = make_session(range(2), channels=[0, 1])
+    follower = follower_of(path)
+    assert follower.poll()
+    assert follower.index.channels_at(0) == [0, 1]
+
+    # ch2 of block 0 is listed while its file is still short
+    data = random_block(rng)
+    write_block(path, 2, 0, data[:len(data) // 3])
+    append(path, index_rows([0], channels=[2]))
+    assert not follower.poll()
+    assert follower.index.channels_at(0) == [0, 1]
+
+    # A late row re-listing a shown channel does not publish the short one
+    write_block(path, 3, 0, random_block(rng))
+    append(path, index_rows([0], channels=[1, 3]))
+    assert follower.poll()
+    assert follower.index.channels_at(0) == [0, 1, 3]
+
+    write_block(path, 2, 0, data)
+    assert follower.poll()
+    assert follower.index.channels_at(0) == [0, 1, 2, 3]
+    assert not follower.poll()
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from conftest import BLOCK_MS, T0_MS
+from iq_index import SessionIndex
+from iq_timeline import SessionTimeline, format_time, parse_time, to_ms
+
+
+def timed_index(blocks, timestamps, frequencies=None):
+    return SessionIndex('s', '/data/s', blocks, [1] * len(blocks), timestamps, frequencies)
+
+
+@pytest.fixture
+def capture():
+    """Blocks 0..11 without 5 and 6, a stall before block 9 and a retune at block 7"""
+    blocks = np.array([0, 1, 2, 3, 4, 7, 8, 9, 10, 11])
+    timestamps = T0_MS + blocks * BLOCK_MS
+    timestamps[blocks >= 9] += 1000
+    frequencies = np.where(blocks >= 7, 433_000_000, 700_000_000)
+    return timed_index(blocks, timestamps, frequencies)
+
+
+def test_position_at_time():
+    index = timed_index([0, 1, 2, 3], [1000, 1100, 1200, 1300])
+    assert index.position_at_time(1149) == 1
+    # Half way rounds to the earlier block
+    assert index.position_at_time(1150) == 1
+    assert index.position_at_time(1151) == 2
+    assert index.position_at_time(0) == 0 and index.position_at_time(5000) == 3
+    # Capture order differing from block order maps back to slider positions
+    shuffled = timed_index([0, 1, 2, 3], [1300, 1000, 1200, 1100])
+    assert [shuffled.position_at_time(t) for t in (1000, 1100, 1200, 1300)] == [1, 3, 2, 0]
+    assert SessionIndex('s', '/data/s', [0, 1], [1, 1]).position_at_time(1000) is None
+
+
+def test_positions_between():
+    index = timed_index([0, 1, 2, 3], [1000, 1100, 1200, 1300])
+    assert index.positions_between(1100, 1200).tolist() == [1, 2]
+    assert index.positions_between(1000.5, 1299.5).tolist() == [1, 2]
+    assert index.positions_between(2000, 3000).tolist() == []
+    shuffled = timed_index([0, 1, 2, 3], [1300, 1000, 1200, 1100])
+    assert shuffled.positions_between(1050, 1250).tolist() == [2, 3]
+    assert SessionIndex('s', '/data/s', [0, 1], [1, 1]).positions_between(0, 1e15).tolist() == []
+
+
+def test_timeline_events(capture):
+    timeline = SessionTimeline(capture)
+    assert timeline.timed and timeline.cadence_ms == BLOCK_MS
+    assert timeline.missing_total == 2
+    assert timeline.gap_missing.tolist() == [2]
+    assert timeline.gap_x.tolist() == [T0_MS + (4 + 7) * BLOCK_MS // 2]
+    assert timeline.stall_x.tolist() == [T0_MS + (8 * BLOCK_MS + 9 * BLOCK_MS + 1000) // 2]
+    assert timeline.retune_x.tolist() == [T0_MS + 7 * BLOCK_MS]
+    assert timeline.summary() == {'received': 10, 'missing': 2, 'stalls': 1, 'retunes': 1}
+    # Up to block 4 only
+    assert timeline.summary(T0_MS, T0_MS + 4 * BLOCK_MS) == {'received': 5, 'missing': 0, 'stalls': 0,
+                                                            'retunes': 0}
+
+
+def test_bins_match_brute_force_counts(capture):
+    timeline = SessionTimeline(capture)
+    for x0, x1, n_bins in ((None, None, 400), (None, None, 7), (T0_MS + 250, T0_MS + 1500, 13)):
+        bins = timeline.bins(x0, x1, n_bins)
+        edges = bins['edges']
+        assert len(bins['received']) == len(edges) - 1 <= n_bins
+        for i in range(len(edges) - 1):
+            lo = np.ceil(edges[i])
+            hi = np.floor(edges[-1]) if i == len(edges) - 2 else np.ceil(edges[i + 1]) - 1
+            expected = int(np.sum((timeline.x >= lo) & (timeline.x <= hi)))
+            assert bins['received'][i] == expected
+            assert bins['missing'][i] == int(np.sum(timeline.gap_missing[(timeline.gap_x >= lo)
+                                                                         & (timeline.gap_x <= hi)]))
+            assert bins['stalls'][i] == int(np.sum((timeline.stall_x >= lo) & (timeline.stall_x <= hi)))
+    whole = timeline.bins(n_bins=7)
+    assert (whole['received'].sum(), whole['missing'].sum(), whole['stalls'].sum(), whole['retunes'].sum()) == (
+        10, 2, 1, 1)
+    assert whole['frequency'][0] == 700_000_000 and whole['frequency'][-1] == 433_000_000
+    # Never more bins than ms in the range, and ranges below one cadence are widened to it
+    assert len(timeline.bins(T0_MS, T0_MS + 200, 400)['received']) == 200
+    assert len(timeline.bins(T0_MS, T0_MS + 10, 400)['received']) == BLOCK_MS + 10
+
+
+def test_untimed_timeline_uses_block_numbers():
+    timeline = SessionTimeline(SessionIndex('s', '/data/s', [0, 1, 2, 6, 7], [1] * 5))
+    assert not timeline.timed and timeline.extent() == (0, 7)
+    assert timeline.summary() == {'received': 5, 'missing': 3, 'stalls': 0, 'retunes': 0}
+    assert timeline.bins()['received'].sum() == 5
+
+
+def test_time_parsing():
+    assert format_time(T0_MS) == '2026-02-11 15:14:58.000'
+    assert to_ms('2026-02-11 15:14:58.110') == T0_MS + 110
+    assert to_ms(12.5) == 12.5
+    assert parse_time('15:14:59.5', T0_MS) == T0_MS + 1500
+    assert parse_time('2026-02-11T15:15:00', 0) == T0_MS + 2000
+    assert parse_time('soon', T0_MS) is None and parse_time('', T0_MS) is None
+
+
+def test_typed_time_opens_the_closest_block(web):
+    _, dash_client, _ = web
+    frames_data = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                                   changed=['session-selector.value'])['frames-data-store']['data']
+    values = {'frames-data-store.data': frames_data, 'block-slider.min': 0, 'block-slider.max': 7}
+    typed = format_time(T0_MS + 3 * BLOCK_MS + 20)[11:]
+    response = dash_client.call('jump_to_time', dict(values, **{'time-jump.value': typed}),
+                                changed=['time-jump.value'])
+    assert response['block-slider']['value'] == 3
+    assert "Block #3" in response['timeline-info']['children'] and "-20 ms" in response['timeline-info']['children']
+    outside = dash_client.call('jump_to_time', dict(values, **{'time-jump.value': typed, 'block-slider.max': 2}),
+                               changed=['time-jump.value'])
+    assert 'outside the range' in outside['timeline-info']['children']
+    assert 'Not a time' in dash_client.call('jump_to_time', dict(values, **{'time-jump.value': 'later'}),
+                                            changed=['time-jump.value'])['timeline-info']['children']
+    # The timeline strip covers the whole session
+    strip = dash_client.call('update_timeline', {'frames-data-store.data': frames_data, 'block-slider.value': 0},
+                             changed=['frames-data-store.data'])
+    assert strip['timeline-range']['data'] == {'session': 'session', 'x0': None, 'x1': None}
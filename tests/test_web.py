@@ -0,0 +1,110 @@
+import base64
+import time
+
+import numpy as np
+import pytest
+
+from iq_blocks import NUM_CHANNELS
+
+
+def decode(typed):
+    assert typed['dtype'] == 'f4'
+    return np.frombuffer(base64.b64decode(typed['bdata']), dtype='<f4')
+
+
+def plot_values(dash_client):
+    """update_plot inputs for block 1 of the loaded 'session'"""
+    frames_data = dash_client.call('load_data', {'session-selector.value': 'session', 'frame-type-filter.value': 'all'},
+                                   changed=['session-selector.value'])['frames-data-store']['data']
+    return {'block-slider.value': 1, 'mode-selector.value': 'IQ', 'samples-input.value': 1000,
+            'psd-window.value': 'hann', 'psd-fft-size.value': 1024, 'psd-overlap.value': 0.5,
+            'frames-data-store.data': frames_data}
+
+
+def test_typed_array_round_trip(web):
+    iq_web = web[0]
+    values = np.array([0.5, -1.25, 3e6], dtype=np.float64)
+    np.testing.assert_array_equal(decode(iq_web.typed_array(values)), values.astype(np.float32))
+    assert decode(iq_web.typed_array([])).size == 0
+
+
+@pytest.mark.parametrize('mode', ['IQ', 'FFT', 'CONST', 'AMP'])
+def test_figure_skeleton(web, mode):
+    iq_web = web[0]
+    skeleton = iq_web.figure_skeleton(mode)
+    assert iq_web.figure_skeleton(mode) is skeleton
+    assert len(skeleton['data']) == NUM_CHANNELS * len(iq_web.TRACE_STYLES[mode])
+    assert {trace['type'] for trace in skeleton['data']} == {'scattergl'}
+    assert all(len(trace['x']) == 0 and len(trace['y']) == 0 for trace in skeleton['data'])
+    assert len(skeleton['layout']['annotations']) == NUM_CHANNELS
+
+
+def test_second_render_of_a_mode_is_a_patch(web):
+    _, dash_client, _ = web
+    values = plot_values(dash_client)
+    full = dash_client.call('update_plot', dict(values, **{'block-slider.value': 2}), changed=['block-slider.value'])
+    figure = full['iq-plot']['figure']
+    assert full['plot-skeleton']['data'] == {'mode': 'IQ'}
+    assert len(figure['data']) == 2 * NUM_CHANNELS
+
+    # Block 1 first, then block 2 as a patch of the block 1 figure
+    dash_client.call('update_plot', values, changed=['block-slider.value'])
+    patched = dash_client.call('update_plot', dict(values, **{'block-slider.value': 2, 'plot-skeleton.data': {
+        'mode': 'IQ'}}), changed=['block-slider.value'])
+    patch = patched['iq-plot']['figure']
+    assert patch['__dash_patch_update'] == '__dash_patch_update'
+    assigned = {tuple(op['location']): op['params']['value'] for op in patch['operations']
+                if op['operation'] == 'Assign'}
+    for i, trace in enumerate(figure['data']):
+        for axis in ('x', 'y'):
+            np.testing.assert_array_equal(decode(assigned[('data', i, axis)]), decode(trace[axis]))
+    for channel in range(NUM_CHANNELS):
+        assert assigned[('layout', 'annotations', channel, 'text')] == figure['layout']['annotations'][channel]['text']
+    assert assigned[('layout', 'title', 'text')] == figure['layout']['title']['text']
+    # Nothing else of the layout is sent again
+    assert {key[0] for key in assigned} == {'data', 'layout'}
+    assert len(assigned) == 2 * len(figure['data']) + NUM_CHANNELS + 1
+
+
+def test_mode_change_and_errors_send_a_full_figure(web):
+    _, dash_client, _ = web
+    values = plot_values(dash_client)
+    other_mode = dash_client.call('update_plot', dict(values, **{'mode-selector.value': 'AMP', 'plot-skeleton.data': {
+        'mode': 'IQ'}}), changed=['mode-selector.value'])
+    assert 'data' in other_mode['iq-plot']['figure']
+    assert other_mode['plot-skeleton']['data'] == {'mode': 'AMP'}
+    # An empty figure replaces the skeleton, so the next render must be whole again
+    missing = dash_client.call('update_plot', dict(values, **{'block-slider.value': 99, 'plot-skeleton.data': {
+        'mode': 'IQ'}}), changed=['block-slider.value'])
+    assert missing['plot-skeleton']['data'] is None
+    assert missing['iq-plot']['figure']['data'] == []
+
+
+def test_play_moves_past_a_block_that_fails_to_render(web, monkeypatch):
+    iq_web, dash_client, _ = web
+    render = iq_web.render_play_frame
+
+    def failing(index, position, *args, **kwargs):
+        if position == 2:
+            raise OSError("block file unreadable")
+        return render(index, position, *args, **kwargs)
+
+    monkeypatch.setattr(iq_web, 'render_play_frame', failing)
+    values = dict(plot_values(dash_client), **{'play-state.data': {'playing': True},
+                                               'plot-skeleton.data': {'mode': 'IQ'},
+                                               'block-slider.min': 0, 'block-slider.max': 7})
+    try:
+        shown = {}
+        for slider in (1, 2):
+            deadline = time.monotonic() + 5
+            while 'block-slider' not in shown.get(slider, {}):
+                assert time.monotonic() < deadline
+                shown[slider] = dash_client.call('play_tick', dict(values, **{'block-slider.value': slider}),
+                                                 changed=['interval-component.n_intervals'])
+        # The failing block keeps the last figure and reports the error, then Play goes on
+        assert shown[1]['block-slider']['value'] == 2 and 'iq-plot' not in shown[1]
+        assert 'block file unreadable' in str(shown[1]['info-div']['children'])
+        assert shown[2]['block-slider']['value'] == 3 and 'Block: #' in str(shown[2]['info-div']['children'])
+        assert iq_web.PLAYER.skipped == 1
+    finally:
+        iq_web.PLAYER.pause()